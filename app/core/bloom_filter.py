@@ -0,0 +1,56 @@
+import hashlib
+import math
+
+class BloomFilter:
+    """Filtr Blooma - szybki test przynależności bez fałszywie ujemnych odpowiedzi."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        if capacity <= 0:
+            raise ValueError("Pojemność filtra musi być dodatnia")
+        if not 0 < error_rate < 1:
+            raise ValueError("Dopuszczalny odsetek fałszywych trafień musi być z przedziału (0, 1)")
+
+        self.capacity = capacity
+        self.error_rate = error_rate
+        # Optymalne m i k dla zadanej pojemności i odsetka fałszywych trafień
+        self.num_bits = max(8, math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self._count = 0
+
+    def _positions(self, key: str):
+        """Wyznacza pozycje bitów dla klucza (podwójne haszowanie)."""
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        num_bits = self.num_bits
+        return [(h1 + i * h2) % num_bits for i in range(self.num_hashes)]
+
+    def add(self, key: str) -> None:
+        """Dodaje klucz do filtra."""
+        bits = self._bits
+        added = False
+        for position in self._positions(key):
+            index, mask = position >> 3, 1 << (position & 7)
+            if not bits[index] & mask:
+                bits[index] |= mask
+                added = True
+        if added:
+            self._count += 1
+
+    def __contains__(self, key: str) -> bool:
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def size_bytes(self) -> int:
+        """Zwraca rozmiar tablicy bitów w bajtach."""
+        return len(self._bits)
+
+    @property
+    def false_positive_rate(self) -> float:
+        """Zwraca szacowany odsetek fałszywych trafień przy obecnym zapełnieniu."""
+        return (1 - math.exp(-self.num_hashes * self._count / self.num_bits)) ** self.num_hashes
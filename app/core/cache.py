@@ -1,48 +1,193 @@
-from typing import Any, Optional
+from typing import Any, List, Optional, Tuple
 from datetime import datetime, timedelta
+from collections import OrderedDict
 import logging
+import time
 import redis
+import redis.asyncio as aioredis
 from app.core.config import settings
+from app.monitoring.redis_metrics import (
+    REDIS_POOL_MAX_CONNECTIONS,
+    REDIS_POOL_IN_USE,
+    REDIS_POOL_IDLE
+)
 
 logger = logging.getLogger(__name__)
 
+# Zapis liczby tylko, gdy jest większa od zapisanej - spóźniony zapis nie cofa wartości.
+# KEYS - klucze, ARGV - pary (wartość, TTL w sekundach; 0 bez wygasania); zwraca obowiązujące wartości
+SET_MAX_SCRIPT = """
+local stored = {}
+for i, key in ipairs(KEYS) do
+    local value = tonumber(ARGV[2 * i - 1])
+    local ttl = tonumber(ARGV[2 * i])
+    local current = tonumber(redis.call('GET', key))
+    if current == nil or value > current then
+        if ttl > 0 then
+            redis.call('SET', key, ARGV[2 * i - 1], 'EX', ttl)
+        else
+            redis.call('SET', key, ARGV[2 * i - 1])
+        end
+        current = value
+    end
+    stored[i] = current
+end
+return stored
+"""
+
 class RedisCache:
-    def __init__(self):
-        self._redis = redis.Redis(
+    """Asynchroniczny cache Redis ze współdzieloną pulą połączeń."""
+
+    def __init__(
+        self,
+        pool_size: int = settings.REDIS_POOL_SIZE,
+        pool_timeout: float = settings.REDIS_POOL_TIMEOUT,
+        socket_timeout: float = settings.REDIS_SOCKET_TIMEOUT,
+        connect_timeout: float = settings.REDIS_CONNECT_TIMEOUT,
+        health_check_interval: int = settings.REDIS_HEALTH_CHECK_INTERVAL
+    ):
+        self.pool_size = pool_size
+        self.pool_timeout = pool_timeout
+        self.socket_timeout = socket_timeout
+        self.connect_timeout = connect_timeout
+        self.health_check_interval = health_check_interval
+        self._pool: Optional[aioredis.BlockingConnectionPool] = None
+        self._redis: Optional[aioredis.Redis] = None
+
+    def _create_client(self) -> aioredis.Redis:
+        """Tworzy pulę połączeń i klienta (bez nawiązywania połączenia)."""
+        # Blokująca pula czeka na wolne połączenie zamiast otwierać nowe ponad limit
+        self._pool = aioredis.BlockingConnectionPool(
             host=settings.REDIS_HOST,
             port=settings.REDIS_PORT,
             db=settings.REDIS_DB,
             password=settings.REDIS_PASSWORD,
-            decode_responses=True
+            decode_responses=True,
+            max_connections=self.pool_size,
+            timeout=self.pool_timeout,
+            socket_timeout=self.socket_timeout,
+            socket_connect_timeout=self.connect_timeout,
+            health_check_interval=self.health_check_interval
         )
+        self._redis = aioredis.Redis(connection_pool=self._pool)
+
+        # Metryki odczytywane dopiero przy scrapowaniu - zero kosztu na operację
+        REDIS_POOL_MAX_CONNECTIONS.set(self.pool_size)
+        REDIS_POOL_IN_USE.set_function(lambda: self.pool_stats()["in_use"])
+        REDIS_POOL_IDLE.set_function(lambda: self.pool_stats()["idle"])
+        return self._redis
+
+    @property
+    def client(self) -> aioredis.Redis:
+        """Zwraca klienta Redis, tworząc pulę przy pierwszym użyciu."""
+        if self._redis is None:
+            return self._create_client()
+        return self._redis
+
+    def pool_stats(self) -> dict:
+        """Zwraca stan puli połączeń."""
+        if self._pool is None:
+            return {"max": self.pool_size, "in_use": 0, "idle": 0}
+        return {
+            "max": self.pool_size,
+            "in_use": len(getattr(self._pool, "_in_use_connections", ())),
+            "idle": len(getattr(self._pool, "_available_connections", ()))
+        }
+
+    async def connect(self) -> None:
+        """Otwiera pulę połączeń i sprawdza dostępność Redis (wywoływane w lifespan)."""
+        if not await self.ping():
+            logger.warning("Redis jest niedostępny - cache będzie pomijany do czasu odzyskania połączenia")
+
+    async def close(self) -> None:
+        """Zamyka klienta i wszystkie połączenia z puli."""
+        if self._redis is not None:
+            await self._redis.aclose()
+            await self._pool.disconnect()
+            self._redis = None
+            self._pool = None
+
+    async def ping(self) -> bool:
+        """Sprawdza stan połączenia z Redis."""
+        try:
+            return bool(await self.client.ping())
+        except redis.RedisError as e:
+            logger.error(f"Błąd połączenia z Redis: {e}")
+            return False
 
     async def set(self, key: str, value: Any, expires_in: Optional[int] = None) -> None:
         """Zapisuje wartość w Redis z opcjonalnym czasem wygaśnięcia (w sekundach)."""
         try:
-            self._redis.set(key, str(value), ex=expires_in)
+            await self.client.set(key, str(value), ex=expires_in)
         except redis.RedisError as e:
             logger.error(f"Błąd podczas zapisywania do Redis: {e}")
 
     async def get(self, key: str) -> Optional[Any]:
         """Pobiera wartość z Redis."""
         try:
-            value = self._redis.get(key)
-            return value
+            return await self.client.get(key)
         except redis.RedisError as e:
             logger.error(f"Błąd podczas odczytu z Redis: {e}")
             return None
 
+    async def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        """Pobiera wiele wartości jednym poleceniem MGET."""
+        if not keys:
+            return []
+        try:
+            return await self.client.mget(keys)
+        except redis.RedisError as e:
+            logger.error(f"Błąd podczas odczytu z Redis: {e}")
+            return [None] * len(keys)
+
+    async def set_many(self, entries: List[Tuple[str, Any, Optional[int]]]) -> None:
+        """Zapisuje wiele wartości (klucz, wartość, TTL) w jednym potoku."""
+        if not entries:
+            return
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for key, value, expires_in in entries:
+                    pipe.set(key, str(value), ex=expires_in)
+                await pipe.execute()
+        except redis.RedisError as e:
+            logger.error(f"Błąd podczas zapisywania do Redis: {e}")
+
+    async def set_max_many(self, entries: List[Tuple[str, int, Optional[int]]]) -> List[Optional[int]]:
+        """Zapisuje liczby (klucz, wartość, TTL), nie cofając wartości większych; zwraca wartości w Redis."""
+        if not entries:
+            return []
+        args = []
+        for _, value, expires_in in entries:
+            args.extend([int(value), expires_in or 0])
+        try:
+            stored = await self.client.eval(SET_MAX_SCRIPT, len(entries), *[key for key, _, _ in entries], *args)
+            return [int(value) for value in stored]
+        except redis.RedisError as e:
+            logger.error(f"Błąd podczas zapisywania do Redis: {e}")
+            return [None] * len(entries)
+
+    async def set_max(self, key: str, value: int, expires_in: Optional[int] = None) -> Optional[int]:
+        """Zapisuje liczbę, jeśli jest większa od zapisanej; zwraca wartość obowiązującą w Redis."""
+        return (await self.set_max_many([(key, value, expires_in)]))[0]
+
     async def delete(self, key: str) -> None:
         """Usuwa wartość z Redis."""
         try:
-            self._redis.delete(key)
+            await self.client.delete(key)
         except redis.RedisError as e:
             logger.error(f"Błąd podczas usuwania z Redis: {e}")
 
+    async def publish(self, channel: str, message: str) -> None:
+        """Publikuje wiadomość na kanale pub/sub."""
+        try:
+            await self.client.publish(channel, message)
+        except redis.RedisError as e:
+            logger.error(f"Błąd podczas publikowania do Redis: {e}")
+
     async def clear(self) -> None:
         """Czyści całą bazę Redis."""
         try:
-            self._redis.flushdb()
+            await self.client.flushdb()
         except redis.RedisError as e:
             logger.error(f"Błąd podczas czyszczenia Redis: {e}")
 
@@ -92,4 +237,56 @@ class Cache:
             await self.delete(key)
 
 # Globalna instancja cache w pamięci
-cache = Cache() 
\ No newline at end of file
+cache = Cache()
+
+class LocalCache:
+    """Ograniczony cache w pamięci procesu (LRU + TTL) bez operacji I/O."""
+
+    def __init__(self, maxsize: int = 10000, default_ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.default_ttl = default_ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Pobiera wartość lub None, jeśli wpis nie istnieje albo wygasł."""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Zapisuje wartość z czasem życia (w sekundach), usuwając najstarsze wpisy."""
+        if ttl is None:
+            ttl = self.default_ttl
+        if ttl <= 0:
+            self._data.pop(key, None)
+            return
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        """Usuwa wpis z cache."""
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Czyści cały cache."""
+        self._data.clear()
+
+    def purge_expired(self) -> int:
+        """Usuwa wygasłe wpisy i zwraca ich liczbę."""
+        now = time.monotonic()
+        expired = [key for key, (expires_at, _) in self._data.items() if now >= expires_at]
+        for key in expired:
+            del self._data[key]
+        return len(expired)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
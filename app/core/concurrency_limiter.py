@@ -0,0 +1,105 @@
+from typing import Optional
+
+class AdaptiveConcurrencyLimiter:
+    """Adaptacyjny limit równoległych żądań (AIMD sterowany opóźnieniem)."""
+
+    def __init__(
+        self,
+        initial_limit: int = 20,
+        min_limit: int = 4,
+        max_limit: int = 500,
+        latency_tolerance: float = 2.0,
+        backoff_ratio: float = 0.9,
+        window_size: int = 50,
+        min_rtt_reset_windows: int = 20
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_tolerance = latency_tolerance
+        self.backoff_ratio = backoff_ratio
+        self.window_size = window_size
+        self.min_rtt_reset_windows = min_rtt_reset_windows
+
+        self._limit = float(max(min_limit, min(initial_limit, max_limit)))
+        self._in_flight = 0
+        self._min_rtt: Optional[float] = None
+        self._window_min_rtt: Optional[float] = None
+        self._window_sum = 0.0
+        self._window_count = 0
+        self._window_dropped = False
+        self._max_in_flight_in_window = 0
+        self._windows_since_reset = 0
+
+    @property
+    def limit(self) -> int:
+        """Zwraca aktualny limit równoległych żądań."""
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        """Zwraca liczbę aktualnie obsługiwanych żądań."""
+        return self._in_flight
+
+    @property
+    def min_rtt(self) -> Optional[float]:
+        """Zwraca minimalny zaobserwowany czas odpowiedzi."""
+        return self._min_rtt
+
+    def try_acquire(self, share: float = 1.0) -> bool:
+        """Rezerwuje slot, jeśli klasa żądania mieści się w swojej części limitu."""
+        if self._in_flight >= max(1, int(self._limit * share)):
+            return False
+        self._in_flight += 1
+        if self._in_flight > self._max_in_flight_in_window:
+            self._max_in_flight_in_window = self._in_flight
+        return True
+
+    def release(self, rtt: float, dropped: bool = False) -> None:
+        """Zwalnia slot i uwzględnia czas odpowiedzi w aktualizacji limitu."""
+        self._in_flight -= 1
+
+        if dropped:
+            self._window_dropped = True
+        else:
+            self._window_sum += rtt
+            self._window_count += 1
+            if self._window_min_rtt is None or rtt < self._window_min_rtt:
+                self._window_min_rtt = rtt
+
+        if self._window_dropped or self._window_count >= self.window_size:
+            self._update_limit()
+
+    def _update_limit(self) -> None:
+        """Przelicza limit na koniec okna pomiarowego."""
+        if self._window_count == 0:
+            # Same błędy bez pomiarów - tylko zmniejsz limit
+            self._limit = max(self.min_limit, self._limit * self.backoff_ratio)
+            self._reset_window()
+            return
+
+        avg_rtt = self._window_sum / self._window_count
+
+        # Minimalne RTT okresowo resetujemy, aby nadążać za zmianami obciążenia
+        self._windows_since_reset += 1
+        if self._min_rtt is None or self._windows_since_reset >= self.min_rtt_reset_windows:
+            self._min_rtt = self._window_min_rtt
+            self._windows_since_reset = 0
+        elif self._window_min_rtt < self._min_rtt:
+            self._min_rtt = self._window_min_rtt
+
+        if self._window_dropped or avg_rtt > self._min_rtt * self.latency_tolerance:
+            # Kolejkowanie lub błędy - zmniejsz multiplikatywnie
+            self._limit = max(self.min_limit, self._limit * self.backoff_ratio)
+        elif self._max_in_flight_in_window * 2 >= self._limit:
+            # Zwiększamy tylko, gdy limit był faktycznie wykorzystywany
+            self._limit = min(self.max_limit, self._limit + 1)
+
+        self._reset_window()
+
+    def _reset_window(self) -> None:
+        """Rozpoczyna nowe okno pomiarowe."""
+        self._window_sum = 0.0
+        self._window_count = 0
+        self._window_min_rtt = None
+        self._window_dropped = False
+        self._max_in_flight_in_window = self._in_flight
@@ -21,11 +21,89 @@ class Settings(BaseSettings):
     # Konfiguracja JWT
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key")
     ALGORITHM: str = "HS256"
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Klucze asymetryczne: <kid>.pem w katalogu; bez katalogu - HS256 z SECRET_KEY
+    JWT_KEYS_DIR: Optional[str] = os.getenv("JWT_KEYS_DIR")
+    JWT_SIGNING_ALGORITHM: str = "RS256"
+    JWT_ACTIVE_KID: Optional[str] = None
+    JWT_KEY_ACTIVATION_DELAY: int = 300  # Nowy klucz podpisuje dopiero po publikacji w JWKS
+    JWT_KEYS_RELOAD_INTERVAL: int = 60
+    JWKS_CACHE_MAX_AGE: int = 300
+    INTROSPECTION_MAX_TOKENS: int = 100
+    # Krótkie tokeny dostępu - sesję podtrzymują rotowane tokeny odświeżania
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 5
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 14
+    TOKEN_LOCAL_CACHE_SIZE: int = 100000
+    TOKEN_LOCAL_CACHE_TTL: int = 300
+    TOKEN_REVOCATION_CHANNEL: str = "token_revocations"
+    TOKEN_REVOCATION_FILTER_CAPACITY: int = 100000
+    TOKEN_REVOCATION_FILTER_ERROR_RATE: float = 0.001
+    TOKEN_REVOCATION_FILTER_REBUILD_INTERVAL: int = 3600
+    REVOKED_TOKENS_PARTITION_PREMAKE_DAYS: int = 7
+    REVOKED_TOKENS_PARTITION_MAINTENANCE_CRON: str = "5 * * * *"
+    # Czyszczenie wygasłych wpisów partiami, z przerwami i limitem czasu jednego przebiegu
+    TOKEN_CLEANUP_BATCH_SIZE: int = 1000
+    TOKEN_CLEANUP_BATCH_DELAY: float = 0.1
+    TOKEN_CLEANUP_MAX_RUNTIME: float = 60.0
+    PASSWORD_RESET_ATTEMPT_RETENTION_HOURS: int = 24
+    # Użyte tokeny odświeżania zostają tyle czasu na potrzeby wykrywania ponownego użycia
+    REFRESH_TOKEN_REUSE_DETECTION_HOURS: int = 72
+
+    # Harmonogram zadań okresowych - zadania współdzielone wykonuje tylko lider
+    SCHEDULER_ENABLED: bool = True
+    SCHEDULER_TICK_INTERVAL: float = 1.0
+    SCHEDULER_LEADER_KEY: str = "scheduler:leader"
+    SCHEDULER_LEASE_TTL: float = 30.0
+    SCHEDULER_JOB_JITTER: float = 5.0
+    TOKEN_CLEANUP_INTERVAL: int = 600
+    TOKEN_METRICS_INTERVAL: int = 60
+    DB_METRICS_INTERVAL: int = 15
+    # Tryb bezstanowy - tożsamość z claimów JWT, bez zapytania o użytkownika
+    STATELESS_PRINCIPAL: bool = False
+    # Uprawnienia ról współdzielone między żądaniami; TTL ogranicza nieaktualność, gdy pub/sub nie działa
+    ROLE_PERMISSION_CACHE_TTL: int = 300
+    # Kanał pub/sub unieważnień uprawnień ról między workerami
+    ROLE_PERMISSION_INVALIDATION_CHANNEL: str = "role_permission_invalidations"
+    # Tabela role_effective_permissions utrzymywana przyrostowo, pełna odbudowa raz na dobę
+    ROLE_PERMISSION_CLOSURE_REBUILD_CRON: str = "30 3 * * *"
+    
+    # Konfiguracja hashowania haseł (pula procesów)
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_QUEUE: int = 64
+    PASSWORD_HASH_TIMEOUT: float = 5.0
+    
+    # Konfiguracja limitowania żądań (stan w pamięci procesu)
+    RATE_LIMIT_MAX_KEYS: int = 100000
+    RATE_LIMIT_SWEEP_BATCH: int = 8
+    RATE_LIMIT_SWEEP_INTERVAL: int = 60
+    # Wymiary limitu logowania: adres IP, konto (próg CAPTCHA) i limit globalny
+    LOGIN_LIMIT_PER_IP: int = 5
+    LOGIN_LIMIT_PER_IP_DEVELOPMENT: int = 20
+    LOGIN_LIMIT_PER_IP_WINDOW: int = 60
+    LOGIN_LIMIT_PER_ACCOUNT: int = 3
+    LOGIN_LIMIT_PER_ACCOUNT_WINDOW: int = 1800
+    LOGIN_LIMIT_GLOBAL: int = 1000
+    LOGIN_LIMIT_GLOBAL_WINDOW: int = 60
+    # Limity tras publicznych (rejestracja, reset hasła, odświeżanie tokenu) na adres IP
+    ROUTE_LIMIT_PER_IP: int = 3
+    ROUTE_LIMIT_PER_IP_DEVELOPMENT: int = 10
+    ROUTE_LIMIT_PER_IP_WINDOW: int = 60
+    # Odświeżanie co ~5 minut z każdej sesji - wielu klientów za jednym NAT dzieli adres IP;
+    # ponowne użycie tokenu odświeżania wykrywa rotacja rodziny, nie limit
+    TOKEN_REFRESH_LIMIT_PER_IP: int = 120
+    TOKEN_REFRESH_LIMIT_PER_IP_WINDOW: int = 60
+    
+    # Konfiguracja próbkowania zasobów systemowych
+    RESOURCE_SAMPLE_INTERVAL: float = 1.0
+    RESOURCE_SAMPLE_SMOOTHING: float = 0.3
     
     # Konfiguracja Redis
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://redis:6379/0")
     REDIS_PASSWORD: Optional[str] = os.getenv("REDIS_PASSWORD")
+    REDIS_POOL_SIZE: int = 50
+    REDIS_POOL_TIMEOUT: float = 1.0
+    REDIS_SOCKET_TIMEOUT: float = 0.5
+    REDIS_CONNECT_TIMEOUT: float = 1.0
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30
     
     @property
     def REDIS_HOST(self) -> str:
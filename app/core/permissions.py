@@ -1,4 +1,4 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Optional, Set
 from app.models.user import User
 
 class PermissionManager:
@@ -32,6 +32,104 @@ class PermissionManager:
             "moderator": ["user"],
             "user": []
         }
+        
+        # Uprawnienia internowane do bitów, domknięcie ról jako maska bitowa
+        self._permission_bits: Dict[str, int] = {}
+        self._role_masks: Dict[str, int] = {}
+        self._role_permissions: Dict[str, List[str]] = {}
+        self._rebuild()
+    
+    def _rebuild(self) -> None:
+        """Przelicza bity uprawnień i przechodnie domknięcie ról (po każdej zmianie ról lub uprawnień)."""
+        permission_bits: Dict[str, int] = {}
+        for role_data in self._roles.values():
+            for permission in role_data["permissions"]:
+                if permission not in permission_bits:
+                    permission_bits[permission] = 1 << len(permission_bits)
+        
+        role_masks: Dict[str, int] = {}
+        
+        def closure(role_name: str) -> int:
+            # Hierarchia jest acykliczna (add_role odrzuca cykle), więc każdy wynik można zapamiętać
+            if role_name in role_masks:
+                return role_masks[role_name]
+            if role_name not in self._roles:
+                return 0
+            mask = 0
+            for permission in self._roles[role_name]["permissions"]:
+                mask |= permission_bits[permission]
+            for inherited_role in self._role_hierarchy.get(role_name, []):
+                mask |= closure(inherited_role)
+            role_masks[role_name] = mask
+            return mask
+        
+        for role_name in self._roles:
+            closure(role_name)
+        
+        self._permission_bits = permission_bits
+        self._role_masks = role_masks
+        self._role_permissions = {
+            role_name: [permission for permission, bit in permission_bits.items() if mask & bit]
+            for role_name, mask in role_masks.items()
+        }
+    
+    def _inherits_from(self, role_name: str, ancestor: str) -> bool:
+        """Sprawdza, czy rola dziedziczy (bezpośrednio lub przechodnio) po podanej roli."""
+        pending = list(self._role_hierarchy.get(role_name, []))
+        seen: Set[str] = set()
+        while pending:
+            current = pending.pop()
+            if current == ancestor:
+                return True
+            if current not in seen:
+                seen.add(current)
+                pending.extend(self._role_hierarchy.get(current, []))
+        return False
+    
+    def add_role(
+        self,
+        role_name: str,
+        description: str,
+        permissions: Iterable[str] = (),
+        inherits: Iterable[str] = ()
+    ) -> None:
+        """Dodaje lub zastępuje rolę wraz z rolami, z których dziedziczy."""
+        inherits = list(inherits)
+        for inherited_role in inherits:
+            if inherited_role == role_name or self._inherits_from(inherited_role, role_name):
+                raise ValueError(f"Rola {inherited_role} dziedziczy po {role_name} - cykl w hierarchii ról")
+        self._roles[role_name] = {"description": description, "permissions": list(permissions)}
+        self._role_hierarchy[role_name] = inherits
+        self._rebuild()
+    
+    def remove_role(self, role_name: str) -> bool:
+        """Usuwa rolę i jej wystąpienia w hierarchii."""
+        if not self.role_exists(role_name):
+            return False
+        del self._roles[role_name]
+        self._role_hierarchy.pop(role_name, None)
+        for inherited_roles in self._role_hierarchy.values():
+            if role_name in inherited_roles:
+                inherited_roles.remove(role_name)
+        self._rebuild()
+        return True
+    
+    def grant_permission(self, role_name: str, permission: str) -> bool:
+        """Nadaje roli uprawnienie."""
+        if not self.role_exists(role_name):
+            return False
+        if permission not in self._roles[role_name]["permissions"]:
+            self._roles[role_name]["permissions"].append(permission)
+            self._rebuild()
+        return True
+    
+    def revoke_permission(self, role_name: str, permission: str) -> bool:
+        """Odbiera roli uprawnienie (uprawnienia dziedziczone pozostają)."""
+        if not self.role_exists(role_name) or permission not in self._roles[role_name]["permissions"]:
+            return False
+        self._roles[role_name]["permissions"].remove(permission)
+        self._rebuild()
+        return True
     
     def role_exists(self, role_name: str) -> bool:
         """Sprawdza czy rola istnieje."""
@@ -39,27 +137,16 @@ class PermissionManager:
     
     def get_role_permissions(self, role_name: str) -> List[str]:
         """Pobiera listę uprawnień dla danej roli."""
-        if not self.role_exists(role_name):
-            return []
-            
-        permissions = set(self._roles[role_name]["permissions"])
-        
-        # Dodaj uprawnienia z ról podrzędnych
-        for inherited_role in self._role_hierarchy.get(role_name, []):
-            permissions.update(self.get_role_permissions(inherited_role))
-            
-        return list(permissions)
+        return list(self._role_permissions.get(role_name, ()))
     
     def has_permission(self, role_name: str, permission: str) -> bool:
         """Sprawdza czy rola ma dane uprawnienie."""
-        return permission in self.get_role_permissions(role_name)
+        bit = self._permission_bits.get(permission)
+        return bit is not None and (self._role_masks.get(role_name, 0) & bit) != 0
     
     def permission_exists(self, permission_name: str) -> bool:
         """Sprawdza czy uprawnienie istnieje w systemie."""
-        for role_data in self._roles.values():
-            if permission_name in role_data["permissions"]:
-                return True
-        return False
+        return permission_name in self._permission_bits
     
     def get_user_permissions(self, user: User) -> List[str]:
         """Pobiera listę uprawnień dla użytkownika."""
@@ -80,12 +167,10 @@ class PermissionManager:
         if user.is_superuser:
             return True
             
-        user_permissions = self.get_user_permissions(user)
-        
         # Sprawdź uprawnienia do własnego profilu
         if resource == "own_profile" and action == "users:read":
             return True
             
         # Sprawdź standardowe uprawnienia
         required_permission = f"{resource}:{action}"
-        return required_permission in user_permissions 
\ No newline at end of file
+        return self.has_permission(user.role, required_permission) 
\ No newline at end of file
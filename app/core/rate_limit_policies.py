@@ -0,0 +1,46 @@
+from app.core.config import settings
+from app.core.rate_limiter import LimitDimension, RateLimitPolicy
+import os
+
+ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
+
+# Limit logowań z adresu IP - mniej restrykcyjny w development
+LOGIN_LIMIT_PER_IP = (
+    settings.LOGIN_LIMIT_PER_IP_DEVELOPMENT if ENVIRONMENT == "development"
+    else settings.LOGIN_LIMIT_PER_IP
+)
+
+# Logowanie: wszystkie wymiary sprawdzane i zaliczane jednym wywołaniem Redis
+login_rate_limit = RateLimitPolicy("login", [
+    LimitDimension("ip", LOGIN_LIMIT_PER_IP, settings.LOGIN_LIMIT_PER_IP_WINDOW),
+    LimitDimension("account", settings.LOGIN_LIMIT_PER_ACCOUNT, settings.LOGIN_LIMIT_PER_ACCOUNT_WINDOW),
+    LimitDimension("global", settings.LOGIN_LIMIT_GLOBAL, settings.LOGIN_LIMIT_GLOBAL_WINDOW, shared=True),
+])
+
+# Limit tras publicznych - mniej restrykcyjny w development
+ROUTE_LIMIT_PER_IP = (
+    settings.ROUTE_LIMIT_PER_IP_DEVELOPMENT if ENVIRONMENT == "development"
+    else settings.ROUTE_LIMIT_PER_IP
+)
+
+register_rate_limit = RateLimitPolicy("register", [
+    LimitDimension("ip", ROUTE_LIMIT_PER_IP, settings.ROUTE_LIMIT_PER_IP_WINDOW),
+])
+
+password_reset_rate_limit = RateLimitPolicy("password_reset", [
+    LimitDimension("ip", ROUTE_LIMIT_PER_IP, settings.ROUTE_LIMIT_PER_IP_WINDOW),
+])
+
+token_refresh_rate_limit = RateLimitPolicy("token_refresh", [
+    LimitDimension("ip", settings.TOKEN_REFRESH_LIMIT_PER_IP, settings.TOKEN_REFRESH_LIMIT_PER_IP_WINDOW),
+])
+
+# Limity tras egzekwowane przez RateLimitMiddleware przed parsowaniem treści żądania:
+# (metoda, szablon ścieżki, polityka). Polityki tras mają wyłącznie wymiary "ip" i współdzielone.
+# Logowanie limituje handler - wymiar konta wymaga nazwy użytkownika z formularza.
+ROUTE_RATE_LIMITS = [
+    ("POST", "/api/users", register_rate_limit),
+    ("POST", "/api/users/reset-password", password_reset_rate_limit),
+    ("POST", "/api/users/reset-password/confirm", password_reset_rate_limit),
+    ("POST", "/api/users/token/refresh", token_refresh_rate_limit),
+]
@@ -1,26 +1,404 @@
-from datetime import datetime, timedelta
-from typing import Dict, Tuple
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from app.core.cache import redis_cache
+from app.core.config import settings
+from app.monitoring.rate_limit_metrics import (
+    RATE_LIMITER_KEYS,
+    RATE_LIMITER_EVICTIONS,
+    RATE_LIMITER_FALLBACKS
+)
+import logging
+import math
+import time
+import weakref
+import redis
+
+logger = logging.getLogger(__name__)
+
+# Limitery w pamięci procesu - przeglądane okresowo przez sweep_rate_limiters
+_limiters: "weakref.WeakSet[RateLimiter]" = weakref.WeakSet()
+
+class RateLimitResult:
+    """Wynik sprawdzenia limitu: decyzja, pozostała pula i czasy w sekundach."""
+    __slots__ = ("allowed", "limit", "remaining", "reset_after", "retry_after")
+
+    def __init__(self, allowed: bool, limit: int, remaining: int, reset_after: float, retry_after: float):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        self.reset_after = reset_after
+        self.retry_after = retry_after
+
+class _WindowState:
+    """Stały rekord klucza: początek bieżącego okna i liczniki dwóch okien."""
+    __slots__ = ("start", "previous", "current")
+
+    def __init__(self, start: float):
+        self.start = start
+        self.previous = 0
+        self.current = 0
+
+def _retry_after(max_requests: int, window: float, previous: int, current: int, elapsed: float) -> float:
+    """Wylicza, po ilu sekundach szacunek zwolni miejsce na jedno żądanie."""
+    budget = max_requests - 1 - current
+    if budget >= 0 and previous > 0:
+        # Wystarczy, że waga poprzedniego okna spadnie w obrębie bieżącego
+        return max(0.0, window - budget * window / previous - elapsed)
+    # Bieżące okno jest pełne - liczy się jako poprzednie w kolejnym oknie
+    next_budget = max_requests - 1
+    wait_in_next = window - next_budget * window / current if current > next_budget else 0.0
+    return window - elapsed + max(0.0, wait_in_next)
+
+def _window_result(
+    max_requests: int,
+    window: float,
+    allowed: bool,
+    estimated: float,
+    elapsed: float,
+    previous: int,
+    current: int
+) -> RateLimitResult:
+    """Buduje wynik z szacunku przesuwanego okna (przed zaliczeniem żądania)."""
+    reset_after = window - elapsed
+    if not allowed:
+        return RateLimitResult(
+            False, max_requests, 0, reset_after,
+            _retry_after(max_requests, window, previous, current, elapsed)
+        )
+    remaining = max(0, math.floor(max_requests - estimated - 1))
+    return RateLimitResult(True, max_requests, remaining, reset_after, 0.0)
 
 class RateLimiter:
-    def __init__(self, max_requests: int = 10, window_seconds: int = 60):
+    """Limit żądań metodą przesuwanego okna z licznikami (pamięć O(1) na klucz, ograniczona liczba kluczy)."""
+
+    def __init__(
+        self,
+        max_requests: int = 10,
+        window_seconds: int = 60,
+        clock: Callable[[], float] = time.monotonic,
+        max_keys: int = settings.RATE_LIMIT_MAX_KEYS,
+        sweep_batch: int = settings.RATE_LIMIT_SWEEP_BATCH,
+        name: str = "default"
+    ):
         self.max_requests = max_requests
         self.window_seconds = window_seconds
-        self._requests: Dict[str, list] = {}
-    
+        self.max_keys = max_keys
+        self.sweep_batch = sweep_batch
+        self.name = name
+        self._clock = clock
+        self._windows: "OrderedDict[str, _WindowState]" = OrderedDict()
+        self._idle_evictions = RATE_LIMITER_EVICTIONS.labels(limiter=name, reason="idle")
+        self._capacity_evictions = RATE_LIMITER_EVICTIONS.labels(limiter=name, reason="capacity")
+        RATE_LIMITER_KEYS.labels(limiter=name).set_function(lambda: len(self._windows))
+        _limiters.add(self)
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+    def _evict_idle(self, now: float, limit: int) -> int:
+        """Usuwa z początku kolejki LRU do limit kluczy, których oba okna już minęły."""
+        # Kolejność LRU jest zgodna z początkami okien - pierwszy aktywny klucz kończy przegląd
+        idle_before = now - 2 * self.window_seconds
+        evicted = 0
+        while evicted < limit and self._windows:
+            key, state = next(iter(self._windows.items()))
+            if state.start > idle_before:
+                break
+            del self._windows[key]
+            evicted += 1
+        if evicted:
+            self._idle_evictions.inc(evicted)
+        return evicted
+
+    def sweep(self) -> int:
+        """Usuwa wszystkie bezczynne klucze (np. z zadania okresowego)."""
+        return self._evict_idle(self._clock(), len(self._windows))
+
+    def _evaluate(self, key: str) -> Tuple[_WindowState, float, float]:
+        """Zwraca stan klucza po przejściu okna, szacunek przesuwanego okna i czas od początku okna."""
+        now = self._clock()
+        window = self.window_seconds
+        start = now - now % window
+
+        # Przyrostowy przegląd - stały koszt na żądanie zamiast O(n)
+        self._evict_idle(now, self.sweep_batch)
+
+        state = self._windows.get(key)
+        if state is None:
+            state = self._windows[key] = _WindowState(start)
+            if len(self._windows) > self.max_keys:
+                self._windows.popitem(last=False)
+                self._capacity_evictions.inc()
+        else:
+            self._windows.move_to_end(key)
+        if state.start != start:
+            # Przejście do nowego okna: bieżący licznik staje się poprzednim tylko dla okna sąsiedniego
+            state.previous = state.current if start - state.start == window else 0
+            state.current = 0
+            state.start = start
+
+        elapsed = now - start
+        # Szacunek przesuwanego okna: część poprzedniego okna, która jeszcze się w nim mieści
+        estimated = state.previous * (window - elapsed) / window + state.current
+        return state, estimated, elapsed
+
+    def check(self, key: str) -> RateLimitResult:
+        """Sprawdza limit klucza i, jeśli jest miejsce, zalicza żądanie."""
+        state, estimated, elapsed = self._evaluate(key)
+        allowed = estimated + 1 <= self.max_requests
+        result = _window_result(
+            self.max_requests, self.window_seconds, allowed, estimated, elapsed, state.previous, state.current
+        )
+        if allowed:
+            state.current += 1
+        return result
+
+    def reset(self, key: str) -> None:
+        """Usuwa stan klucza."""
+        self._windows.pop(key, None)
+
     def is_allowed(self, key: str) -> Tuple[bool, int]:
-        now = datetime.utcnow()
-        window_start = now - timedelta(seconds=self.window_seconds)
-        
-        if key not in self._requests:
-            self._requests[key] = []
-        
-        # Usuń stare requesty
-        self._requests[key] = [ts for ts in self._requests[key] if ts > window_start]
-        
-        # Sprawdź limit
-        if len(self._requests[key]) >= self.max_requests:
-            return False, self.window_seconds
-        
-        # Dodaj nowy request
-        self._requests[key].append(now)
-        return True, 0 
\ No newline at end of file
+        """Zwraca decyzję i liczbę sekund do ponownej próby."""
+        result = self.check(key)
+        return result.allowed, math.ceil(result.retry_after)
+
+def sweep_rate_limiters() -> int:
+    """Usuwa bezczynne klucze ze wszystkich limiterów procesu (także zapasowych limiterów Redis)."""
+    return sum(limiter.sweep() for limiter in list(_limiters))
+
+# Przesuwane okno dla wielu kluczy naraz (ARGV: limit i okno kolejnych kluczy).
+# Żądanie jest zaliczane we wszystkich wymiarach albo w żadnym. Czas pochodzi z Redis,
+# więc wszystkie workery i pody liczą te same okna.
+WINDOW_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local allowed = 1
+local states = {}
+for i = 1, #KEYS do
+    local limit = tonumber(ARGV[2 * i - 1])
+    local window = tonumber(ARGV[2 * i])
+    local start = now - (now % window)
+    local state = redis.call('HMGET', KEYS[i], 'start', 'previous', 'current')
+    local state_start = tonumber(state[1])
+    local previous = tonumber(state[2]) or 0
+    local current = tonumber(state[3]) or 0
+    if state_start == nil then
+        previous = 0
+        current = 0
+    elseif state_start ~= start then
+        if start - state_start == window then previous = current else previous = 0 end
+        current = 0
+    end
+    local elapsed = now - start
+    local estimated = previous * (window - elapsed) / window + current
+    if estimated + 1 > limit then allowed = 0 end
+    states[i] = {start, previous, current, elapsed, estimated, window}
+end
+local reply = {allowed}
+for i = 1, #KEYS do
+    local state = states[i]
+    redis.call('HSET', KEYS[i], 'start', state[1], 'previous', state[2], 'current', state[3] + allowed)
+    redis.call('PEXPIRE', KEYS[i], math.ceil(state[6] * 2000))
+    table.insert(reply, tostring(state[5]))
+    table.insert(reply, tostring(state[4]))
+    table.insert(reply, state[2])
+    table.insert(reply, state[3])
+end
+return reply
+"""
+
+class _WindowScript:
+    """Skrypt WINDOW_SCRIPT zarejestrowany dla bieżącego klienta Redis (EVALSHA, EVAL przy NOSCRIPT)."""
+
+    def __init__(self, cache):
+        self._cache = cache
+        self._client = None
+        self._script = None
+
+    async def __call__(
+        self,
+        keys: Sequence[str],
+        limits: Sequence[Tuple[int, float]]
+    ) -> Tuple[bool, List[RateLimitResult]]:
+        """Ocenia wszystkie klucze jednym wywołaniem; zwraca decyzję łączną i wyniki kluczy."""
+        client = self._cache.client
+        if self._script is None or client is not self._client:
+            self._client = client
+            self._script = client.register_script(WINDOW_SCRIPT)
+        args = [value for limit in limits for value in limit]
+        reply = await self._script(keys=list(keys), args=args)
+
+        allowed = bool(int(reply[0]))
+        results = []
+        for index, (max_requests, window) in enumerate(limits):
+            estimated, elapsed, previous, current = reply[1 + 4 * index:5 + 4 * index]
+            estimated = float(estimated)
+            key_allowed = estimated + 1 <= max_requests
+            results.append(_window_result(
+                max_requests, window, key_allowed, estimated, float(elapsed), int(previous), int(current)
+            ))
+        return allowed, results
+
+class RedisRateLimiter:
+    """Współdzielony limit przesuwanego okna w Redis - jedno wywołanie skryptu Lua na sprawdzenie."""
+
+    def __init__(
+        self,
+        max_requests: int = 10,
+        window_seconds: int = 60,
+        name: str = "default",
+        cache=redis_cache,
+        fallback: Optional[RateLimiter] = None
+    ):
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self.name = name
+        self._script = _WindowScript(cache)
+        # Przy niedostępnym Redis limit egzekwuje każdy proces osobno
+        self._fallback = fallback if fallback is not None else RateLimiter(
+            max_requests, window_seconds, name=f"{name}-fallback"
+        )
+        self._fallbacks = RATE_LIMITER_FALLBACKS.labels(limiter=name)
+
+    def _key(self, key: str) -> str:
+        """Zwraca klucz Redis stanu limitu."""
+        return f"ratelimit:{self.name}:{key}"
+
+    async def check(self, key: str) -> RateLimitResult:
+        """Sprawdza i zalicza żądanie atomowo w Redis; przy błędzie używa limitu lokalnego."""
+        try:
+            _, results = await self._script([self._key(key)], [(self.max_requests, self.window_seconds)])
+        except redis.RedisError as e:
+            self._fallbacks.inc()
+            logger.warning(f"Limit {self.name} sprawdzany lokalnie - błąd Redis: {e}")
+            return self._fallback.check(key)
+        return results[0]
+
+    async def is_allowed(self, key: str) -> Tuple[bool, int]:
+        """Zwraca decyzję i liczbę sekund do ponownej próby."""
+        result = await self.check(key)
+        return result.allowed, math.ceil(result.retry_after)
+
+class LimitDimension:
+    """Wymiar polityki limitu, np. adres IP, konto lub limit globalny."""
+    __slots__ = ("name", "max_requests", "window_seconds", "shared")
+
+    def __init__(self, name: str, max_requests: int, window_seconds: int, shared: bool = False):
+        self.name = name
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        # Wymiar współdzielony ma jeden licznik dla wszystkich żądań
+        self.shared = shared
+
+class PolicyDecision:
+    """Wynik polityki: decyzja łączna, wyniki wymiarów i wymiar, który zablokował żądanie."""
+    __slots__ = ("allowed", "results", "tripped")
+
+    def __init__(self, allowed: bool, results: Dict[str, RateLimitResult]):
+        self.allowed = allowed
+        self.results = results
+        self.tripped: Optional[str] = None
+        if not allowed:
+            # Wiążący jest wymiar, który zwolni miejsce najpóźniej
+            denied = self.denied
+            self.tripped = max(denied, key=lambda name: results[name].retry_after) if denied else None
+
+    @property
+    def denied(self) -> List[str]:
+        """Zwraca nazwy wszystkich wymiarów, które odrzuciły żądanie."""
+        return [name for name, result in self.results.items() if not result.allowed]
+
+    @property
+    def limiting(self) -> RateLimitResult:
+        """Zwraca wynik wymiaru decydującego (zablokowanego lub z najmniejszą pulą)."""
+        if self.tripped is not None:
+            return self.results[self.tripped]
+        return min(self.results.values(), key=lambda result: result.remaining)
+
+    @property
+    def retry_after(self) -> float:
+        """Zwraca czas do ponownej próby w sekundach."""
+        return self.limiting.retry_after
+
+class RateLimitPolicy:
+    """Polityka wielu wymiarów limitu sprawdzanych i zaliczanych razem w jednym wywołaniu Redis."""
+
+    def __init__(self, name: str, dimensions: Sequence[LimitDimension], cache=redis_cache):
+        self.name = name
+        self.dimensions = list(dimensions)
+        self._cache = cache
+        self._script = _WindowScript(cache)
+        # Przy niedostępnym Redis wymiary egzekwuje każdy proces osobno
+        self._fallback = {
+            dimension.name: RateLimiter(
+                dimension.max_requests,
+                dimension.window_seconds,
+                name=f"{name}-{dimension.name}-fallback"
+            )
+            for dimension in self.dimensions
+        }
+        self._fallbacks = RATE_LIMITER_FALLBACKS.labels(limiter=name)
+
+    def _identifier(self, dimension: LimitDimension, identifiers: Dict[str, str]) -> str:
+        """Zwraca identyfikator żądania w danym wymiarze."""
+        return "*" if dimension.shared else identifiers[dimension.name]
+
+    def _key(self, dimension: LimitDimension, identifier: str) -> str:
+        """Zwraca klucz Redis stanu wymiaru."""
+        return f"ratelimit:{self.name}:{dimension.name}:{identifier}"
+
+    def _check_locally(self, dimensions: List[LimitDimension], identifiers: Dict[str, str]) -> PolicyDecision:
+        """Ocenia politykę limitami w pamięci procesu (wszystkie wymiary albo żaden)."""
+        evaluated = []
+        for dimension in dimensions:
+            limiter = self._fallback[dimension.name]
+            state, estimated, elapsed = limiter._evaluate(self._identifier(dimension, identifiers))
+            evaluated.append((dimension, state, estimated, elapsed))
+        allowed = all(estimated + 1 <= dimension.max_requests for dimension, _, estimated, _ in evaluated)
+
+        results = {}
+        for dimension, state, estimated, elapsed in evaluated:
+            results[dimension.name] = _window_result(
+                dimension.max_requests,
+                dimension.window_seconds,
+                estimated + 1 <= dimension.max_requests,
+                estimated,
+                elapsed,
+                state.previous,
+                state.current
+            )
+            if allowed:
+                state.current += 1
+        return PolicyDecision(allowed, results)
+
+    async def _check(self, dimensions: List[LimitDimension], identifiers: Dict[str, str]) -> PolicyDecision:
+        """Sprawdza i zalicza żądanie w podanych wymiarach jednym wywołaniem Redis."""
+        keys = [self._key(dimension, self._identifier(dimension, identifiers)) for dimension in dimensions]
+        limits = [(dimension.max_requests, dimension.window_seconds) for dimension in dimensions]
+        try:
+            allowed, results = await self._script(keys, limits)
+        except redis.RedisError as e:
+            self._fallbacks.inc()
+            logger.warning(f"Limit {self.name} sprawdzany lokalnie - błąd Redis: {e}")
+            return self._check_locally(dimensions, identifiers)
+        return PolicyDecision(
+            allowed,
+            {dimension.name: result for dimension, result in zip(dimensions, results)}
+        )
+
+    async def check(self, **identifiers: str) -> PolicyDecision:
+        """Sprawdza i zalicza żądanie we wszystkich wymiarach naraz, np. check(ip=..., account=...)."""
+        return await self._check(self.dimensions, identifiers)
+
+    async def check_without(self, excluded: str, **identifiers: str) -> PolicyDecision:
+        """Sprawdza i zalicza żądanie we wszystkich wymiarach poza excluded (np. konta po weryfikacji CAPTCHA)."""
+        return await self._check([d for d in self.dimensions if d.name != excluded], identifiers)
+
+    async def reset(self, dimension_name: str, identifier: str) -> None:
+        """Zeruje licznik wymiaru dla identyfikatora (np. konta po udanym logowaniu)."""
+        dimension = next(d for d in self.dimensions if d.name == dimension_name)
+        self._fallback[dimension_name].reset(identifier)
+        try:
+            await self._cache.client.delete(self._key(dimension, identifier))
+        except redis.RedisError as e:
+            logger.warning(f"Nie udało się wyzerować limitu {self.name}/{dimension_name}: {e}")
@@ -0,0 +1,324 @@
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, FrozenSet, List, Optional, Tuple
+from app.core.cache import redis_cache
+from app.core.config import settings
+from app.monitoring.scheduler_metrics import (
+    SCHEDULER_LEADER,
+    SCHEDULER_JOB_DURATION,
+    SCHEDULER_JOB_RUNS,
+    SCHEDULER_JOB_OVERLAPS,
+    SCHEDULER_JOB_MISSED
+)
+import asyncio
+import logging
+import random
+import time
+import uuid
+import redis
+
+logger = logging.getLogger(__name__)
+
+# Limit zliczania pominiętych uruchomień - chroni przed długą pętlą po wielodniowej przerwie
+MAX_MISSED_COUNT = 1000
+
+def _parse_cron_field(field: str, low: int, high: int) -> FrozenSet[int]:
+    """Parsuje pole wyrażenia cron (*, */n, a, a-b, a-b/n, listy po przecinku)."""
+    values = set()
+    for part in field.split(","):
+        step = 1
+        has_step = "/" in part
+        if has_step:
+            part, step_text = part.split("/", 1)
+            step = int(step_text)
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = (int(value) for value in part.split("-", 1))
+        else:
+            start = int(part)
+            end = high if has_step else start
+        if step < 1 or start < low or end > high or start > end:
+            raise ValueError(f"Nieprawidłowe pole wyrażenia cron: {field}")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+class CronSchedule:
+    """Uproszczone wyrażenie cron (minuta godzina dzień miesiąc dzień_tygodnia) w UTC."""
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Wyrażenie cron musi mieć 5 pól: {expression}")
+        self.expression = expression
+        self.minutes = _parse_cron_field(fields[0], 0, 59)
+        self.hours = _parse_cron_field(fields[1], 0, 23)
+        self.days = _parse_cron_field(fields[2], 1, 31)
+        self.months = _parse_cron_field(fields[3], 1, 12)
+        # 0 i 7 oznaczają niedzielę
+        self.weekdays = frozenset(day % 7 for day in _parse_cron_field(fields[4], 0, 7))
+        self._days_restricted = fields[2] != "*"
+        self._weekdays_restricted = fields[4] != "*"
+
+    def _day_matches(self, moment: datetime) -> bool:
+        """Sprawdza dzień miesiąca i tygodnia (jak w cron: OR, gdy oba są zawężone)."""
+        day_match = moment.day in self.days
+        weekday_match = (moment.weekday() + 1) % 7 in self.weekdays
+        if self._days_restricted and self._weekdays_restricted:
+            return day_match or weekday_match
+        return day_match and weekday_match
+
+    def next_after(self, moment: datetime) -> datetime:
+        """Zwraca pierwszą pasującą minutę późniejszą niż podana chwila."""
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit_year = moment.year + 5
+        while candidate.year <= limit_year:
+            if candidate.month not in self.months:
+                # Przeskok na początek następnego miesiąca
+                candidate = (candidate.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+            elif candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError(f"Wyrażenie cron nigdy nie pasuje: {self.expression}")
+
+class RedisLease:
+    """Dzierżawa lidera w Redis: SET NX PX, przedłużana i zwalniana tylko przez właściciela."""
+
+    RENEW_SCRIPT = (
+        "if redis.call('get', KEYS[1]) == ARGV[1] then "
+        "return redis.call('pexpire', KEYS[1], ARGV[2]) else return 0 end"
+    )
+    RELEASE_SCRIPT = (
+        "if redis.call('get', KEYS[1]) == ARGV[1] then "
+        "return redis.call('del', KEYS[1]) else return 0 end"
+    )
+
+    def __init__(
+        self,
+        key: str = settings.SCHEDULER_LEADER_KEY,
+        ttl: float = settings.SCHEDULER_LEASE_TTL,
+        cache=redis_cache
+    ):
+        self.key = key
+        self.ttl = ttl
+        self.owner = uuid.uuid4().hex
+        self._cache = cache
+
+    async def acquire(self) -> bool:
+        """Przejmuje lub przedłuża dzierżawę; False, gdy należy do innego workera."""
+        ttl_ms = int(self.ttl * 1000)
+        try:
+            client = self._cache.client
+            if await client.set(self.key, self.owner, nx=True, px=ttl_ms):
+                return True
+            return bool(await client.eval(self.RENEW_SCRIPT, 1, self.key, self.owner, ttl_ms))
+        except redis.RedisError as e:
+            # Bez Redis nie wiemy, kto jest liderem - bezpieczniej nie uruchamiać zadań
+            logger.error(f"Błąd dzierżawy lidera harmonogramu: {e}")
+            return False
+
+    async def release(self) -> None:
+        """Zwalnia dzierżawę, jeśli należy do tego workera."""
+        try:
+            await self._cache.client.eval(self.RELEASE_SCRIPT, 1, self.key, self.owner)
+        except redis.RedisError as e:
+            logger.error(f"Błąd zwalniania dzierżawy lidera harmonogramu: {e}")
+
+class LocalLease:
+    """Zastępnik dzierżawy w obrębie procesu (testy, instalacje z jednym workerem)."""
+
+    _holders: Dict[str, Tuple[str, float]] = {}
+
+    def __init__(self, key: str = settings.SCHEDULER_LEADER_KEY, ttl: float = settings.SCHEDULER_LEASE_TTL):
+        self.key = key
+        self.ttl = ttl
+        self.owner = uuid.uuid4().hex
+
+    async def acquire(self) -> bool:
+        """Przejmuje lub przedłuża dzierżawę; False, gdy należy do innego właściciela."""
+        now = time.monotonic()
+        holder = self._holders.get(self.key)
+        if holder is not None and holder[0] != self.owner and holder[1] > now:
+            return False
+        self._holders[self.key] = (self.owner, now + self.ttl)
+        return True
+
+    async def release(self) -> None:
+        """Zwalnia dzierżawę, jeśli należy do tego właściciela."""
+        holder = self._holders.get(self.key)
+        if holder is not None and holder[0] == self.owner:
+            del self._holders[self.key]
+
+class Job:
+    """Zadanie okresowe: stały interwał albo wyrażenie cron, z losowym przesunięciem."""
+    __slots__ = ("name", "func", "interval", "cron", "jitter", "leader_only", "next_run", "task")
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[], Awaitable[None]],
+        interval: Optional[float] = None,
+        cron: Optional[str] = None,
+        jitter: float = 0.0,
+        leader_only: bool = True
+    ):
+        if (interval is None) == (cron is None):
+            raise ValueError("Zadanie wymaga dokładnie jednego z parametrów: interval lub cron")
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.cron = CronSchedule(cron) if cron is not None else None
+        self.jitter = jitter
+        self.leader_only = leader_only
+        self.next_run = 0.0
+        self.task: Optional[asyncio.Task] = None
+
+    def _next_slot(self, after: float) -> float:
+        """Zwraca termin kolejnego uruchomienia (bez przesunięcia) późniejszy niż after."""
+        if self.cron is not None:
+            moment = datetime.fromtimestamp(after, timezone.utc)
+            return self.cron.next_after(moment).timestamp()
+        return after + self.interval
+
+    def schedule(self, now: float) -> None:
+        """Wyznacza kolejne uruchomienie z losowym przesunięciem."""
+        # Przesunięcie rozkłada zadania wielu instalacji i workerów w czasie
+        self.next_run = self._next_slot(now) + random.uniform(0, self.jitter)
+
+    def missed_runs(self, now: float) -> int:
+        """Zlicza terminy, które minęły między zaległym uruchomieniem a chwilą obecną."""
+        missed = 0
+        slot = self._next_slot(self.next_run)
+        while slot <= now and missed < MAX_MISSED_COUNT:
+            missed += 1
+            slot = self._next_slot(slot)
+        return missed
+
+class JobScheduler:
+    """Harmonogram zadań okresowych w aplikacji z wyborem lidera przez dzierżawę."""
+
+    def __init__(self, lease=None, tick: float = settings.SCHEDULER_TICK_INTERVAL):
+        self.lease = lease if lease is not None else RedisLease()
+        self.tick = tick
+        self._jobs: Dict[str, Job] = {}
+        self._is_leader = False
+        self._lease_checked_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_leader(self) -> bool:
+        """Czy ten worker posiada dzierżawę lidera."""
+        return self._is_leader
+
+    @property
+    def jobs(self) -> List[Job]:
+        """Zwraca zarejestrowane zadania."""
+        return list(self._jobs.values())
+
+    def add_job(
+        self,
+        name: str,
+        func: Callable[[], Awaitable[None]],
+        interval: Optional[float] = None,
+        cron: Optional[str] = None,
+        jitter: float = 0.0,
+        leader_only: bool = True
+    ) -> Job:
+        """Rejestruje zadanie; leader_only=False oznacza wykonanie w każdym workerze."""
+        if name in self._jobs:
+            raise ValueError(f"Zadanie {name} jest już zarejestrowane")
+        job = Job(name, func, interval=interval, cron=cron, jitter=jitter, leader_only=leader_only)
+        job.schedule(time.time())
+        self._jobs[name] = job
+        return job
+
+    async def _refresh_leadership(self, now: float) -> None:
+        """Przedłuża lub przejmuje dzierżawę co 1/3 jej czasu życia."""
+        if self._lease_checked_at is not None and now - self._lease_checked_at < self.lease.ttl / 3:
+            return
+        self._lease_checked_at = now
+        is_leader = await self.lease.acquire()
+        if is_leader != self._is_leader:
+            logger.info(
+                "Przejęto rolę lidera harmonogramu" if is_leader else "Utracono rolę lidera harmonogramu"
+            )
+        self._is_leader = is_leader
+        SCHEDULER_LEADER.set(1 if is_leader else 0)
+
+    async def run_pending(self, now: Optional[float] = None) -> List[str]:
+        """Wykonuje jeden takt: odświeża dzierżawę i uruchamia zaległe zadania."""
+        now = time.time() if now is None else now
+        await self._refresh_leadership(now)
+        started = []
+        for job in self._jobs.values():
+            if now < job.next_run:
+                continue
+            if job.leader_only and not self._is_leader:
+                # Termin przepada - nowy lider nie nadrabia cudzych uruchomień
+                job.schedule(now)
+                continue
+            missed = job.missed_runs(now)
+            if missed:
+                # Zaległe terminy łączymy w jedno uruchomienie
+                SCHEDULER_JOB_MISSED.labels(job=job.name).inc(missed)
+            job.schedule(now)
+            if job.task is not None and not job.task.done():
+                SCHEDULER_JOB_OVERLAPS.labels(job=job.name).inc()
+                logger.warning(f"Zadanie {job.name} nadal trwa - pomijam kolejne uruchomienie")
+                continue
+            job.task = asyncio.create_task(self._run_job(job))
+            started.append(job.name)
+        return started
+
+    async def _run_job(self, job: Job) -> None:
+        """Uruchamia zadanie, mierząc czas i status."""
+        status = "success"
+        with SCHEDULER_JOB_DURATION.labels(job=job.name).time():
+            try:
+                await job.func()
+            except asyncio.CancelledError:
+                status = "cancelled"
+                raise
+            except Exception as e:
+                status = "error"
+                logger.error(f"Błąd zadania {job.name}: {str(e)}")
+            finally:
+                SCHEDULER_JOB_RUNS.labels(job=job.name, status=status).inc()
+
+    async def _run(self) -> None:
+        """Pętla harmonogramu działająca w tle."""
+        while True:
+            try:
+                await self.run_pending()
+            except Exception as e:
+                logger.error(f"Błąd harmonogramu zadań: {str(e)}")
+            await asyncio.sleep(self.tick)
+
+    async def start(self) -> None:
+        """Uruchamia harmonogram (wywoływane w lifespan)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Zatrzymuje harmonogram, przerywa trwające zadania i zwalnia dzierżawę."""
+        tasks = [self._task] + [job.task for job in self._jobs.values()]
+        for task in tasks:
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = None
+        if self._is_leader:
+            await self.lease.release()
+            self._is_leader = False
+            SCHEDULER_LEADER.set(0)
+        self._lease_checked_at = None
+
+# Globalna instancja harmonogramu zadań
+scheduler = JobScheduler()
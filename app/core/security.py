@@ -1,10 +1,13 @@
 from datetime import datetime, timedelta
 from typing import Any, Union
 from passlib.context import CryptContext
-from jose import jwt
+from app.core.signing_keys import key_ring
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Wersje synchroniczne - tylko poza pętlą zdarzeń (skrypty, testy).
+# Handlery async korzystają z app.services.hashing_service.
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Weryfikuje, czy hasło jest poprawne."""
     return pwd_context.verify(plain_password, hashed_password)
@@ -22,5 +25,4 @@ def create_access_token(
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
     to_encode = {"exp": expire, "sub": str(subject)}
-    encoded_jwt = jwt.encode(to_encode, "your-secret-key", algorithm="HS256")
-    return encoded_jwt 
\ No newline at end of file
+    return key_ring.encode(to_encode) 
\ No newline at end of file
@@ -0,0 +1,152 @@
+from jose import jwk, jwt, JWTError
+from jose.backends.base import Key
+from typing import Dict, Optional
+from app.core.config import settings
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+class SigningKey:
+    """Klucz JWT z identyfikatorem (kid) i sparsowanymi obiektami kluczy."""
+    __slots__ = ("kid", "algorithm", "signing_key", "verifying_key", "activates_at")
+
+    def __init__(
+        self,
+        kid: Optional[str],
+        algorithm: str,
+        signing_key: Key,
+        verifying_key: Key,
+        activates_at: float = 0.0
+    ):
+        self.kid = kid
+        self.algorithm = algorithm
+        self.signing_key = signing_key
+        self.verifying_key = verifying_key
+        self.activates_at = activates_at
+
+    def public_jwk(self) -> dict:
+        """Zwraca publiczną część klucza w formacie JWK."""
+        data = self.verifying_key.to_dict()
+        data.update({"kid": self.kid, "use": "sig", "alg": self.algorithm})
+        return data
+
+class KeyRing:
+    """Zestaw kluczy JWT: jeden podpisujący, wszystkie obecne weryfikujące (nakładanie przy rotacji)."""
+
+    def __init__(
+        self,
+        keys_dir: Optional[str] = settings.JWT_KEYS_DIR,
+        algorithm: str = settings.JWT_SIGNING_ALGORITHM,
+        secret_key: str = settings.SECRET_KEY,
+        secret_algorithm: str = settings.ALGORITHM,
+        active_kid: Optional[str] = settings.JWT_ACTIVE_KID,
+        activation_delay: float = settings.JWT_KEY_ACTIVATION_DELAY,
+        reload_interval: float = settings.JWT_KEYS_RELOAD_INTERVAL
+    ):
+        self.keys_dir = keys_dir
+        self.algorithm = algorithm
+        self.active_kid = active_kid
+        self.activation_delay = activation_delay
+        self.reload_interval = reload_interval
+        self._keys: Dict[Optional[str], SigningKey] = {}
+        self._signature: Optional[tuple] = None
+        self._checked_at = float("-inf")
+        self._jwks_body: Optional[bytes] = None
+
+        if keys_dir is None:
+            # Tryb zgodności - wspólny sekret, bez kid i bez publikacji w JWKS
+            key = jwk.construct(secret_key, secret_algorithm)
+            self._keys[None] = SigningKey(None, secret_algorithm, key, key)
+
+    def _scan(self) -> tuple:
+        """Zwraca sygnaturę katalogu kluczy (nazwy i czasy modyfikacji)."""
+        return tuple(sorted(
+            (entry.name, entry.stat().st_mtime)
+            for entry in os.scandir(self.keys_dir)
+            if entry.name.endswith(".pem") and entry.is_file()
+        ))
+
+    def _load(self, signature: tuple) -> None:
+        """Parsuje klucze raz - weryfikacja korzysta z gotowych obiektów."""
+        keys: Dict[Optional[str], SigningKey] = {}
+        for name, mtime in signature:
+            kid = name[:-len(".pem")]
+            existing = self._keys.get(kid)
+            if existing is not None and existing.activates_at == mtime + self.activation_delay:
+                keys[kid] = existing
+                continue
+            try:
+                with open(os.path.join(self.keys_dir, name)) as key_file:
+                    private_key = jwk.construct(key_file.read(), self.algorithm)
+            except Exception as e:
+                logger.error(f"Błąd wczytywania klucza JWT {kid}: {str(e)}")
+                continue
+            keys[kid] = SigningKey(
+                kid,
+                self.algorithm,
+                private_key,
+                private_key.public_key(),
+                activates_at=mtime + self.activation_delay
+            )
+        self._keys = keys
+        self._jwks_body = None
+        logger.info(f"Wczytano klucze JWT: {', '.join(sorted(keys)) or 'brak'}")
+
+    def _maybe_reload(self) -> None:
+        """Co reload_interval sprawdza, czy w katalogu pojawiły się lub zniknęły klucze."""
+        if self.keys_dir is None:
+            return
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = now
+        signature = self._scan()
+        if signature != self._signature:
+            self._load(signature)
+            self._signature = signature
+
+    def signing_key(self) -> SigningKey:
+        """Zwraca klucz do podpisywania nowych tokenów."""
+        self._maybe_reload()
+        if self.active_kid is not None and self.active_kid in self._keys:
+            return self._keys[self.active_kid]
+        if not self._keys:
+            raise JWTError("Brak kluczy do podpisywania tokenów")
+        # Najnowszy klucz opublikowany w JWKS dostatecznie długo; inaczej najstarszy dostępny
+        now = time.time()
+        activated = [key for key in self._keys.values() if key.activates_at <= now]
+        if activated:
+            return max(activated, key=lambda key: key.activates_at)
+        return min(self._keys.values(), key=lambda key: key.activates_at)
+
+    def encode(self, claims: dict) -> str:
+        """Podpisuje claimy aktualnym kluczem."""
+        key = self.signing_key()
+        headers = {"kid": key.kid} if key.kid is not None else None
+        return jwt.encode(claims, key.signing_key, algorithm=key.algorithm, headers=headers)
+
+    def decode(self, token: str) -> dict:
+        """Weryfikuje token kluczem wskazanym przez kid."""
+        self._maybe_reload()
+        kid = jwt.get_unverified_header(token).get("kid")
+        key = self._keys.get(kid)
+        if key is None:
+            raise JWTError("Nieznany identyfikator klucza")
+        return jwt.decode(token, key.verifying_key, algorithms=[key.algorithm])
+
+    def jwks_body(self) -> bytes:
+        """Zwraca zserializowany zestaw kluczy publicznych (JWKS)."""
+        self._maybe_reload()
+        body = self._jwks_body
+        if body is None:
+            body = json.dumps({
+                "keys": [key.public_jwk() for key in self._keys.values() if key.kid is not None]
+            }).encode()
+            self._jwks_body = body
+        return body
+
+# Globalny zestaw kluczy JWT
+key_ring = KeyRing()
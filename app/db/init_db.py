@@ -2,7 +2,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.services.role_service import create_role, get_role_by_name
 from app.models.user import Base, Permission, Role, User
 from sqlalchemy.exc import IntegrityError
-from app.core.security import get_password_hash
+from app.services.hashing_service import hashing_service
 
 async def init_roles(db: AsyncSession):
     """Inicjalizuje domyślne role w systemie."""
@@ -42,7 +42,7 @@ async def init_admin_user(db: AsyncSession):
                 email="admin@example.com",
                 username="admin",
                 full_name="System Administrator",
-                hashed_password=get_password_hash("admin123!@#"),
+                hashed_password=await hashing_service.hash("admin123!@#"),
                 is_active=True,
                 is_superuser=True,
                 role_id=admin_role.id
@@ -0,0 +1,30 @@
+"""add refresh token epoch
+
+Revision ID: add_refresh_token_epoch
+Revises: add_role_effective_permissions
+Create Date: 2024-02-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic
+revision = 'add_refresh_token_epoch'
+down_revision = 'add_role_effective_permissions'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Epoka użytkownika z chwili wydania - rotacja tokenu sprzed "wyloguj wszędzie" jest odrzucana
+    op.add_column(
+        'refresh_tokens',
+        sa.Column('token_epoch', sa.Integer(), server_default='0', nullable=False)
+    )
+    # Istniejące tokeny dostają bieżącą epokę właściciela - pozostają ważne do kolejnej zmiany
+    op.execute("""
+        UPDATE refresh_tokens SET token_epoch = users.token_epoch
+        FROM users WHERE users.id = refresh_tokens.user_id
+    """)
+
+def downgrade():
+    op.drop_column('refresh_tokens', 'token_epoch')
@@ -0,0 +1,44 @@
+"""add role_effective_permissions closure table
+
+Revision ID: add_role_effective_permissions
+Revises: add_role_hierarchy_child_index
+Create Date: 2024-02-15 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic
+revision = 'add_role_effective_permissions'
+down_revision = 'add_role_hierarchy_child_index'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Domknięcie uprawnień ról - sprawdzenie uprawnienia to odczyt po kluczu głównym
+    op.create_table(
+        'role_effective_permissions',
+        sa.Column('role_id', sa.Integer(), nullable=False),
+        sa.Column('permission', sa.String(101), nullable=False),
+        sa.ForeignKeyConstraint(['role_id'], ['roles.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('role_id', 'permission')
+    )
+
+    # Początkowe wypełnienie z istniejącej hierarchii ról
+    op.execute("""
+        INSERT INTO role_effective_permissions (role_id, permission)
+        WITH RECURSIVE role_closure (root_id, role_id) AS (
+            SELECT id, id FROM roles
+            UNION
+            SELECT role_closure.root_id, role_hierarchy.parent_role_id
+            FROM role_closure
+            JOIN role_hierarchy ON role_hierarchy.child_role_id = role_closure.role_id
+        )
+        SELECT DISTINCT role_closure.root_id, permissions.resource || ':' || permissions.action
+        FROM role_closure
+        JOIN role_permissions ON role_permissions.role_id = role_closure.role_id
+        JOIN permissions ON permissions.id = role_permissions.permission_id
+    """)
+
+def downgrade():
+    op.drop_table('role_effective_permissions')
@@ -0,0 +1,27 @@
+"""add role_hierarchy child index
+
+Revision ID: add_role_hierarchy_child_index
+Revises: partition_revoked_tokens
+Create Date: 2024-02-12 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic
+revision = 'add_role_hierarchy_child_index'
+down_revision = 'partition_revoked_tokens'
+branch_labels = None
+depends_on = 'add_rbac_permissions'
+
+def upgrade():
+    # Krok rekurencji w zapytaniu uprawnień szuka ról nadrzędnych po child_role_id;
+    # klucz główny (parent_role_id, child_role_id) nie obsługuje tego wyszukiwania
+    op.create_index(
+        'idx_role_hierarchy_child_parent',
+        'role_hierarchy',
+        ['child_role_id', 'parent_role_id']
+    )
+
+def downgrade():
+    op.drop_index('idx_role_hierarchy_child_parent', table_name='role_hierarchy')
@@ -0,0 +1,25 @@
+"""add user claims version
+
+Revision ID: add_user_claims_version
+Revises: add_refresh_token_epoch
+Create Date: 2024-02-20 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic
+revision = 'add_user_claims_version'
+down_revision = 'add_refresh_token_epoch'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Wersja claimów ról - zmiana ról nie unieważnia sesji, tylko claimy w tokenach
+    op.add_column(
+        'users',
+        sa.Column('claims_version', sa.Integer(), server_default='0', nullable=False)
+    )
+
+def downgrade():
+    op.drop_column('users', 'claims_version')
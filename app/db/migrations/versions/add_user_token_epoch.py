@@ -0,0 +1,25 @@
+"""add user token epoch
+
+Revision ID: add_user_token_epoch
+Revises: initial
+Create Date: 2024-02-01 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic
+revision = 'add_user_token_epoch'
+down_revision = 'initial'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Epoka tokenów - "wyloguj wszędzie" jako pojedyncza inkrementacja
+    op.add_column(
+        'users',
+        sa.Column('token_epoch', sa.Integer(), server_default='0', nullable=False)
+    )
+
+def downgrade():
+    op.drop_column('users', 'token_epoch')
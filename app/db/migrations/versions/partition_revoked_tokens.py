@@ -0,0 +1,96 @@
+"""partition revoked tokens by expires_at
+
+Revision ID: partition_revoked_tokens
+Revises: add_refresh_tokens
+Create Date: 2024-02-08 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic
+revision = 'partition_revoked_tokens'
+down_revision = 'add_refresh_tokens'
+branch_labels = None
+depends_on = None
+
+# Partycje tworzone z wyprzedzeniem; kolejne dni dokłada partition_manager
+PREMAKE_DAYS = 7
+
+def upgrade():
+    # Stara tabela zostaje przemianowana, jej indeksy i sekwencja zwalniają nazwy
+    op.rename_table('revoked_tokens', 'revoked_tokens_legacy')
+    op.execute('ALTER SEQUENCE revoked_tokens_id_seq RENAME TO revoked_tokens_legacy_id_seq')
+    op.drop_index('idx_revoked_tokens_jti_expires', table_name='revoked_tokens_legacy')
+    op.drop_index('ix_revoked_tokens_jti', table_name='revoked_tokens_legacy')
+    op.drop_index('ix_revoked_tokens_id', table_name='revoked_tokens_legacy')
+
+    # Klucze unikalne tabeli partycjonowanej muszą zawierać expires_at
+    op.create_table(
+        'revoked_tokens',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('jti', sa.String(length=36), nullable=False),
+        sa.Column('revoked_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('id', 'expires_at'),
+        postgresql_partition_by='RANGE (expires_at)'
+    )
+    # Jedyny indeks wyszukiwania - jti jako kolumna wiodąca
+    op.create_index(
+        'idx_revoked_tokens_jti_expires', 'revoked_tokens', ['jti', 'expires_at'], unique=True
+    )
+
+    # Dzienne partycje od dziś (UTC) do najpóźniejszego wygaśnięcia, co najmniej PREMAKE_DAYS naprzód
+    op.execute(f"""
+        DO $$
+        DECLARE
+            first_day date := (now() AT TIME ZONE 'UTC')::date;
+            last_day date := greatest(
+                first_day + {PREMAKE_DAYS},
+                (SELECT max(expires_at AT TIME ZONE 'UTC')::date FROM revoked_tokens_legacy)
+            );
+            day date;
+        BEGIN
+            FOR day IN SELECT generate_series(first_day, last_day, interval '1 day')::date LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF revoked_tokens FOR VALUES FROM (%L) TO (%L)',
+                    'revoked_tokens_p' || to_char(day, 'YYYYMMDD'),
+                    day::text || ' 00:00:00+00',
+                    (day + 1)::text || ' 00:00:00+00'
+                );
+            END LOOP;
+        END $$;
+    """)
+
+    # Wygasłe wpisy nie mają znaczenia dla walidacji - przenosimy tylko aktualne
+    op.execute("""
+        INSERT INTO revoked_tokens (jti, revoked_at, expires_at)
+        SELECT jti, revoked_at, expires_at FROM revoked_tokens_legacy
+        WHERE expires_at >= date_trunc('day', now() AT TIME ZONE 'UTC') AT TIME ZONE 'UTC'
+    """)
+    op.drop_table('revoked_tokens_legacy')
+
+def downgrade():
+    op.rename_table('revoked_tokens', 'revoked_tokens_partitioned')
+    op.execute('ALTER SEQUENCE revoked_tokens_id_seq RENAME TO revoked_tokens_partitioned_id_seq')
+    op.drop_index('idx_revoked_tokens_jti_expires', table_name='revoked_tokens_partitioned')
+
+    op.create_table(
+        'revoked_tokens',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('jti', sa.String(length=36), nullable=False),
+        sa.Column('revoked_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_revoked_tokens_id', 'revoked_tokens', ['id'], unique=False)
+    op.create_index('ix_revoked_tokens_jti', 'revoked_tokens', ['jti'], unique=True)
+    op.create_index('idx_revoked_tokens_jti_expires', 'revoked_tokens', ['jti', 'expires_at'], unique=False)
+
+    op.execute("""
+        INSERT INTO revoked_tokens (jti, revoked_at, expires_at)
+        SELECT jti, revoked_at, expires_at FROM revoked_tokens_partitioned
+        WHERE expires_at > now()
+    """)
+    # Usunięcie tabeli nadrzędnej usuwa również wszystkie partycje
+    op.drop_table('revoked_tokens_partitioned')
@@ -1,18 +1,28 @@
 from fastapi import FastAPI, HTTPException, Response
 from contextlib import asynccontextmanager
-from app.routes import user_routes, admin_routes
+from app.routes import user_routes, admin_routes, token_routes
 from app.db.database import init_db
-from app.middleware.security import setup_security_middleware, setup_rate_limiting
+from app.middleware.security import setup_security_middleware
 from app.middleware.performance import (
     setup_performance_middleware,
     PerformanceMiddleware,
-    CacheControlMiddleware
+    CacheControlMiddleware,
+    AdaptiveConcurrencyMiddleware
 )
 from fastapi.middleware.cors import CORSMiddleware
 import os
 import logging
-from app.services.role_service import create_role
+from app.services.role_service import create_role, role_permission_cache
 from app.db.database import AsyncSessionLocal
+from app.services.hashing_service import hashing_service
+from app.monitoring.resource_sampler import resource_sampler
+from app.core.cache import redis_cache
+from app.core.config import settings
+from app.core.signing_keys import key_ring
+from app.services.token_service import token_service
+from app.services.partition_service import partition_manager
+from app.services.scheduled_jobs import register_jobs
+from app.core.scheduler import scheduler
 from sqlalchemy.exc import IntegrityError
 
 logger = logging.getLogger(__name__)
@@ -39,14 +49,30 @@ async def init_roles():
 async def lifespan(app: FastAPI):
     """Konfiguracja aplikacji podczas startu i zamykania."""
     try:
+        hashing_service.start()
+        await resource_sampler.start()
+        await redis_cache.connect()
+        await token_service.start_revocation_listener()
+        await role_permission_cache.start_listener()
         await init_db()
+        # Bez partycji na dziś INSERT do revoked_tokens by się nie powiódł;
+        # pełne utrzymanie (odłączanie i usuwanie) wykonuje zadanie lidera
+        await partition_manager.ensure_startup_partitions()
         await init_roles()
+        if settings.SCHEDULER_ENABLED:
+            await scheduler.start()
         logger.info("Aplikacja została pomyślnie zainicjalizowana")
         yield
     except Exception as e:
         logger.error(f"Błąd podczas inicjalizacji aplikacji: {str(e)}")
         raise
     finally:
+        await scheduler.stop()
+        await resource_sampler.stop()
+        await token_service.stop_revocation_listener()
+        await role_permission_cache.stop_listener()
+        await redis_cache.close()
+        hashing_service.shutdown()
         logger.info("Zamykanie aplikacji")
 
 app = FastAPI(
@@ -59,12 +85,15 @@ app = FastAPI(
     openapi_tags=[
         {"name": "users", "description": "Operacje na użytkownikach"},
         {"name": "admin", "description": "Operacje administracyjne"},
+        {"name": "tokens", "description": "Introspekcja tokenów"},
     ]
 )
 
-# Konfiguracja zabezpieczeń
+# Zadania okresowe (uruchamiane przez harmonogram w lifespan)
+register_jobs(scheduler)
+
+# Konfiguracja zabezpieczeń (w tym limity tras)
 setup_security_middleware(app)
-setup_rate_limiting(app)
 
 # Konfiguracja wydajności
 app.add_middleware(
@@ -74,10 +103,22 @@ app.add_middleware(
     max_cpu_percent=80.0
 )
 app.add_middleware(CacheControlMiddleware)
+# Adaptacyjny limit współbieżności - dodany jako ostatni, więc działa najwcześniej
+app.add_middleware(AdaptiveConcurrencyMiddleware)
 
 # Dodaj routery
 app.include_router(user_routes.router, prefix="/api/users", tags=["users"])
 app.include_router(admin_routes.router, prefix="/api/admin", tags=["admin"])
+app.include_router(token_routes.router, prefix="/api/tokens", tags=["tokens"])
+
+@app.get("/.well-known/jwks.json", include_in_schema=False)
+async def jwks():
+    """Klucze publiczne do lokalnej weryfikacji tokenów przez inne serwisy."""
+    return Response(
+        key_ring.jwks_body(),
+        media_type="application/json",
+        headers={"Cache-Control": f"public, max-age={settings.JWKS_CACHE_MAX_AGE}"}
+    )
 
 @app.get("/metrics")
 async def metrics():
@@ -1,12 +1,13 @@
 from fastapi import FastAPI, Request, Response
-from typing import Callable
+from typing import Callable, Dict, List, Optional, Tuple
 import time
+import json
 import logging
-import psutil
 import os
 from datetime import datetime
-from fastapi.responses import JSONResponse
-from app.models.errors import ErrorResponse, ErrorTypes
+from app.models.errors import ErrorTypes
+from app.core.concurrency_limiter import AdaptiveConcurrencyLimiter
+from app.monitoring.resource_sampler import ResourceSampler, resource_sampler
 from prometheus_client import Counter, Histogram, Gauge, generate_latest, CONTENT_TYPE_LATEST
 
 # Konfiguracja loggera
@@ -31,6 +32,43 @@ REQUESTS_IN_PROGRESS = Gauge(
     ['method', 'endpoint']
 )
 
+CONCURRENCY_LIMIT = Gauge(
+    'http_concurrency_limit',
+    'Current adaptive limit of concurrent HTTP requests'
+)
+
+CONCURRENCY_IN_FLIGHT = Gauge(
+    'http_concurrency_in_flight',
+    'Number of HTTP requests admitted by the concurrency limiter'
+)
+
+CONCURRENCY_REJECTED = Counter(
+    'http_concurrency_rejected_total',
+    'Number of HTTP requests shed by the concurrency limiter',
+    ['route_class']
+)
+
+OVERLOADED_MESSAGE = "System jest przeciążony. Spróbuj ponownie później."
+
+# Treść odpowiedzi 503 serializowana raz - odrzucenie nie może być kosztowne
+_OVERLOADED_BODY = json.dumps({
+    "error": {
+        "code": 503,
+        "message": OVERLOADED_MESSAGE,
+        "type": ErrorTypes.SYSTEM.value
+    }
+}).encode()
+
+def overloaded_response(retry_after: Optional[int] = None) -> Response:
+    """Zwraca szybką odpowiedź 503 dla odrzuconych żądań."""
+    headers = {"Retry-After": str(retry_after)} if retry_after is not None else None
+    return Response(
+        content=_OVERLOADED_BODY,
+        status_code=503,
+        media_type="application/json",
+        headers=headers
+    )
+
 class PerformanceMiddleware:
     """Middleware do monitorowania wydajności."""
     
@@ -39,12 +77,16 @@ class PerformanceMiddleware:
         app=None,
         slow_request_threshold: float = 1.0,
         max_memory_percent: float = 90.0,
-        max_cpu_percent: float = 80.0
+        max_cpu_percent: float = 80.0,
+        max_event_loop_lag: float = 1.0,
+        sampler: ResourceSampler = resource_sampler
     ):
         self.app = app
         self.slow_request_threshold = slow_request_threshold
         self.max_memory_percent = max_memory_percent
         self.max_cpu_percent = max_cpu_percent
+        self.max_event_loop_lag = max_event_loop_lag
+        self.sampler = sampler
 
     async def __call__(self, scope, receive, send):
         """Przetwarza request z monitorowaniem wydajności."""
@@ -62,23 +104,14 @@ class PerformanceMiddleware:
             endpoint=path
         ).inc()
         
-        # Sprawdź zasoby systemowe
-        if not await self.check_system_resources():
+        # Sprawdź zasoby systemowe (odczyt ostatniego próbkowania w tle)
+        if not self.resources_available():
             REQUESTS_IN_PROGRESS.labels(
                 method=method,
                 endpoint=path
             ).dec()  # Dekrementuj licznik
             
-            response = JSONResponse(
-                status_code=503,
-                content=ErrorResponse(
-                    error={
-                        "code": 503,
-                        "message": "System jest przeciążony. Spróbuj ponownie później.",
-                        "type": ErrorTypes.SERVER_ERROR
-                    }
-                ).model_dump()
-            )
+            response = overloaded_response()
             await response(scope, receive, send)
             return
         
@@ -136,19 +169,102 @@ class PerformanceMiddleware:
 
     async def check_system_resources(self):
         """Sprawdza dostępne zasoby systemowe."""
-        memory_percent = psutil.virtual_memory().percent
-        cpu_percent = psutil.cpu_percent(interval=0.1)
+        return self.resources_available()
+
+    def resources_available(self) -> bool:
+        """Sprawdza zasoby na podstawie snapshotu z samplera - bez I/O i blokad."""
+        snapshot = self.sampler.snapshot
         
-        if memory_percent > self.max_memory_percent:
-            logger.warning(f"High memory usage: {memory_percent}%")
+        if snapshot.memory_percent > self.max_memory_percent:
+            logger.warning(f"High memory usage: {snapshot.memory_percent:.1f}%")
             return False
             
-        if cpu_percent > self.max_cpu_percent:
-            logger.warning(f"High CPU usage: {cpu_percent}%")
+        if snapshot.cpu_percent > self.max_cpu_percent:
+            logger.warning(f"High CPU usage: {snapshot.cpu_percent:.1f}%")
+            return False
+        
+        if snapshot.loop_lag > self.max_event_loop_lag:
+            logger.warning(f"High event loop lag: {snapshot.loop_lag:.3f}s")
             return False
             
         return True
 
+# Udział w limicie dla klas tras - klasy o mniejszym udziale są odrzucane najpierw
+DEFAULT_ROUTE_CLASSES: Dict[str, float] = {
+    "critical": 1.0,
+    "default": 0.8,
+    "low": 0.5
+}
+
+# (metoda lub None, prefiks ścieżki, klasa) - dopasowanie po najdłuższym prefiksie
+DEFAULT_ROUTE_RULES: List[Tuple[Optional[str], str, str]] = [
+    ("POST", "/api/users/token", "critical"),
+    ("POST", "/api/tokens/introspect", "critical"),
+    (None, "/metrics", "critical"),
+    ("GET", "/api/admin/users", "low"),
+    ("GET", "/api/admin/audit-logs", "low"),
+]
+
+class AdaptiveConcurrencyMiddleware:
+    """Middleware odrzucające żądania ponad adaptacyjny limit współbieżności."""
+    
+    def __init__(
+        self,
+        app=None,
+        limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+        route_classes: Optional[Dict[str, float]] = None,
+        route_rules: Optional[List[Tuple[Optional[str], str, str]]] = None,
+        default_class: str = "default",
+        retry_after: int = 1
+    ):
+        self.app = app
+        self.limiter = limiter or AdaptiveConcurrencyLimiter()
+        self.route_classes = route_classes or DEFAULT_ROUTE_CLASSES
+        self.default_class = default_class
+        self.retry_after = retry_after
+        # Najdłuższe prefiksy najpierw, żeby dopasowanie było jednoznaczne
+        self._rules = sorted(
+            route_rules if route_rules is not None else DEFAULT_ROUTE_RULES,
+            key=lambda rule: len(rule[1]),
+            reverse=True
+        )
+        CONCURRENCY_LIMIT.set(self.limiter.limit)
+    
+    def classify(self, method: str, path: str) -> str:
+        """Zwraca klasę trasy dla żądania."""
+        for rule_method, prefix, route_class in self._rules:
+            if (rule_method is None or rule_method == method) and path.startswith(prefix):
+                return route_class
+        return self.default_class
+    
+    async def __call__(self, scope, receive, send):
+        """Przepuszcza żądanie lub odrzuca je szybkim 503."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        route_class = self.classify(scope["method"], scope["path"])
+        share = self.route_classes.get(route_class, 1.0)
+        
+        if not self.limiter.try_acquire(share):
+            CONCURRENCY_REJECTED.labels(route_class=route_class).inc()
+            response = overloaded_response(self.retry_after)
+            await response(scope, receive, send)
+            return
+        
+        CONCURRENCY_IN_FLIGHT.set(self.limiter.in_flight)
+        start_time = time.perf_counter()
+        dropped = False
+        try:
+            await self.app(scope, receive, send)
+        except Exception:
+            dropped = True
+            raise
+        finally:
+            self.limiter.release(time.perf_counter() - start_time, dropped=dropped)
+            CONCURRENCY_IN_FLIGHT.set(self.limiter.in_flight)
+            CONCURRENCY_LIMIT.set(self.limiter.limit)
+
 class CacheControlMiddleware:
     """Middleware do zarządzania cache'owaniem."""
     
@@ -182,7 +298,10 @@ class CacheControlMiddleware:
                 cache_settings = self.cache_config.get(endpoint_type, {})
                 headers = list(message.get("headers", []))
                 
-                if cache_settings.get("no_store"):
+                if any(name.lower() == b"cache-control" for name, _ in headers):
+                    # Endpoint sam określił politykę cache
+                    pass
+                elif cache_settings.get("no_store"):
                     headers.append((b"Cache-Control", b"no-store, no-cache, must-revalidate"))
                 else:
                     max_age = cache_settings.get("max_age")
@@ -2,11 +2,12 @@ from fastapi import FastAPI, Request, Response, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.security import APIKeyCookie
-from slowapi import Limiter
-from slowapi.util import get_remote_address
-from typing import Callable, List
+from typing import Any, Callable, Dict, List, Optional, Pattern, Sequence, Tuple
+import math
 import time
 import os
+import re
+import json
 import logging
 import traceback
 from datetime import datetime
@@ -15,6 +16,10 @@ from app.models.errors import ErrorTypes, ErrorMessages, ErrorResponse
 from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
 from starlette.requests import Request
 from starlette.responses import Response
+from app.db.database import async_session
+from app.services.auth_service import AuthService, auth_service
+from app.core.rate_limiter import PolicyDecision, RateLimitPolicy
+from app.core.rate_limit_policies import ROUTE_RATE_LIMITS
 
 # Konfiguracja loggera
 logging.basicConfig(
@@ -30,18 +35,227 @@ file_handler = logging.FileHandler(f'logs/errors_{datetime.now().strftime("%Y%m"
 file_handler.setLevel(logging.ERROR)
 logger.addHandler(file_handler)
 
-limiter = Limiter(key_func=get_remote_address)
 ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
 
 # Lista endpointów wymagających CSRF
 CSRF_PROTECTED_METHODS = {"POST", "PUT", "DELETE", "PATCH"}
 CSRF_EXEMPT_PATHS = {
     "/api/users/token",
+    "/api/users/token/refresh",
     "/api/users/",
     "/api/users/register",
-    "/api/auth/login"
+    "/api/auth/login",
+    "/api/tokens/introspect"
 }  # Endpointy wyłączone z ochrony CSRF
 
+# Trasy publiczne (metoda, wzorzec ścieżki) - bez uwierzytelniania; None oznacza dowolną metodę
+AUTH_PUBLIC_ROUTES = [
+    (None, r"/docs(/.*)?"),
+    (None, r"/redoc"),
+    (None, r"/openapi\.json"),
+    (None, r"/metrics"),
+    ("GET", r"/\.well-known/jwks\.json"),
+    ("OPTIONS", r"/.*"),
+    ("POST", r"/api/users/?"),
+    ("POST", r"/api/users/token(/refresh)?"),
+    ("POST", r"/api/users/reset-password(/confirm)?"),
+]
+
+# Treść odpowiedzi 401 serializowana raz
+_UNAUTHORIZED_BODY = json.dumps({
+    "error": {
+        "code": 401,
+        "message": ErrorMessages.INVALID_TOKEN.value,
+        "type": ErrorTypes.AUTHENTICATION.value
+    }
+}).encode()
+
+def compile_route_table(routes: List[Tuple[Optional[str], str]]) -> Dict[Optional[str], Pattern]:
+    """Kompiluje tablicę tras do jednego wyrażenia regularnego na metodę."""
+    grouped: Dict[Optional[str], List[str]] = {}
+    for method, pattern in routes:
+        grouped.setdefault(method, []).append(f"(?:{pattern})")
+    return {method: re.compile("|".join(patterns)) for method, patterns in grouped.items()}
+
+# Treść odpowiedzi 429 serializowana raz
+_RATE_LIMITED_BODY = json.dumps({
+    "error": {
+        "code": 429,
+        "message": ErrorMessages.RATE_LIMIT_EXCEEDED.value,
+        "type": ErrorTypes.RATE_LIMIT.value
+    }
+}).encode()
+
+# Klucz węzła drzewa segmentów przechowujący wartość oraz klucz segmentu-parametru
+_NODE_VALUE = None
+_PARAM_SEGMENT = "{}"
+
+class RouteTable:
+    """Dopasowuje (metoda, ścieżka) do wartości: słownik dla ścieżek stałych, drzewo segmentów dla szablonów."""
+
+    def __init__(self, routes: Sequence[Tuple[str, str, Any]]):
+        self._static: Dict[Tuple[str, str], Any] = {}
+        self._trie: Dict[str, dict] = {}
+        for method, template, value in routes:
+            path = self.normalize(template)
+            if "{" not in path:
+                self._static[(method, path)] = value
+                continue
+            node = self._trie.setdefault(method, {})
+            for segment in path.split("/")[1:]:
+                if segment.startswith("{") and segment.endswith("}"):
+                    segment = _PARAM_SEGMENT
+                node = node.setdefault(segment, {})
+            node[_NODE_VALUE] = value
+
+    @staticmethod
+    def normalize(path: str) -> str:
+        """Usuwa końcowy ukośnik, aby /api/users i /api/users/ były tą samą trasą."""
+        return path.rstrip("/") or "/"
+
+    def match(self, method: str, path: str) -> Optional[Any]:
+        """Zwraca wartość trasy albo None; segment stały ma pierwszeństwo przed parametrem."""
+        path = self.normalize(path)
+        value = self._static.get((method, path))
+        if value is not None:
+            return value
+        node = self._trie.get(method)
+        if node is None:
+            return None
+        for segment in path.split("/")[1:]:
+            child = node.get(segment)
+            if child is None and segment:
+                child = node.get(_PARAM_SEGMENT)
+            if child is None:
+                return None
+            node = child
+        return node.get(_NODE_VALUE)
+
+def rate_limit_headers(decision: PolicyDecision) -> List[Tuple[bytes, bytes]]:
+    """Buduje nagłówki X-RateLimit-* z wyniku wymiaru decydującego."""
+    result = decision.limiting
+    headers = [
+        (b"x-ratelimit-limit", str(result.limit).encode()),
+        (b"x-ratelimit-remaining", str(max(result.remaining, 0)).encode()),
+        (b"x-ratelimit-reset", str(math.ceil(result.reset_after)).encode()),
+    ]
+    if not decision.allowed:
+        headers.append((b"retry-after", str(max(1, math.ceil(decision.retry_after))).encode()))
+    return headers
+
+def unauthorized_response() -> Response:
+    """Zwraca odpowiedź 401 dla żądań bez poprawnego tokenu."""
+    return Response(
+        content=_UNAUTHORIZED_BODY,
+        status_code=401,
+        media_type="application/json",
+        headers={"WWW-Authenticate": "Bearer"}
+    )
+
+class AuthenticationMiddleware:
+    """Middleware uwierzytelniające - ustala tożsamość raz na żądanie i zapisuje ją w scope["state"]."""
+    
+    def __init__(
+        self,
+        app=None,
+        public_routes: Optional[List[Tuple[Optional[str], str]]] = None,
+        service: Optional[AuthService] = None
+    ):
+        self.app = app
+        self.service = service or auth_service
+        self._public_routes = compile_route_table(
+            public_routes if public_routes is not None else AUTH_PUBLIC_ROUTES
+        )
+    
+    def is_public(self, method: str, path: str) -> bool:
+        """Sprawdza, czy trasa jest wyłączona z uwierzytelniania."""
+        for key in (method, None):
+            pattern = self._public_routes.get(key)
+            if pattern is not None and pattern.fullmatch(path):
+                return True
+        return False
+    
+    @staticmethod
+    def bearer_token(scope) -> Optional[str]:
+        """Wyciąga token z nagłówka Authorization."""
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() == "bearer" and token:
+                    return token
+                return None
+        return None
+    
+    async def __call__(self, scope, receive, send):
+        """Uwierzytelnia żądanie albo odrzuca je odpowiedzią 401."""
+        if scope["type"] != "http" or self.is_public(scope["method"], scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        
+        principal = None
+        token = self.bearer_token(scope)
+        if token is not None:
+            try:
+                # Claimy i tożsamość trafiają do scope["state"] przez request.state
+                async with async_session() as db:
+                    principal = await self.service.get_current_user(token, db, Request(scope))
+            except HTTPException:
+                principal = None
+        
+        if principal is None:
+            await unauthorized_response()(scope, receive, send)
+            return
+        
+        await self.app(scope, receive, send)
+
+class RateLimitMiddleware:
+    """Middleware egzekwujące limity tras z tablicy polityk, zanim aplikacja odczyta treść żądania."""
+
+    def __init__(
+        self,
+        app=None,
+        routes: Optional[Sequence[Tuple[str, str, RateLimitPolicy]]] = None
+    ):
+        self.app = app
+        self._routes = RouteTable(routes if routes is not None else ROUTE_RATE_LIMITS)
+
+    @staticmethod
+    def client_ip(scope) -> str:
+        """Zwraca adres klienta z połączenia."""
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    async def __call__(self, scope, receive, send):
+        """Zalicza żądanie w polityce trasy albo odrzuca je odpowiedzią 429."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        policy = self._routes.match(scope["method"], scope["path"])
+        if policy is None:
+            await self.app(scope, receive, send)
+            return
+
+        decision = await policy.check(ip=self.client_ip(scope))
+        headers = rate_limit_headers(decision)
+        if not decision.allowed:
+            # Odpowiedź bez wywołania aplikacji - treść żądania nie jest nawet czytana
+            await send({"type": "http.response.start", "status": 429, "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(_RATE_LIMITED_BODY)).encode()),
+                (b"x-ratelimit-scope", decision.tripped.encode()),
+                *headers
+            ]})
+            await send({"type": "http.response.body", "body": _RATE_LIMITED_BODY})
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), *headers]
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
 class CSRFMiddleware(BaseHTTPMiddleware):
     """Middleware do ochrony CSRF."""
     
@@ -120,6 +334,12 @@ def setup_security_middleware(app: FastAPI) -> None:
         secure=ENVIRONMENT == "production"
     )
     
+    # Uwierzytelnianie - wewnątrz CORS, aby odpowiedzi 401 miały nagłówki CORS
+    app.add_middleware(AuthenticationMiddleware)
+    
+    # Limity tras - przed uwierzytelnianiem, ale wewnątrz CORS (odpowiedzi 429 z nagłówkami CORS)
+    setup_rate_limiting(app)
+    
     @app.exception_handler(HTTPException)
     async def http_exception_handler(request: Request, exc: HTTPException):
         """Handler dla HTTPException."""
@@ -257,26 +477,5 @@ def setup_security_middleware(app: FastAPI) -> None:
             raise
 
 def setup_rate_limiting(app: FastAPI) -> None:
-    """Konfiguruje rate limiting - mniej restrykcyjny w development."""
-    
-    # Limity zależne od środowiska
-    login_limit = "20/minute" if ENVIRONMENT == "development" else "5/minute"
-    general_limit = "10/minute" if ENVIRONMENT == "development" else "3/minute"
-    
-    # Logowanie
-    @limiter.limit(login_limit)
-    @app.post("/api/users/token")
-    async def rate_limit_login(request: Request):
-        pass
-    
-    # Rejestracja
-    @limiter.limit(general_limit)
-    @app.post("/api/users")
-    async def rate_limit_register(request: Request):
-        pass
-    
-    # Reset hasła
-    @limiter.limit(general_limit)
-    @app.post("/api/users/reset-password")
-    async def rate_limit_password_reset(request: Request):
-        pass 
\ No newline at end of file
+    """Konfiguruje limity tras z tablicy ROUTE_RATE_LIMITS (kompilowanej raz przy starcie)."""
+    app.add_middleware(RateLimitMiddleware)
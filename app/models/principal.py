@@ -0,0 +1,51 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.user import User
+from typing import List, Optional
+
+class Principal:
+    """Lekka tożsamość odtworzona z claimów JWT, bez ładowania wiersza User."""
+    __slots__ = (
+        "id", "email", "username", "role_ids", "roles",
+        "is_active", "is_admin", "version", "_user"
+    )
+
+    def __init__(
+        self,
+        id: int,
+        email: str,
+        username: Optional[str] = None,
+        role_ids: Optional[List[int]] = None,
+        roles: Optional[List[str]] = None,
+        is_active: bool = True,
+        is_admin: bool = False,
+        version: int = 0
+    ):
+        self.id = id
+        self.email = email
+        self.username = username
+        self.role_ids = role_ids or []
+        self.roles = roles or []
+        self.is_active = is_active
+        self.is_admin = is_admin
+        self.version = version
+        self._user: Optional[User] = None
+
+    @classmethod
+    def from_claims(cls, payload: dict) -> "Principal":
+        """Tworzy tożsamość z claimów tokenu wydanego w trybie bezstanowym."""
+        return cls(
+            id=payload["user_id"],
+            email=payload["sub"],
+            username=payload.get("username"),
+            role_ids=payload.get("role_ids"),
+            roles=payload.get("scopes"),
+            is_active=payload.get("is_active", True),
+            is_admin=payload.get("is_admin", False),
+            version=payload.get("ver", 0)
+        )
+
+    async def load_user(self, db: AsyncSession) -> Optional[User]:
+        """Leniwie ładuje wiersz User - tylko dla handlerów, które go potrzebują."""
+        if self._user is None:
+            self._user = await db.get(User, self.id)
+        return self._user
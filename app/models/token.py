@@ -1,5 +1,5 @@
 from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Index
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import backref, relationship
 from sqlalchemy.sql import func
 from app.db.database import Base
 from pydantic import BaseModel, Field, ConfigDict
@@ -12,21 +12,42 @@ class TokenData(BaseModel):
     scopes: List[str] = []
     exp: Optional[datetime] = None
     jti: Optional[str] = None
+    user_id: Optional[int] = None
+    epoch: Optional[int] = None
 
     model_config = ConfigDict(from_attributes=True)
 
 class RevokedToken(Base):
     """Model unieważnionego tokenu w bazie danych."""
     __tablename__ = "revoked_tokens"
+    # Partycjonowanie dzienne po expires_at - wygasłe dni usuwa się przez DROP partycji,
+    # a klucze unikalne muszą zawierać klucz partycjonowania
     __table_args__ = (
-        Index('idx_revoked_tokens_jti_expires', 'jti', 'expires_at'),
-        {'extend_existing': True}
+        Index('idx_revoked_tokens_jti_expires', 'jti', 'expires_at', unique=True),
+        {'extend_existing': True, 'postgresql_partition_by': 'RANGE (expires_at)'}
     )
 
-    id = Column(Integer, primary_key=True, index=True)
-    jti = Column(String(36), unique=True, index=True, nullable=False)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    jti = Column(String(36), nullable=False)
     revoked_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    expires_at = Column(DateTime(timezone=True), primary_key=True, nullable=False)
+
+class RefreshToken(Base):
+    """Model tokenu odświeżania (przechowywany jako skrót SHA-256)."""
+    __tablename__ = "refresh_tokens"
+    __table_args__ = {'extend_existing': True}
+
+    id = Column(Integer, primary_key=True, index=True)
+    token_hash = Column(String(64), unique=True, index=True, nullable=False)
+    # Rodzina - łańcuch rotacji wywodzący się z jednego logowania
+    family_id = Column(String(36), index=True, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     expires_at = Column(DateTime(timezone=True), nullable=False)
+    used_at = Column(DateTime(timezone=True), nullable=True)
+    revoked = Column(Boolean, default=False, nullable=False)
+    # Epoka tokenów użytkownika z chwili wydania - rotacja po "wyloguj wszędzie" jest odrzucana
+    token_epoch = Column(Integer, default=0, server_default="0", nullable=False)
 
 class PasswordResetToken(Base):
     """Model tokenu resetowania hasła w bazie danych."""
@@ -41,7 +62,12 @@ class PasswordResetToken(Base):
     used = Column(Boolean, default=False)
     
     # Relacja z użytkownikiem
-    user = relationship("User", backref="reset_tokens")
+    # Ta sama tabela co app.models.user.PasswordResetToken - relacje współdzielą kolumnę user_id
+    user = relationship(
+        "User",
+        backref=backref("reset_tokens", overlaps="password_reset_tokens,user"),
+        overlaps="password_reset_tokens,user"
+    )
 
 class PasswordResetAttempt(Base):
     """Model próby resetowania hasła w bazie danych."""
@@ -61,6 +87,10 @@ class TokenCreate(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
+class RefreshRequest(BaseModel):
+    """Schema żądania odświeżenia tokenu."""
+    refresh_token: str = Field(..., description="Token odświeżania")
+
 class TokenResponse(BaseModel):
     """Schema do zwracania informacji o tokenie."""
     access_token: str
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Integer, String, ForeignKey, Table, DateTime, Text
+from sqlalchemy import Boolean, Column, Integer, String, ForeignKey, Table, DateTime, Text, Index
 from sqlalchemy.orm import relationship
 from app.db.database import Base
 from datetime import datetime
@@ -11,6 +11,23 @@ role_permissions = Table(
     Column('permission_id', Integer, ForeignKey('permissions.id'))
 )
 
+# Hierarchia ról - rola podrzędna dziedziczy uprawnienia ról nadrzędnych
+role_hierarchy = Table(
+    'role_hierarchy',
+    Base.metadata,
+    Column('parent_role_id', Integer, ForeignKey('roles.id', ondelete='CASCADE'), primary_key=True),
+    Column('child_role_id', Integer, ForeignKey('roles.id', ondelete='CASCADE'), primary_key=True),
+    Index('idx_role_hierarchy_child_parent', 'child_role_id', 'parent_role_id')
+)
+
+# Domknięcie uprawnień ról (z dziedziczonymi) jako "zasób:akcja" - utrzymywane przez role_service
+role_effective_permissions = Table(
+    'role_effective_permissions',
+    Base.metadata,
+    Column('role_id', Integer, ForeignKey('roles.id', ondelete='CASCADE'), primary_key=True),
+    Column('permission', String(101), primary_key=True)
+)
+
 class Permission(Base):
     """Model uprawnień w systemie."""
     
@@ -19,6 +36,8 @@ class Permission(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True, index=True)
     description = Column(String)
+    resource = Column(String)
+    action = Column(String)
     
     roles = relationship("Role", secondary=role_permissions, back_populates="permissions")
 
@@ -32,6 +51,13 @@ class Role(Base):
     description = Column(String)
     
     permissions = relationship("Permission", secondary=role_permissions, back_populates="roles")
+    parent_roles = relationship(
+        "Role",
+        secondary=role_hierarchy,
+        primaryjoin=lambda: Role.id == role_hierarchy.c.child_role_id,
+        secondaryjoin=lambda: Role.id == role_hierarchy.c.parent_role_id,
+        backref="child_roles"
+    )
     users = relationship("User", back_populates="role")
 
 class User(Base):
@@ -49,9 +75,13 @@ class User(Base):
     role_id = Column(Integer, ForeignKey('roles.id'))
     failed_login_attempts = Column(Integer, default=0)
     locked_until = Column(DateTime, nullable=True)
+    # Epoka tokenów - inkrementacja unieważnia wszystkie wydane tokeny użytkownika
+    token_epoch = Column(Integer, default=0, server_default="0", nullable=False)
+    # Wersja claimów ról - inkrementacja wymusza odczyt ról z bazy do czasu odświeżenia tokenu
+    claims_version = Column(Integer, default=0, server_default="0", nullable=False)
     
     role = relationship("Role", back_populates="users")
-    password_reset_tokens = relationship("PasswordResetToken", back_populates="user")
+    password_reset_tokens = relationship("app.models.user.PasswordResetToken", back_populates="user")
     access_tokens = relationship("AccessToken", back_populates="user")
     security_logs = relationship("SecurityAuditLog", back_populates="user")
 
@@ -0,0 +1,29 @@
+from prometheus_client import Counter
+
+# Metryki rozwiązywania tożsamości
+AUTH_TOKEN_DECODES = Counter(
+    'auth_token_decodes_total',
+    'Number of JWT decode operations'
+)
+
+AUTH_PRINCIPAL_RESOLUTIONS = Counter(
+    'auth_principal_resolutions_total',
+    'Number of principal resolutions by source',
+    ['source']
+)
+
+# Metryki pamięci podręcznej uprawnień ról
+ROLE_PERMISSION_CACHE_HITS = Counter(
+    'role_permission_cache_hits_total',
+    'Number of role permission lookups served from the cache'
+)
+
+ROLE_PERMISSION_CACHE_MISSES = Counter(
+    'role_permission_cache_misses_total',
+    'Number of role permission lookups not served from the cache'
+)
+
+ROLE_PERMISSION_CACHE_LOADS = Counter(
+    'role_permission_cache_loads_total',
+    'Number of role permission resolutions loaded from the database (concurrent misses share one load)'
+)
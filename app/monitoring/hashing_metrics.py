@@ -0,0 +1,27 @@
+from prometheus_client import Counter, Histogram, Gauge
+
+# Metryki puli hashowania haseł
+HASHING_QUEUE_WAIT = Histogram(
+    'password_hashing_queue_wait_seconds',
+    'Time a hashing job waits in the process pool queue',
+    ['operation'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+
+HASHING_DURATION = Histogram(
+    'password_hashing_duration_seconds',
+    'Time spent hashing or verifying a password in a worker process',
+    ['operation'],
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0)
+)
+
+HASHING_IN_FLIGHT = Gauge(
+    'password_hashing_in_flight',
+    'Number of hashing jobs queued or running in the process pool'
+)
+
+HASHING_REJECTED = Counter(
+    'password_hashing_rejected_total',
+    'Number of hashing jobs rejected by the process pool',
+    ['operation', 'reason']
+)
@@ -0,0 +1,20 @@
+from prometheus_client import Counter, Gauge
+
+# Metryki limitowania żądań
+RATE_LIMITER_KEYS = Gauge(
+    'rate_limiter_keys',
+    'Number of keys tracked by the in-process rate limiter',
+    ['limiter']
+)
+
+RATE_LIMITER_EVICTIONS = Counter(
+    'rate_limiter_evictions_total',
+    'Number of keys evicted from the in-process rate limiter',
+    ['limiter', 'reason']
+)
+
+RATE_LIMITER_FALLBACKS = Counter(
+    'rate_limiter_fallbacks_total',
+    'Number of distributed rate limit checks answered by the in-process limiter',
+    ['limiter']
+)
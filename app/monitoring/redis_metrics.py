@@ -0,0 +1,17 @@
+from prometheus_client import Gauge
+
+# Metryki puli połączeń Redis
+REDIS_POOL_MAX_CONNECTIONS = Gauge(
+    'redis_pool_max_connections',
+    'Maximum number of connections in the Redis pool'
+)
+
+REDIS_POOL_IN_USE = Gauge(
+    'redis_pool_connections_in_use',
+    'Number of Redis pool connections currently checked out'
+)
+
+REDIS_POOL_IDLE = Gauge(
+    'redis_pool_connections_idle',
+    'Number of idle connections available in the Redis pool'
+)
@@ -0,0 +1,115 @@
+from prometheus_client import Gauge
+from typing import Optional
+from app.core.config import settings
+import asyncio
+import logging
+import psutil
+
+logger = logging.getLogger(__name__)
+
+# Metryki zasobów systemowych
+SYSTEM_CPU_PERCENT = Gauge(
+    'system_cpu_percent_smoothed',
+    'Smoothed host CPU usage in percent'
+)
+
+SYSTEM_MEMORY_PERCENT = Gauge(
+    'system_memory_percent_smoothed',
+    'Smoothed host memory usage in percent'
+)
+
+EVENT_LOOP_LAG = Gauge(
+    'event_loop_lag_seconds',
+    'Smoothed event loop scheduling lag in seconds'
+)
+
+class ResourceSnapshot:
+    """Niezmienny odczyt zasobów publikowany przez sampler."""
+    __slots__ = ("cpu_percent", "memory_percent", "loop_lag")
+
+    def __init__(self, cpu_percent: float, memory_percent: float, loop_lag: float):
+        self.cpu_percent = cpu_percent
+        self.memory_percent = memory_percent
+        self.loop_lag = loop_lag
+
+class ResourceSampler:
+    """Próbkuje zasoby systemowe w tle i publikuje wygładzone odczyty."""
+
+    def __init__(
+        self,
+        interval: float = settings.RESOURCE_SAMPLE_INTERVAL,
+        smoothing: float = settings.RESOURCE_SAMPLE_SMOOTHING
+    ):
+        self.interval = interval
+        self.smoothing = smoothing
+        self._snapshot: Optional[ResourceSnapshot] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def snapshot(self) -> ResourceSnapshot:
+        """Zwraca ostatni odczyt (odczyt referencji, bez blokad)."""
+        snapshot = self._snapshot
+        if snapshot is None or self._task is None:
+            # Sampler nie działa (np. testy bez lifespan) - bieżący nieblokujący odczyt
+            return self._sample()
+        return snapshot
+
+    def _sample(self) -> ResourceSnapshot:
+        """Pobiera surowy, nieblokujący odczyt zasobów."""
+        return ResourceSnapshot(
+            cpu_percent=psutil.cpu_percent(interval=None),
+            memory_percent=psutil.virtual_memory().percent,
+            loop_lag=0.0
+        )
+
+    def _publish(self, raw: ResourceSnapshot, loop_lag: float) -> ResourceSnapshot:
+        """Wygładza odczyt (EWMA) i podmienia opublikowany snapshot."""
+        previous = self._snapshot
+        if previous is None:
+            snapshot = ResourceSnapshot(raw.cpu_percent, raw.memory_percent, loop_lag)
+        else:
+            alpha = self.smoothing
+            snapshot = ResourceSnapshot(
+                cpu_percent=alpha * raw.cpu_percent + (1 - alpha) * previous.cpu_percent,
+                memory_percent=alpha * raw.memory_percent + (1 - alpha) * previous.memory_percent,
+                loop_lag=alpha * loop_lag + (1 - alpha) * previous.loop_lag
+            )
+        # Pojedyncze przypisanie referencji - czytelnicy zawsze widzą spójny obiekt
+        self._snapshot = snapshot
+
+        SYSTEM_CPU_PERCENT.set(snapshot.cpu_percent)
+        SYSTEM_MEMORY_PERCENT.set(snapshot.memory_percent)
+        EVENT_LOOP_LAG.set(snapshot.loop_lag)
+        return snapshot
+
+    async def _run(self) -> None:
+        """Pętla próbkowania działająca w tle."""
+        loop = asyncio.get_running_loop()
+        # Pierwsze wywołanie cpu_percent(None) inicjalizuje licznik psutil
+        psutil.cpu_percent(interval=None)
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            loop_lag = max(0.0, loop.time() - started - self.interval)
+            try:
+                self._publish(self._sample(), loop_lag)
+            except Exception as e:
+                logger.error(f"Błąd próbkowania zasobów: {str(e)}")
+
+    async def start(self) -> None:
+        """Uruchamia zadanie próbkowania (wywoływane w lifespan)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Zatrzymuje zadanie próbkowania."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+# Globalna instancja samplera zasobów
+resource_sampler = ResourceSampler()
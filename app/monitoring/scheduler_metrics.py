@@ -0,0 +1,31 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+# Metryki harmonogramu zadań okresowych
+SCHEDULER_LEADER = Gauge(
+    'scheduler_is_leader',
+    'Whether this worker currently holds the scheduler leader lease'
+)
+
+SCHEDULER_JOB_DURATION = Histogram(
+    'scheduler_job_duration_seconds',
+    'Duration of scheduled job runs',
+    ['job']
+)
+
+SCHEDULER_JOB_RUNS = Counter(
+    'scheduler_job_runs_total',
+    'Number of scheduled job runs',
+    ['job', 'status']
+)
+
+SCHEDULER_JOB_OVERLAPS = Counter(
+    'scheduler_job_overlaps_total',
+    'Number of job runs skipped because the previous run was still in progress',
+    ['job']
+)
+
+SCHEDULER_JOB_MISSED = Counter(
+    'scheduler_job_missed_runs_total',
+    'Number of scheduled runs coalesced after the scheduler fell behind',
+    ['job']
+)
@@ -43,11 +43,65 @@ TOKEN_CLEANUP_DURATION = Summary(
     'Time spent cleaning up tokens'
 )
 
+TOKEN_CLEANUP_ROWS = Counter(
+    'token_cleanup_rows_total',
+    'Number of expired rows deleted by the cleanup job',
+    ['table']
+)
+
+TOKEN_CLEANUP_ROWS_PER_SECOND = Gauge(
+    'token_cleanup_rows_per_second',
+    'Deletion throughput of the last cleanup run',
+    ['table']
+)
+
+TOKEN_CLEANUP_LAG = Gauge(
+    'token_cleanup_lag_seconds',
+    'Seconds since the last cleanup run that removed all expired rows of a table',
+    ['table']
+)
+
 TOKEN_CACHE_SIZE = Gauge(
     'token_cache_size_bytes',
     'Size of token cache in bytes'
 )
 
+TOKEN_LOCAL_CACHE_ENTRIES = Gauge(
+    'token_local_cache_entries',
+    'Number of entries in the in-process token validity cache'
+)
+
+TOKEN_REVOCATION_FILTER_ENTRIES = Gauge(
+    'token_revocation_filter_entries',
+    'Number of revoked token ids in the in-process revocation filter'
+)
+
+TOKEN_REVOCATION_FILTER_SIZE = Gauge(
+    'token_revocation_filter_size_bytes',
+    'Size of the in-process revocation filter bit array in bytes'
+)
+
+TOKEN_REVOCATION_FILTER_FP_RATE = Gauge(
+    'token_revocation_filter_false_positive_rate',
+    'Estimated false positive rate of the in-process revocation filter'
+)
+
+TOKEN_REVOCATION_FILTER_REBUILD_TIME = Histogram(
+    'token_revocation_filter_rebuild_seconds',
+    'Time spent rebuilding the revocation filter from the database'
+)
+
+REVOKED_TOKEN_PARTITIONS = Gauge(
+    'revoked_token_partitions',
+    'Number of daily partitions of the revoked_tokens table'
+)
+
+REVOKED_TOKEN_PARTITION_OPERATIONS = Counter(
+    'revoked_token_partition_operations_total',
+    'Number of revoked_tokens partition maintenance operations',
+    ['operation', 'status']
+)
+
 async def _update_performance_metrics(db: AsyncSession):
     """Aktualizuje metryki wydajności tokenów."""
     try:
@@ -6,6 +6,7 @@ from app.services.auth_service import get_current_admin
 from app.services.user_service import get_user_by_id
 from app.services.role_service import assign_role_to_user, remove_role_from_user
 from app.services.audit_service import log_security_event, SecurityAuditLog
+from app.services.token_service import token_service
 from app.models.user import User, Role
 from app.models.errors import ErrorDetail, ErrorTypes, ErrorMessages, ErrorResponse
 from typing import List, Optional
@@ -112,7 +113,11 @@ async def update_user(
     for field, value in user_update.dict(exclude_unset=True).items():
         setattr(user, field, value)
     
-    await db.commit()
+    if user_update.is_active is False:
+        # Dezaktywacja unieważnia wszystkie tokeny użytkownika
+        await token_service.bump_token_epoch(db, user)
+    else:
+        await db.commit()
     return UserResponse.model_validate(user)
 
 @router.delete("/users/{user_id}")
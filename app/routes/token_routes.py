@@ -0,0 +1,76 @@
+from fastapi import APIRouter, Depends, HTTPException, Security, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.database import get_db
+from app.core.config import settings
+from app.services.auth_service import auth_service, get_current_active_user
+from app.services.role_service import check_permission
+from app.services.token_service import token_service
+from jose import JWTError
+from pydantic import BaseModel, Field, ValidationError
+from typing import List, Optional
+
+router = APIRouter()
+
+async def get_introspection_caller(
+    current_user = Security(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Dopuszcza introspekcję tylko administratorom i rolom z uprawnieniem tokens:introspect (RFC 7662, 2.1)."""
+    if await check_permission(db, current_user, "tokens", "introspect"):
+        return current_user
+    raise HTTPException(
+        status_code=status.HTTP_403_FORBIDDEN,
+        detail="Not enough permissions"
+    )
+
+class IntrospectionRequest(BaseModel):
+    tokens: List[str] = Field(..., min_length=1, max_length=settings.INTROSPECTION_MAX_TOKENS)
+
+class IntrospectionResult(BaseModel):
+    """Wynik introspekcji pojedynczego tokenu (RFC 7662)."""
+    active: bool
+    sub: Optional[str] = None
+    scope: Optional[str] = None
+    username: Optional[str] = None
+    token_type: Optional[str] = None
+    exp: Optional[int] = None
+    iat: Optional[int] = None
+    jti: Optional[str] = None
+
+class IntrospectionResponse(BaseModel):
+    results: List[IntrospectionResult]
+
+@router.post("/introspect", response_model=IntrospectionResponse, response_model_exclude_none=True)
+async def introspect_tokens(
+    introspection: IntrospectionRequest,
+    current_user = Depends(get_introspection_caller),
+    db: AsyncSession = Depends(get_db)
+):
+    """Introspekcja wielu tokenów w jednym żądaniu (wsadowy wariant RFC 7662)."""
+    results = [IntrospectionResult(active=False) for _ in introspection.tokens]
+    
+    # Dekodowanie i weryfikacja podpisu - nieprawidłowe tokeny są po prostu nieaktywne
+    decoded = []
+    for index, token in enumerate(introspection.tokens):
+        try:
+            claims = auth_service.decode_token(token)
+            decoded.append((index, claims, auth_service.token_data_from_claims(claims)))
+        except (JWTError, KeyError, ValidationError):
+            continue
+    
+    # Unieważnienia sprawdzane zbiorczo dla wszystkich tokenów
+    validity = await token_service.validate_tokens(db, [token_data for _, _, token_data in decoded])
+    for (index, claims, _), is_valid in zip(decoded, validity):
+        if is_valid:
+            results[index] = IntrospectionResult(
+                active=True,
+                sub=claims.get("sub"),
+                scope=" ".join(claims.get("scopes", [])),
+                username=claims.get("username"),
+                token_type=claims.get("type"),
+                exp=claims.get("exp"),
+                iat=claims.get("iat"),
+                jti=claims.get("jti")
+            )
+    
+    return IntrospectionResponse(results=results)
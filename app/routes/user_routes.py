@@ -5,28 +5,32 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.database import get_db
 from app.services.auth_service import (
     get_current_user, create_access_token, 
-    get_current_active_user, get_current_admin,
-    verify_password, get_password_hash
+    get_current_active_user, get_current_admin, get_current_db_user,
+    get_token_claims, verify_password, get_password_hash, auth_service
 )
 from app.services.user_service import create_user, get_user_by_id, authenticate_user, get_user_by_email, get_user_by_username
 from app.services.role_service import assign_role_to_user
 from app.services.token_service import token_service
+from app.services.refresh_token_service import refresh_token_service
 from app.services.password_service import (
     create_password_reset_token,
     verify_reset_token,
     reset_password
 )
 from app.services.email_service import email_service
-from app.services.audit_service import log_security_event, get_failed_login_attempts
+from app.services.audit_service import log_security_event
 from app.core.config import settings
-from jose import jwt
-from typing import List, Annotated
+from app.core.rate_limit_policies import login_rate_limit
+from slowapi.util import get_remote_address
+from typing import List, Annotated, Optional
 from pydantic import BaseModel, EmailStr, constr
 from datetime import datetime, timedelta
 import re
 import os
+import math
 import httpx
 from app.models.errors import ErrorDetail, ErrorTypes, ErrorMessages, ErrorResponse
+from app.models.token import RefreshRequest
 
 logger = logging.getLogger(__name__)
 
@@ -63,6 +67,7 @@ class Token(BaseModel):
     access_token: str
     token_type: str
     expires_in: int
+    refresh_token: Optional[str] = None
 
 class TokenData(BaseModel):
     email: str
@@ -156,6 +161,13 @@ async def register_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
             ).dict()
         )
 
+def _rate_limit_headers(decision) -> dict:
+    """Zwraca nagłówki odpowiedzi 429 dla decyzji polityki limitu."""
+    return {
+        "Retry-After": str(math.ceil(decision.retry_after)),
+        "X-RateLimit-Scope": decision.tripped
+    }
+
 @router.post("/token", response_model=Token)
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
@@ -163,15 +175,26 @@ async def login(
     request: Request = None,
     db: AsyncSession = Depends(get_db)
 ):
-    # Sprawdź czy nie przekroczono limitu prób
-    failed_attempts = await get_failed_login_attempts(db, form_data.username)
-    if failed_attempts >= 3:
-        # Wymagaj CAPTCHA po 3 nieudanych próbach
+    # Limity IP, konta i globalny - jedno wywołanie Redis przed uwierzytelnieniem
+    account = form_data.username.lower()
+    ip = get_remote_address(request)
+    decision = await login_rate_limit.check(ip=ip, account=account)
+    if not decision.allowed and decision.denied == ["account"]:
+        # Limit konta to próg CAPTCHA - poprawna weryfikacja pozwala kontynuować
         if not captcha or not await verify_captcha(captcha.captcha_token):
             raise HTTPException(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail="Za dużo prób logowania. Wymagana weryfikacja CAPTCHA"
+                detail="Za dużo prób logowania. Wymagana weryfikacja CAPTCHA",
+                headers=_rate_limit_headers(decision)
             )
+        # Odrzucona próba nie została zaliczona - po CAPTCHA liczy się w limicie IP i globalnym
+        decision = await login_rate_limit.check_without("account", ip=ip, account=account)
+    if not decision.allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Za dużo prób logowania. Spróbuj ponownie później",
+            headers=_rate_limit_headers(decision)
+        )
     
     user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
@@ -195,22 +218,41 @@ async def login(
         user_id=user.id,
         email=user.email
     )
+    # Udane logowanie zeruje licznik konta - próg CAPTCHA dotyczy serii prób
+    await login_rate_limit.reset("account", account)
     
-    scopes = [role.name for role in user.roles]
-    access_token_expires = timedelta(minutes=30)
-    access_token = create_access_token(
-        data={
-            "sub": user.email,
-            "scopes": scopes,
-            "user_id": user.id
-        },
-        expires_delta=access_token_expires
-    )
+    access_token, expires_in = auth_service.issue_access_token(user)
+    refresh_token = await refresh_token_service.issue(db, user.id, token_epoch=user.token_epoch or 0)
     
     return {
         "access_token": access_token,
         "token_type": "bearer",
-        "expires_in": 1800
+        "expires_in": expires_in,
+        "refresh_token": refresh_token
+    }
+
+@router.post("/token/refresh", response_model=Token)
+async def refresh_access_token(
+    refresh_data: RefreshRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Wymienia token odświeżania na nową parę tokenów (rotacja)."""
+    user_id, refresh_token = await refresh_token_service.rotate(db, refresh_data.refresh_token)
+    
+    user = await get_user_by_id(db, user_id)
+    if user is None or not user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Nieprawidłowy lub wygasły token odświeżania",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    access_token, expires_in = auth_service.issue_access_token(user)
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "expires_in": expires_in,
+        "refresh_token": refresh_token
     }
 
 @router.get("/me", response_model=User)
@@ -243,20 +285,17 @@ async def read_user(
 @router.post("/logout")
 async def logout(
     current_user = Security(get_current_active_user),
-    token: str = Depends(OAuth2PasswordBearer(tokenUrl="api/users/token")),
+    claims: dict = Depends(get_token_claims),
+    refresh_data: Optional[RefreshRequest] = None,
     db: AsyncSession = Depends(get_db)
 ):
     try:
-        # Dekoduj token aby uzyskać jti i exp
-        payload = jwt.decode(
-            token,
-            settings.SECRET_KEY,
-            algorithms=[settings.ALGORITHM]
-        )
-        token_data = TokenData(
-            jti=payload.get("jti"),
-            exp=payload.get("exp")
-        )
+        # Wylogowanie kończy też sesję odświeżania
+        if refresh_data is not None:
+            await refresh_token_service.revoke(db, refresh_data.refresh_token)
+        
+        # Claimy zdekodowane już przy uwierzytelnianiu tego żądania
+        token_data = auth_service.token_data_from_claims(claims)
         
         # Unieważnij token
         success, error = await token_service.revoke_token(db, token_data)
@@ -267,11 +306,8 @@ async def logout(
             )
         
         return {"message": "Pomyślnie wylogowano"}
-    except jwt.JWTError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Nieprawidłowy token"
-        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -281,11 +317,11 @@ async def logout(
 @router.post("/change-password")
 async def change_password(
     password_data: PasswordChange,
-    current_user = Security(get_current_active_user),
+    current_user = Security(get_current_db_user),
     request: Request = None,
     db: AsyncSession = Depends(get_db)
 ):
-    if not verify_password(password_data.current_password, current_user.hashed_password):
+    if not await verify_password(password_data.current_password, current_user.hashed_password):
         await log_security_event(
             db, "failed_password_change",
             request,
@@ -309,8 +345,9 @@ async def change_password(
             detail=str(e)
         )
     
-    current_user.hashed_password = get_password_hash(password_data.new_password)
-    await db.commit()
+    current_user.hashed_password = await get_password_hash(password_data.new_password)
+    # Zmiana hasła wylogowuje wszystkie sesje
+    await token_service.bump_token_epoch(db, current_user)
     
     # Loguj zmianę hasła
     await log_security_event(
@@ -1,15 +1,19 @@
 from datetime import datetime, timedelta
-from typing import Optional
-from jose import JWTError, jwt
+from typing import Optional, Tuple, Union
+from jose import JWTError
 from app.models.user import User
 from app.models.token import TokenData
+from app.models.principal import Principal
 from app.core.config import settings
+from app.core.signing_keys import key_ring
 from sqlalchemy.ext.asyncio import AsyncSession
-from fastapi import HTTPException, status, Security, Depends
+from fastapi import HTTPException, status, Security, Depends, Request
 from app.services.user_service import get_user_by_email
 from fastapi.security import OAuth2PasswordBearer
 from app.db.database import get_db
-from passlib.context import CryptContext
+from app.services.hashing_service import hashing_service
+from app.services.token_service import token_service
+from app.monitoring.auth_metrics import AUTH_TOKEN_DECODES, AUTH_PRINCIPAL_RESOLUTIONS
 import uuid
 import logging
 
@@ -32,17 +36,16 @@ class AuthService:
     """Serwis do obsługi autoryzacji i uwierzytelniania."""
     
     def __init__(self):
-        self.secret_key = settings.SECRET_KEY
-        self.algorithm = settings.ALGORITHM
+        self.key_ring = key_ring
         self.access_token_expire_minutes = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 
-    def verify_password(self, plain_password: str, hashed_password: str) -> bool:
-        """Weryfikuje hasło."""
-        return User.verify_password(plain_password, hashed_password)
+    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+        """Weryfikuje hasło w puli procesów hashowania."""
+        return await hashing_service.verify(plain_password, hashed_password)
 
-    def get_password_hash(self, password: str) -> str:
-        """Generuje hash hasła."""
-        return User.get_password_hash(password)
+    async def get_password_hash(self, password: str) -> str:
+        """Generuje hash hasła w puli procesów hashowania."""
+        return await hashing_service.hash(password)
 
     async def authenticate_user(self, db: AsyncSession, email: str, password: str) -> Optional[User]:
         """Uwierzytelnia użytkownika."""
@@ -51,7 +54,7 @@ class AuthService:
             if not user:
                 self._last_error = ErrorMessages.USER_NOT_FOUND
                 return None
-            if not self.verify_password(password, user.hashed_password):
+            if not await self.verify_password(password, user.hashed_password):
                 self._last_error = ErrorMessages.INVALID_CREDENTIALS
                 await self._log_failed_login(db, email)
                 return None
@@ -62,7 +65,12 @@ class AuthService:
             self._last_error = ErrorMessages.SERVER_ERROR
             return None
 
-    def create_access_token(self, data: dict, expires_delta: Optional[timedelta] = None) -> str:
+    def create_access_token(
+        self,
+        data: dict,
+        expires_delta: Optional[timedelta] = None,
+        token_epoch: Optional[int] = None
+    ) -> str:
         """Tworzy token dostępu z dodatkowymi zabezpieczeniami."""
         to_encode = data.copy()
         expire = datetime.utcnow() + (expires_delta or timedelta(minutes=self.access_token_expire_minutes))
@@ -74,36 +82,114 @@ class AuthService:
             "jti": str(uuid.uuid4()),  # Unikalny identyfikator tokenu
             "type": "access"  # Typ tokenu
         })
+        if token_epoch is not None:
+            to_encode["epoch"] = token_epoch  # Epoka tokenów użytkownika
         
-        return jwt.encode(to_encode, self.secret_key, algorithm=self.algorithm)
+        return self.key_ring.encode(to_encode)
 
-    async def get_current_user(self, token: str, db: AsyncSession) -> User:
+    def issue_access_token(self, user: User) -> Tuple[str, int]:
+        """Wydaje token dostępu dla użytkownika; zwraca token i czas życia w sekundach."""
+        claims = {
+            "sub": user.email,
+            "scopes": [role.name for role in user.roles],
+            "user_id": user.id
+        }
+        if settings.STATELESS_PRINCIPAL:
+            # Kolejne żądania autoryzowane z claimów, bez zapytań o użytkownika
+            claims.update(self.principal_claims(user))
+        expires_delta = timedelta(minutes=self.access_token_expire_minutes)
+        token = self.create_access_token(claims, expires_delta, token_epoch=user.token_epoch)
+        return token, int(expires_delta.total_seconds())
+
+    def principal_claims(self, user: User) -> dict:
+        """Zwraca claimy pozwalające autoryzować żądania bez ładowania użytkownika."""
+        role_names = [role.name for role in user.roles]
+        return {
+            "username": user.username,
+            "role_ids": [role.id for role in user.roles],
+            "is_active": bool(user.is_active),
+            "is_admin": bool(user.is_superuser) or "admin" in role_names,
+            # Wersja claimów - po zmianie ról tożsamość jest ładowana z bazy do odświeżenia tokenu
+            "ver": user.claims_version or 0
+        }
+
+    def decode_token(self, token: str, request: Optional[Request] = None) -> dict:
+        """Dekoduje token JWT; z podanym request - najwyżej raz na żądanie."""
+        if request is not None:
+            claims = getattr(request.state, "token_claims", None)
+            if claims is not None:
+                return claims
+        AUTH_TOKEN_DECODES.inc()
+        claims = self.key_ring.decode(token)
+        if request is not None:
+            request.state.token_claims = claims
+        return claims
+
+    @staticmethod
+    def token_data_from_claims(payload: dict) -> TokenData:
+        """Tworzy dane tokenu do walidacji i unieważniania na podstawie claimów."""
+        return TokenData(
+            email=payload["sub"],
+            jti=payload.get("jti"),
+            exp=payload.get("exp"),
+            user_id=payload.get("user_id"),
+            epoch=payload.get("epoch")
+        )
+
+    async def get_current_user(
+        self,
+        token: str,
+        db: AsyncSession,
+        request: Optional[Request] = None
+    ) -> Union[User, Principal]:
         """Pobiera aktualnego użytkownika na podstawie tokenu."""
+        if request is not None:
+            principal = getattr(request.state, "principal", None)
+            if principal is not None:
+                AUTH_PRINCIPAL_RESOLUTIONS.labels(source="request_cache").inc()
+                return principal
+
         credentials_exception = HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
         try:
-            payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
-            email: str = payload.get("sub")
-            if email is None:
+            payload = self.decode_token(token, request)
+            if payload.get("sub") is None:
                 raise credentials_exception
-            token_data = TokenData(email=email)
+            token_data = self.token_data_from_claims(payload)
         except JWTError:
             raise credentials_exception
-        user = await get_user_by_email(db, token_data.email)
-        if user is None:
+        is_valid, _ = await token_service.validate_token(db, token_data)
+        if not is_valid:
             raise credentials_exception
-        return user
 
-    async def get_current_active_user(self, user: User = Security(get_current_user)) -> User:
+        if (
+            settings.STATELESS_PRINCIPAL
+            and "ver" in payload
+            and payload["ver"] >= await token_service.get_claims_version(db, token_data.user_id)
+        ):
+            principal = Principal.from_claims(payload)
+            AUTH_PRINCIPAL_RESOLUTIONS.labels(source="claims").inc()
+        else:
+            # Brak claimów tożsamości lub claimy sprzed zmiany ról - odczyt z bazy
+            principal = await get_user_by_email(db, token_data.email)
+            if principal is None:
+                raise credentials_exception
+            AUTH_PRINCIPAL_RESOLUTIONS.labels(source="database").inc()
+
+        if request is not None:
+            request.state.principal = principal
+        return principal
+
+    async def get_current_active_user(self, user: Union[User, Principal] = Security(get_current_user)) -> Union[User, Principal]:
         """Pobiera aktualnego aktywnego użytkownika."""
         if not user.is_active:
             raise HTTPException(status_code=400, detail="Inactive user")
         return user
 
-    async def get_current_admin(self, user: User = Security(get_current_active_user)) -> User:
+    async def get_current_admin(self, user: Union[User, Principal] = Security(get_current_active_user)) -> Union[User, Principal]:
         """Pobiera aktualnego użytkownika z uprawnieniami administratora."""
         if not user.is_admin:
             raise HTTPException(
@@ -125,26 +211,65 @@ class AuthService:
 auth_service = AuthService()
 
 # Eksportujemy funkcje
-async def get_current_user(token: str = Security(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> User:
-    """Pobiera aktualnego użytkownika na podstawie tokenu."""
-    return await auth_service.get_current_user(token, db)
+async def get_token_claims(request: Request, token: str = Security(oauth2_scheme)) -> dict:
+    """Zwraca claimy tokenu bieżącego żądania (dekodowane raz na żądanie)."""
+    try:
+        return auth_service.decode_token(token, request)
+    except JWTError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+async def get_current_user(request: Request, token: str = Security(oauth2_scheme)) -> Union[User, Principal]:
+    """Zwraca tożsamość ustaloną przez AuthenticationMiddleware."""
+    # oauth2_scheme deklaruje schemat w OpenAPI - token weryfikuje middleware
+    principal = getattr(request.state, "principal", None)
+    if principal is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return principal
 
-async def get_current_active_user(user: User = Security(get_current_user)) -> User:
+async def get_current_active_user(user: Union[User, Principal] = Security(get_current_user)) -> Union[User, Principal]:
     """Pobiera aktualnego aktywnego użytkownika."""
     return await auth_service.get_current_active_user(user)
 
-async def get_current_admin(user: User = Security(get_current_active_user)) -> User:
+async def get_current_admin(user: Union[User, Principal] = Security(get_current_active_user)) -> Union[User, Principal]:
     """Pobiera aktualnego użytkownika z uprawnieniami administratora."""
     return await auth_service.get_current_admin(user)
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
+async def get_current_db_user(
+    user: Union[User, Principal] = Security(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+) -> User:
+    """Pobiera wiersz User aktualnego użytkownika - dla handlerów modyfikujących konto."""
+    if isinstance(user, Principal):
+        db_user = await user.load_user(db)
+    elif user in db:
+        return user
+    else:
+        # Użytkownik załadowany w sesji middleware - pobierz go w sesji handlera
+        db_user = await db.get(User, user.id)
+    if db_user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
+    return db_user
+
+def create_access_token(
+    data: dict,
+    expires_delta: Optional[timedelta] = None,
+    token_epoch: Optional[int] = None
+) -> str:
     """Tworzy token dostępu."""
-    return auth_service.create_access_token(data, expires_delta)
+    return auth_service.create_access_token(data, expires_delta, token_epoch)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Weryfikuje hasło."""
-    return auth_service.verify_password(plain_password, hashed_password)
+    return await auth_service.verify_password(plain_password, hashed_password)
 
-def get_password_hash(password: str) -> str:
+async def get_password_hash(password: str) -> str:
     """Generuje hash hasła."""
-    return auth_service.get_password_hash(password) 
\ No newline at end of file
+    return await auth_service.get_password_hash(password) 
\ No newline at end of file
@@ -1,39 +1,164 @@
 from datetime import datetime, timedelta
-from sqlalchemy import delete, and_, func
-from app.models.token import RevokedToken, PasswordResetToken
+from typing import Dict, List, Optional
+from sqlalchemy import Table, delete, select, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+# Modele użytkownika muszą zostać zarejestrowane przed modelami tokenów
+from app.models.user import User
+from app.models.token import RefreshToken, PasswordResetToken, PasswordResetAttempt
+from app.core.config import settings
 from app.db.database import async_session
 from app.monitoring.db_metrics import monitor_db_operation
-from app.monitoring.token_metrics import TOKEN_OPERATIONS
-from app.core.cache import redis_cache
+from app.monitoring.token_metrics import (
+    TOKEN_OPERATIONS,
+    TOKEN_CLEANUP_DURATION,
+    TOKEN_CLEANUP_ROWS,
+    TOKEN_CLEANUP_ROWS_PER_SECOND,
+    TOKEN_CLEANUP_LAG
+)
+from app.services.token_service import token_service
 import logging
 import asyncio
+import time
 
 logger = logging.getLogger(__name__)
 
+class CleanupTarget:
+    """Tabela czyszczona partiami: wiersze z kolumną czasu starszą niż retencja."""
+    __slots__ = ("table", "time_column", "retention", "name")
+
+    def __init__(
+        self,
+        table: Table,
+        time_column: str,
+        retention: timedelta = timedelta(0),
+        name: Optional[str] = None
+    ):
+        self.table = table
+        self.time_column = time_column
+        self.retention = retention
+        # Nazwa w metrykach - odróżnia kilka reguł czyszczenia jednej tabeli
+        self.name = name or table.name
+
+def default_targets() -> List[CleanupTarget]:
+    """Zwraca tabele czyszczone przez zadanie porządkowe."""
+    return [
+        # revoked_tokens bez DELETE - odczyty pomijają wygasłe wpisy, a usuwa je partition_manager
+        # razem z całą partycją (bez martwych krotek w partycji zapisywanej przy wylogowaniu)
+        CleanupTarget(RefreshToken.__table__, "expires_at"),
+        # Użyty token służy już tylko wykrywaniu ponownego użycia - do końca okna wykrywania
+        CleanupTarget(
+            RefreshToken.__table__,
+            "used_at",
+            timedelta(hours=settings.REFRESH_TOKEN_REUSE_DETECTION_HOURS),
+            name="refresh_tokens_used"
+        ),
+        CleanupTarget(PasswordResetToken.__table__, "expires_at"),
+        CleanupTarget(
+            PasswordResetAttempt.__table__,
+            "attempt_time",
+            timedelta(hours=settings.PASSWORD_RESET_ATTEMPT_RETENTION_HOURS)
+        ),
+    ]
+
 class TokenCleanupService:
-    def __init__(self):
-        self._batch_size = 1000
+    def __init__(
+        self,
+        batch_size: int = settings.TOKEN_CLEANUP_BATCH_SIZE,
+        batch_delay: float = settings.TOKEN_CLEANUP_BATCH_DELAY,
+        max_runtime: float = settings.TOKEN_CLEANUP_MAX_RUNTIME,
+        targets: Optional[List[CleanupTarget]] = None,
+        session_factory=async_session
+    ):
+        self._batch_size = batch_size
+        self._batch_delay = batch_delay
+        self._max_runtime = max_runtime
+        self._targets = targets if targets is not None else default_targets()
+        self._session_factory = session_factory
         self._cleanup_lock = asyncio.Lock()
-        self._cache = redis_cache
+        self._token_service = token_service
+        # Czas ostatniego przebiegu, który usunął wszystkie wygasłe wiersze tabeli
+        self._completed_at: Dict[str, float] = {}
+        for target in self._targets:
+            self._completed_at[target.name] = time.time()
+            TOKEN_CLEANUP_LAG.labels(table=target.name).set_function(
+                lambda name=target.name: time.time() - self._completed_at[name]
+            )
+
+    async def _cleanup_table(self, session: AsyncSession, target: CleanupTarget, deadline: float) -> int:
+        """Usuwa wygasłe wiersze tabeli partiami po kluczu (id > ostatni), do wyczerpania budżetu."""
+        id_column = target.table.c.id
+        time_column = target.table.c[target.time_column]
+        # Stały punkt odcięcia - wiersze wygasające w trakcie przebiegu poczekają na kolejny
+        condition = time_column < datetime.utcnow() - target.retention
+        started = time.monotonic()
+        last_id = 0
+        deleted = 0
+
+        while time.monotonic() < deadline:
+            result = await session.execute(
+                select(id_column)
+                .where(and_(id_column > last_id, condition))
+                .order_by(id_column)
+                .limit(self._batch_size)
+            )
+            ids = result.scalars().all()
+            if not ids:
+                self._completed_at[target.name] = time.time()
+                break
+
+            result = await session.execute(
+                delete(target.table).where(and_(id_column.in_(ids), condition))
+            )
+            # Krótka transakcja na partię - blokady nie są trzymane między partiami
+            await session.commit()
+            deleted += result.rowcount
+            last_id = ids[-1]
+            TOKEN_CLEANUP_ROWS.labels(table=target.name).inc(result.rowcount)
+
+            if len(ids) < self._batch_size:
+                self._completed_at[target.name] = time.time()
+                break
+            # Przerwa oddaje I/O bazy ścieżce logowania
+            await asyncio.sleep(self._batch_delay)
+        else:
+            logger.info(f"Przekroczono budżet czasu czyszczenia tabeli {target.name}")
+
+        elapsed = time.monotonic() - started
+        TOKEN_CLEANUP_ROWS_PER_SECOND.labels(table=target.name).set(deleted / elapsed if elapsed > 0 else 0)
+        return deleted
+
+    async def _cleanup_tokens(self, session: AsyncSession) -> int:
+        """Czyści kolejne tabele w ramach wspólnego budżetu czasu."""
+        deadline = time.monotonic() + self._max_runtime
+        total_deleted = 0
+        for target in self._targets:
+            if time.monotonic() >= deadline:
+                break
+            total_deleted += await self._cleanup_table(session, target, deadline)
+        return total_deleted
+
+    async def _update_cache(self) -> None:
+        """Usuwa wygasłe wpisy z pamięci podręcznej tokenów."""
+        await self._token_service.cleanup_expired_tokens()
 
     @monitor_db_operation("cleanup_tokens")
     async def cleanup_expired_tokens(self):
         """Czyści tokeny z wykorzystaniem blokady i cache."""
-        if not await self._cleanup_lock.acquire(blocking=False):
+        if self._cleanup_lock.locked():
             logger.info("Czyszczenie tokenów już trwa")
             return
 
-        try:
-            async with async_session() as session:
-                total_deleted = await self._cleanup_tokens(session)
-                await self._update_cache()
+        async with self._cleanup_lock:
+            try:
+                with TOKEN_CLEANUP_DURATION.time():
+                    async with self._session_factory() as session:
+                        total_deleted = await self._cleanup_tokens(session)
+                    await self._update_cache()
                 TOKEN_OPERATIONS.labels(operation="cleanup", status="success").inc()
                 logger.info(f"Wyczyszczono {total_deleted} tokenów")
-        except Exception as e:
-            TOKEN_OPERATIONS.labels(operation="cleanup", status="error").inc()
-            logger.error(f"Błąd podczas czyszczenia tokenów: {str(e)}")
-            raise
-        finally:
-            self._cleanup_lock.release()
-
-cleanup_service = TokenCleanupService() 
\ No newline at end of file
+            except Exception as e:
+                TOKEN_OPERATIONS.labels(operation="cleanup", status="error").inc()
+                logger.error(f"Błąd podczas czyszczenia tokenów: {str(e)}")
+                raise
+
+cleanup_service = TokenCleanupService()
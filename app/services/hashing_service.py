@@ -0,0 +1,117 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+from app.core.config import settings
+from app.core.exceptions import ServiceUnavailableException
+from app.monitoring.hashing_metrics import (
+    HASHING_QUEUE_WAIT,
+    HASHING_DURATION,
+    HASHING_IN_FLIGHT,
+    HASHING_REJECTED
+)
+from app.utils.password import verify_password, get_password_hash, timed_call
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class PasswordHashingService:
+    """Asynchroniczne hashowanie haseł (bcrypt) w ograniczonej puli procesów."""
+
+    def __init__(
+        self,
+        max_workers: int = settings.PASSWORD_HASH_WORKERS,
+        max_queue: int = settings.PASSWORD_HASH_MAX_QUEUE,
+        timeout: float = settings.PASSWORD_HASH_TIMEOUT
+    ):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._in_flight = 0
+
+    @property
+    def in_flight(self) -> int:
+        """Zwraca liczbę zadań oczekujących lub wykonywanych w puli."""
+        return self._in_flight
+
+    def start(self) -> None:
+        """Uruchamia pulę procesów (wywoływane w lifespan)."""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            logger.info(f"Uruchomiono pulę hashowania haseł ({self.max_workers} procesów)")
+
+    def shutdown(self) -> None:
+        """Zamyka pulę procesów."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def hash(self, password: str) -> str:
+        """Generuje hash hasła poza pętlą zdarzeń."""
+        return await self._run("hash", get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """Weryfikuje hasło poza pętlą zdarzeń."""
+        return await self._run("verify", verify_password, plain_password, hashed_password)
+
+    def _release(self) -> None:
+        """Zwalnia slot w kolejce po zakończeniu zadania."""
+        self._in_flight -= 1
+        HASHING_IN_FLIGHT.dec()
+
+    def _release_threadsafe(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Zwalnia slot z wątku puli, przekazując wywołanie do pętli zdarzeń."""
+        try:
+            loop.call_soon_threadsafe(self._release)
+        except RuntimeError:
+            # Pętla została już zamknięta
+            pass
+
+    async def _run(self, operation: str, func: Callable[..., Any], *args) -> Any:
+        """Wysyła zadanie do puli z limitem kolejki i timeoutem."""
+        if self._in_flight >= self.max_queue:
+            HASHING_REJECTED.labels(operation=operation, reason="queue_full").inc()
+            raise ServiceUnavailableException(
+                "Kolejka hashowania haseł jest pełna",
+                details={"in_flight": self._in_flight}
+            )
+
+        self.start()
+        loop = asyncio.get_running_loop()
+        submitted_at = time.time()
+        try:
+            future = self._executor.submit(timed_call, func, *args)
+        except BrokenProcessPool:
+            # Proces roboczy padł - pula zostanie odtworzona przy następnym wywołaniu
+            self._executor = None
+            HASHING_REJECTED.labels(operation=operation, reason="broken_pool").inc()
+            raise ServiceUnavailableException("Pula hashowania haseł jest niedostępna")
+
+        # Slot zwalniamy dopiero po zakończeniu zadania w procesie,
+        # nawet jeśli wywołujący przekroczył timeout
+        self._in_flight += 1
+        HASHING_IN_FLIGHT.inc()
+        future.add_done_callback(lambda _: self._release_threadsafe(loop))
+
+        try:
+            result, started_at, duration = await asyncio.wait_for(
+                asyncio.wrap_future(future), timeout=self.timeout
+            )
+        except asyncio.TimeoutError:
+            HASHING_REJECTED.labels(operation=operation, reason="timeout").inc()
+            raise ServiceUnavailableException(
+                "Przekroczono czas oczekiwania na hashowanie hasła",
+                details={"timeout": self.timeout}
+            )
+        except BrokenProcessPool:
+            self._executor = None
+            HASHING_REJECTED.labels(operation=operation, reason="broken_pool").inc()
+            raise ServiceUnavailableException("Pula hashowania haseł jest niedostępna")
+
+        HASHING_QUEUE_WAIT.labels(operation=operation).observe(max(0.0, started_at - submitted_at))
+        HASHING_DURATION.labels(operation=operation).observe(duration)
+        return result
+
+hashing_service = PasswordHashingService()
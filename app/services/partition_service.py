@@ -0,0 +1,148 @@
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.db.database import async_session
+from app.monitoring.token_metrics import REVOKED_TOKEN_PARTITIONS, REVOKED_TOKEN_PARTITION_OPERATIONS
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "revoked_tokens"
+PARTITION_PREFIX = f"{PARENT_TABLE}_p"
+# Klucz pg_advisory_xact_lock szeregujący DDL partycji między workerami i podami
+PARTITION_LOCK_KEY = 7_302_185_014
+
+def partition_name(day: date) -> str:
+    """Zwraca nazwę partycji dla danego dnia (UTC)."""
+    return f"{PARTITION_PREFIX}{day:%Y%m%d}"
+
+def partition_day(name: str) -> Optional[date]:
+    """Odczytuje dzień z nazwy partycji; None dla tabel spoza schematu nazw."""
+    if not name.startswith(PARTITION_PREFIX):
+        return None
+    try:
+        return datetime.strptime(name[len(PARTITION_PREFIX):], "%Y%m%d").date()
+    except ValueError:
+        return None
+
+def partition_bounds(day: date) -> Tuple[str, str]:
+    """Zwraca granice zakresu partycji [początek dnia, początek następnego dnia) w UTC."""
+    return (
+        f"{day.isoformat()} 00:00:00+00",
+        f"{(day + timedelta(days=1)).isoformat()} 00:00:00+00"
+    )
+
+def expired_partitions(names: Iterable[str], today: date) -> List[str]:
+    """Wybiera partycje, których cały zakres leży przed początkiem bieżącego dnia."""
+    expired = []
+    for name in names:
+        day = partition_day(name)
+        # Górna granica partycji to północ dnia następnego - musi już minąć
+        if day is not None and day + timedelta(days=1) <= today:
+            expired.append(name)
+    return sorted(expired)
+
+class RevokedTokenPartitionManager:
+    """Utrzymuje dzienne partycje revoked_tokens: tworzy przyszłe i usuwa wygasłe."""
+
+    def __init__(self, premake_days: int = settings.REVOKED_TOKENS_PARTITION_PREMAKE_DAYS):
+        self.premake_days = premake_days
+        self._lock = asyncio.Lock()
+
+    async def list_partitions(self, db: AsyncSession) -> List[str]:
+        """Zwraca nazwy partycji podpiętych do tabeli revoked_tokens."""
+        result = await db.execute(
+            text(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class parent ON pg_inherits.inhparent = parent.oid "
+                "JOIN pg_class child ON pg_inherits.inhrelid = child.oid "
+                "WHERE parent.relname = :parent"
+            ),
+            {"parent": PARENT_TABLE}
+        )
+        return list(result.scalars().all())
+
+    async def lock(self, db: AsyncSession) -> None:
+        """Blokuje DDL partycji do końca bieżącej transakcji."""
+        await db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": PARTITION_LOCK_KEY})
+
+    async def ensure_partitions(
+        self,
+        db: AsyncSession,
+        today: Optional[date] = None,
+        days: Optional[int] = None
+    ) -> List[str]:
+        """Tworzy partycje od bieżącego dnia na days (domyślnie premake_days) dni naprzód."""
+        today = today or datetime.utcnow().date()
+        days = self.premake_days if days is None else days
+        existing = set(await self.list_partitions(db))
+        created = []
+        for offset in range(days + 1):
+            day = today + timedelta(days=offset)
+            name = partition_name(day)
+            if name in existing:
+                continue
+            start, end = partition_bounds(day)
+            # Nazwy i granice pochodzą z daty, nie z danych wejściowych
+            await db.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {PARENT_TABLE} "
+                f"FOR VALUES FROM ('{start}') TO ('{end}')"
+            ))
+            created.append(name)
+        return created
+
+    async def drop_expired_partitions(self, db: AsyncSession, today: Optional[date] = None) -> List[str]:
+        """Odłącza i usuwa partycje zawierające wyłącznie wygasłe tokeny."""
+        today = today or datetime.utcnow().date()
+        dropped = expired_partitions(await self.list_partitions(db), today)
+        for name in dropped:
+            # Operacja na metadanych - bez DELETE wierszy, bez martwych krotek i VACUUM
+            await db.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+            await db.execute(text(f"DROP TABLE {name}"))
+        return dropped
+
+    async def ensure_startup_partitions(self) -> None:
+        """Zapewnia partycje na dziś i jutro przy starcie workera - bez odłączania i usuwania."""
+        try:
+            async with async_session() as db:
+                # Workery startują równocześnie - blokada szereguje CREATE TABLE
+                await self.lock(db)
+                created = await self.ensure_partitions(db, days=1)
+                await db.commit()
+            REVOKED_TOKEN_PARTITION_OPERATIONS.labels(operation="create", status="success").inc(len(created))
+            if created:
+                logger.info(f"Partycje revoked_tokens przy starcie: utworzono {len(created)}")
+        except Exception as e:
+            # Partycje utworzy inny worker lub zadanie lidera - start workera trwa dalej
+            REVOKED_TOKEN_PARTITION_OPERATIONS.labels(operation="create", status="error").inc()
+            logger.warning(f"Nie udało się zapewnić partycji revoked_tokens przy starcie: {str(e)}")
+
+    async def run_maintenance(self) -> None:
+        """Wykonuje jeden cykl utrzymania partycji (zadanie lidera z harmonogramu)."""
+        if self._lock.locked():
+            logger.info("Utrzymanie partycji revoked_tokens już trwa")
+            return
+
+        async with self._lock:
+            try:
+                async with async_session() as db:
+                    await self.lock(db)
+                    created = await self.ensure_partitions(db)
+                    dropped = await self.drop_expired_partitions(db)
+                    await db.commit()
+                    REVOKED_TOKEN_PARTITIONS.set(len(await self.list_partitions(db)))
+                REVOKED_TOKEN_PARTITION_OPERATIONS.labels(operation="create", status="success").inc(len(created))
+                REVOKED_TOKEN_PARTITION_OPERATIONS.labels(operation="drop", status="success").inc(len(dropped))
+                logger.info(
+                    f"Partycje revoked_tokens: utworzono {len(created)}, usunięto {len(dropped)}"
+                )
+            except Exception as e:
+                REVOKED_TOKEN_PARTITION_OPERATIONS.labels(operation="maintenance", status="error").inc()
+                logger.error(f"Błąd utrzymania partycji revoked_tokens: {str(e)}")
+                raise
+
+# Globalna instancja zarządcy partycji
+partition_manager = RevokedTokenPartitionManager()
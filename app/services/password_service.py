@@ -5,6 +5,7 @@ from app.models.token import PasswordResetToken
 from app.models.user import User
 from fastapi import HTTPException, status
 from app.services.auth_service import get_password_hash
+from app.services.token_service import token_service
 import secrets
 import string
 
@@ -87,7 +88,8 @@ async def reset_password(
     reset_token.used = True
     
     # Zaktualizuj hasło
-    user.hashed_password = get_password_hash(new_password)
+    user.hashed_password = await get_password_hash(new_password)
     
-    await db.commit()
+    # Reset hasła wylogowuje wszystkie sesje
+    await token_service.bump_token_epoch(db, user)
     return user 
\ No newline at end of file
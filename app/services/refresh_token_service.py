@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import HTTPException, status
+# Modele użytkownika muszą zostać zarejestrowane przed modelami tokenów
+from app.models.user import User
+from app.models.token import RefreshToken
+from app.core.config import settings
+from app.monitoring.token_metrics import TOKEN_OPERATIONS
+from typing import Optional, Tuple
+import hashlib
+import logging
+import secrets
+import uuid
+
+logger = logging.getLogger(__name__)
+
+REFRESH_TOKEN_BYTES = 32
+
+def hash_refresh_token(token: str) -> str:
+    """Zwraca skrót tokenu odświeżania - w bazie nie trzymamy wartości jawnej."""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+class RefreshTokenService:
+    """Serwis rotowanych tokenów odświeżania z wykrywaniem ponownego użycia."""
+
+    def __init__(self, expire_days: int = settings.REFRESH_TOKEN_EXPIRE_DAYS):
+        self.expire_days = expire_days
+
+    @staticmethod
+    def _invalid_token_exception(detail: str = "Nieprawidłowy lub wygasły token odświeżania") -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=detail,
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    async def issue(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        family_id: Optional[str] = None,
+        token_epoch: int = 0
+    ) -> str:
+        """Wydaje nowy token odświeżania (nowa rodzina przy logowaniu) w bieżącej epoce użytkownika."""
+        token = secrets.token_urlsafe(REFRESH_TOKEN_BYTES)
+        db.add(RefreshToken(
+            token_hash=hash_refresh_token(token),
+            family_id=family_id or str(uuid.uuid4()),
+            user_id=user_id,
+            expires_at=datetime.now(timezone.utc) + timedelta(days=self.expire_days),
+            token_epoch=token_epoch
+        ))
+        await db.commit()
+        TOKEN_OPERATIONS.labels(operation="refresh_issue", status="success").inc()
+        return token
+
+    async def rotate(self, db: AsyncSession, token: str) -> Tuple[int, str]:
+        """Wymienia token odświeżania na nowy; zwraca id użytkownika i nowy token."""
+        result = await db.execute(
+            select(RefreshToken, User.token_epoch)
+            .join(User, User.id == RefreshToken.user_id)
+            .where(RefreshToken.token_hash == hash_refresh_token(token))
+            .with_for_update(of=RefreshToken)  # Równoległe rotacje tego samego tokenu są serializowane
+        )
+        row = result.one_or_none()
+        if row is None:
+            TOKEN_OPERATIONS.labels(operation="refresh_rotate", status="invalid").inc()
+            raise self._invalid_token_exception()
+        stored, current_epoch = row
+
+        if (stored.token_epoch or 0) < (current_epoch or 0):
+            # Zmiana hasła, dezaktywacja lub "wyloguj wszędzie" po wydaniu - rodzina traci ważność
+            await self._revoke_family(db, stored.family_id)
+            await db.commit()
+            TOKEN_OPERATIONS.labels(operation="refresh_rotate", status="epoch_revoked").inc()
+            raise self._invalid_token_exception()
+
+        if stored.used_at is not None or stored.revoked:
+            # Ponowne użycie - token mógł wyciec, unieważnij całą rodzinę
+            await self._revoke_family(db, stored.family_id)
+            await db.commit()
+            TOKEN_OPERATIONS.labels(operation="refresh_rotate", status="reuse_detected").inc()
+            logger.warning(f"Wykryto ponowne użycie tokenu odświeżania (użytkownik {stored.user_id})")
+            raise self._invalid_token_exception("Wykryto ponowne użycie tokenu odświeżania")
+
+        now = datetime.now(timezone.utc)
+        expires_at = stored.expires_at
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        if expires_at <= now:
+            TOKEN_OPERATIONS.labels(operation="refresh_rotate", status="expired").inc()
+            raise self._invalid_token_exception()
+
+        stored.used_at = now
+        new_token = await self.issue(db, stored.user_id, stored.family_id, stored.token_epoch)
+        TOKEN_OPERATIONS.labels(operation="refresh_rotate", status="success").inc()
+        return stored.user_id, new_token
+
+    async def revoke(self, db: AsyncSession, token: str) -> None:
+        """Unieważnia rodzinę, do której należy token (wylogowanie)."""
+        result = await db.execute(
+            select(RefreshToken.family_id).where(RefreshToken.token_hash == hash_refresh_token(token))
+        )
+        family_id = result.scalar_one_or_none()
+        if family_id is not None:
+            await self._revoke_family(db, family_id)
+            await db.commit()
+
+    async def _revoke_family(self, db: AsyncSession, family_id: str) -> None:
+        """Oznacza wszystkie tokeny rodziny jako unieważnione."""
+        await db.execute(
+            update(RefreshToken)
+            .where(RefreshToken.family_id == family_id)
+            .values(revoked=True)
+        )
+
+# Globalna instancja serwisu tokenów odświeżania
+refresh_token_service = RefreshTokenService()
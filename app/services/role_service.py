@@ -1,15 +1,140 @@
-from sqlalchemy import select
+from sqlalchemy import Select, delete, func, insert, select, text
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
-from app.models.user import Role, User, Permission
+from app.models.user import (
+    Role,
+    User,
+    Permission,
+    role_effective_permissions,
+    role_hierarchy,
+    role_permissions
+)
+from app.models.principal import Principal
+from app.core.cache import redis_cache, RedisCache
+from app.core.config import settings
+from app.monitoring.auth_metrics import (
+    ROLE_PERMISSION_CACHE_HITS,
+    ROLE_PERMISSION_CACHE_MISSES,
+    ROLE_PERMISSION_CACHE_LOADS
+)
+from app.services.token_service import token_service
+from app.services.user_service import get_user_by_id
 from fastapi import HTTPException, status
-from typing import List, Set
-from functools import lru_cache
+from typing import Awaitable, Callable, Dict, FrozenSet, Hashable, List, Optional, Tuple, Union
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_RETRY_DELAY = 1.0  # Opóźnienie ponownej subskrypcji (sekundy)
+
+class RolePermissionCache:
+    """Uprawnienia zestawów ról (klucz: posortowane id ról) współdzielone między żądaniami, ładowane single-flight."""
+
+    def __init__(
+        self,
+        ttl: float = settings.ROLE_PERMISSION_CACHE_TTL,
+        clock: Callable[[], float] = time.monotonic,
+        cache: RedisCache = redis_cache
+    ):
+        self.ttl = ttl
+        self._clock = clock
+        self._cache = cache
+        self._listener_task: Optional[asyncio.Task] = None
+        self._entries: Dict[Hashable, Tuple[float, FrozenSet[str]]] = {}
+        self._loading: Dict[Hashable, asyncio.Future] = {}
+        # Wynik ładowania rozpoczętego przed unieważnieniem nie trafia do pamięci
+        self._generation = 0
+
+    async def get(self, key: Hashable, loader: Callable[[], Awaitable[FrozenSet[str]]]) -> FrozenSet[str]:
+        """Zwraca uprawnienia dla klucza; równoległe chybienia czekają na jedno ładowanie."""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > self._clock():
+            ROLE_PERMISSION_CACHE_HITS.inc()
+            return entry[1]
+        ROLE_PERMISSION_CACHE_MISSES.inc()
+
+        pending = self._loading.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading[key] = future
+        generation = self._generation
+        try:
+            permissions = await loader()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # Błąd trafia do oczekujących; bez ostrzeżenia o nieodebranym wyjątku
+                future.exception()
+            raise
+        finally:
+            if self._loading.get(key) is future:
+                del self._loading[key]
+
+        ROLE_PERMISSION_CACHE_LOADS.inc()
+        if generation == self._generation:
+            self._entries[key] = (self._clock() + self.ttl, permissions)
+        future.set_result(permissions)
+        return permissions
+
+    def invalidate(self) -> None:
+        """Unieważnia wszystkie wpisy - zmiana jednej roli zmienia domknięcie ról, które po niej dziedziczą."""
+        self._generation += 1
+        self._entries.clear()
+        self._loading.clear()
+
+    async def broadcast_invalidation(self) -> None:
+        """Unieważnia wpisy w tym procesie i publikuje unieważnienie do pozostałych workerów."""
+        self.invalidate()
+        await self._cache.publish(settings.ROLE_PERMISSION_INVALIDATION_CHANNEL, "all")
+
+    async def start_listener(self) -> None:
+        """Uruchamia subskrypcję unieważnień z innych workerów (wywoływane w lifespan)."""
+        if self._listener_task is None or self._listener_task.done():
+            self._listener_task = asyncio.create_task(self._listen_for_invalidations())
+
+    async def stop_listener(self) -> None:
+        """Zatrzymuje subskrypcję unieważnień."""
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+        self._listener_task = None
+
+    async def _listen_for_invalidations(self) -> None:
+        """Unieważnia wpisy po zmianie ról w dowolnym workerze."""
+        while True:
+            pubsub = self._cache.client.pubsub()
+            try:
+                await pubsub.subscribe(settings.ROLE_PERMISSION_INVALIDATION_CHANNEL)
+                async for message in pubsub.listen():
+                    # Po (ponownej) subskrypcji wpisy mogą pochodzić sprzed przegapionej zmiany
+                    if message["type"] in ("subscribe", "message"):
+                        self.invalidate()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Błąd subskrypcji unieważnień uprawnień ról: {str(e)}")
+            finally:
+                # Bez subskrypcji nieaktualność wpisów ogranicza tylko TTL
+                self.invalidate()
+                await pubsub.aclose()
+            await asyncio.sleep(INVALIDATION_RETRY_DELAY)
+
+# Globalna pamięć podręczna uprawnień ról
+role_permission_cache = RolePermissionCache()
 
 async def get_role_by_name(db: AsyncSession, name: str):
     result = await db.execute(
         select(Role)
-        .options(selectinload(Role.permissions))
+        .options(selectinload(Role.permissions), selectinload(Role.parent_roles))
         .where(Role.name == name)
     )
     return result.scalar_one_or_none()
@@ -30,7 +155,7 @@ async def create_role(db: AsyncSession, name: str, description: str = None, pare
             if parent_role:
                 role.parent_roles.append(parent_role)
     
-    await db.commit()
+    await _commit_role_change(db, role)
     await db.refresh(role)
     return role
 
@@ -77,45 +202,141 @@ async def assign_permission_to_role(
     
     if permission not in role.permissions:
         role.permissions.append(permission)
-        await db.commit()
+        await _commit_role_change(db, role)
         await db.refresh(role)
     
     return role
 
-@lru_cache(maxsize=1000)
-async def get_role_permissions(db: AsyncSession, role_name: str) -> Set[str]:
-    role = await get_role_by_name(db, role_name)
-    if not role:
-        return set()
-    
-    permissions = set()
+def role_closure_query(role_ids: Optional[List[int]] = None) -> Select:
+    """Buduje jedno zapytanie rekurencyjne (role_id, "zasób:akcja") domknięcia podanych ról; None - wszystkich ról."""
+    roles = Role.__table__
+    anchor = select(roles.c.id.label("root_id"), roles.c.id.label("role_id"))
+    if role_ids is not None:
+        anchor = anchor.where(roles.c.id.in_(role_ids))
+    closure = anchor.cte("role_closure", recursive=True)
+    # UNION (bez ALL) usuwa powtórzenia - cykl w hierarchii nie zapętla rekurencji
+    closure = closure.union(
+        select(closure.c.root_id, role_hierarchy.c.parent_role_id)
+        .join(role_hierarchy, role_hierarchy.c.child_role_id == closure.c.role_id)
+    )
+    permissions = Permission.__table__
+    return (
+        select(closure.c.root_id, (permissions.c.resource + ":" + permissions.c.action).label("permission"))
+        .distinct()
+        .select_from(closure)
+        .join(role_permissions, role_permissions.c.role_id == closure.c.role_id)
+        .join(permissions, permissions.c.id == role_permissions.c.permission_id)
+    )
+
+async def descendant_role_ids(db: AsyncSession, role_id: int) -> List[int]:
+    """Zwraca id roli i wszystkich ról, które po niej dziedziczą (jedno zapytanie rekurencyjne)."""
+    roles = Role.__table__
+    descendants = select(roles.c.id.label("role_id")).where(roles.c.id == role_id).cte(
+        "descendant_roles", recursive=True
+    )
+    descendants = descendants.union(
+        select(role_hierarchy.c.child_role_id)
+        .join(descendants, role_hierarchy.c.parent_role_id == descendants.c.role_id)
+    )
+    result = await db.execute(select(descendants.c.role_id))
+    return list(result.scalars().all())
+
+async def _lock_role_closure(db: AsyncSession) -> None:
+    """Szereguje zapisy tabeli domknięcia do końca transakcji; odczyty nie są blokowane (PostgreSQL)."""
+    if db.get_bind().dialect.name == "postgresql":
+        await db.execute(text("LOCK TABLE role_effective_permissions IN SHARE ROW EXCLUSIVE MODE"))
+
+async def refresh_role_closure(db: AsyncSession, role_id: int) -> List[int]:
+    """Przelicza domknięcie roli i ról po niej dziedziczących - tylko poddrzewa dotkniętego zmianą."""
+    # Blokada przed odczytem hierarchii - kolejne zapytania widzą zmiany zatwierdzone przez poprzednika
+    await _lock_role_closure(db)
+    role_ids = await descendant_role_ids(db, role_id)
+    await db.execute(
+        delete(role_effective_permissions).where(role_effective_permissions.c.role_id.in_(role_ids))
+    )
+    await db.execute(
+        insert(role_effective_permissions).from_select(["role_id", "permission"], role_closure_query(role_ids))
+    )
+    return role_ids
+
+async def rebuild_role_closure(db: AsyncSession) -> int:
+    """Odbudowuje całą tabelę domknięcia jednym przebiegiem (np. po migracji lub imporcie ról)."""
+    await _lock_role_closure(db)
+    await db.execute(delete(role_effective_permissions))
+    await db.execute(
+        insert(role_effective_permissions).from_select(["role_id", "permission"], role_closure_query())
+    )
+    await db.commit()
+    await role_permission_cache.broadcast_invalidation()
+    result = await db.execute(select(func.count()).select_from(role_effective_permissions))
+    return result.scalar()
+
+async def _commit_role_change(db: AsyncSession, role: Role) -> None:
+    """Przelicza domknięcie ról dotkniętych zmianą, zatwierdza ją i unieważnia pamięć podręczną."""
+    await db.flush()
+    await refresh_role_closure(db, role.id)
+    await db.commit()
+    await role_permission_cache.broadcast_invalidation()
+
+async def resolve_user_permissions(db: AsyncSession, role_ids: List[int]) -> FrozenSet[str]:
+    """Rozwiązuje efektywne uprawnienia ról użytkownika jednym odczytem tabeli domknięcia."""
+    if not role_ids:
+        return frozenset()
+    result = await db.execute(
+        select(role_effective_permissions.c.permission)
+        .distinct()
+        .where(role_effective_permissions.c.role_id.in_(role_ids))
+    )
+    return frozenset(result.scalars().all())
+
+def _role_ids(user: Union[User, Principal]) -> List[int]:
+    """Zwraca id ról użytkownika - dla tożsamości z claimów bez ładowania relacji."""
+    if isinstance(user, Principal):
+        return user.role_ids
+    return [role.id for role in user.roles]
+
+async def get_user_permissions(db: AsyncSession, user: Union[User, Principal]) -> FrozenSet[str]:
+    """Zwraca efektywne uprawnienia użytkownika (z dziedziczonymi) z pamięci podręcznej."""
+    role_ids = sorted(set(_role_ids(user)))
+    return await role_permission_cache.get(tuple(role_ids), lambda: resolve_user_permissions(db, role_ids))
+
+async def check_permission(db: AsyncSession, user: Union[User, Principal], resource: str, action: str) -> bool:
+    if user.is_admin if isinstance(user, Principal) else user.is_superuser:
+        return True
     
-    # Dodaj bezpośrednie uprawnienia roli
-    for permission in role.permissions:
-        permissions.add(f"{permission.resource}:{permission.action}")
+    return f"{resource}:{action}" in await get_user_permissions(db, user)
+
+async def add_parent_role(db: AsyncSession, role_name: str, parent_name: str) -> Role:
+    """Dodaje rolę nadrzędną - rola dziedziczy jej uprawnienia."""
+    role = await get_role_by_name(db, role_name)
+    parent_role = await get_role_by_name(db, parent_name)
+    if not role or not parent_role:
+        raise HTTPException(status_code=404, detail="Role not found")
     
-    # Dodaj uprawnienia z ról nadrzędnych
-    for parent_role in role.parent_roles:
-        parent_permissions = await get_role_permissions(db, parent_role.name)
-        permissions.update(parent_permissions)
+    if parent_role not in role.parent_roles:
+        role.parent_roles.append(parent_role)
+        await _commit_role_change(db, role)
+        await db.refresh(role)
     
-    return permissions
+    return role
 
-async def check_permission(db: AsyncSession, user: User, resource: str, action: str) -> bool:
-    if user.is_superuser:
-        return True
-    
-    required_permission = f"{resource}:{action}"
+async def remove_parent_role(db: AsyncSession, role_name: str, parent_name: str) -> Role:
+    """Usuwa rolę nadrzędną z hierarchii."""
+    role = await get_role_by_name(db, role_name)
+    parent_role = await get_role_by_name(db, parent_name)
+    if not role or not parent_role:
+        raise HTTPException(status_code=404, detail="Role not found")
     
-    for role in user.roles:
-        role_permissions = await get_role_permissions(db, role.name)
-        if required_permission in role_permissions:
-            return True
+    if parent_role in role.parent_roles:
+        role.parent_roles.remove(parent_role)
+        await _commit_role_change(db, role)
+        await db.refresh(role)
     
-    return False
+    return role
 
 async def assign_role_to_user(db: AsyncSession, user_id: int, role_name: str):
-    user = await db.get(User, user_id)
+    # Role ładowane od razu - leniwe ładowanie relacji w AsyncSession kończy się błędem
+    user = await get_user_by_id(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -125,12 +346,14 @@ async def assign_role_to_user(db: AsyncSession, user_id: int, role_name: str):
     
     if role not in user.roles:
         user.roles.append(role)
-        await db.commit()
+        # Nowa wersja claimów - tokeny z nieaktualnymi rolami nie są autoryzowane z claimów
+        await token_service.bump_claims_version(db, user)
     
     return user
 
 async def remove_role_from_user(db: AsyncSession, user_id: int, role_name: str):
-    user = await db.get(User, user_id)
+    # Role ładowane od razu - leniwe ładowanie relacji w AsyncSession kończy się błędem
+    user = await get_user_by_id(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -140,6 +363,7 @@ async def remove_role_from_user(db: AsyncSession, user_id: int, role_name: str):
     
     if role in user.roles:
         user.roles.remove(role)
-        await db.commit()
+        # Nowa wersja claimów - tokeny z nieaktualnymi rolami nie są autoryzowane z claimów
+        await token_service.bump_claims_version(db, user)
     
     return user 
\ No newline at end of file
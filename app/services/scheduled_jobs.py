@@ -0,0 +1,84 @@
+from app.core.config import settings
+from app.core.rate_limiter import sweep_rate_limiters
+from app.core.scheduler import JobScheduler
+from app.db.database import async_session, engine
+from app.monitoring.db_metrics import update_db_metrics
+from app.monitoring.token_metrics import update_token_metrics
+from app.services.cleanup_service import cleanup_service
+from app.services.partition_service import partition_manager
+from app.services.role_service import rebuild_role_closure
+from app.services.token_service import token_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+async def refresh_token_metrics() -> None:
+    """Odświeża metryki tokenów w osobnej sesji bazy danych."""
+    async with async_session() as db:
+        await update_token_metrics(db)
+
+async def refresh_db_metrics() -> None:
+    """Odświeża metryki puli połączeń bieżącego workera."""
+    await update_db_metrics(engine)
+
+async def sweep_idle_rate_limit_keys() -> None:
+    """Usuwa bezczynne klucze limitów w pamięci bieżącego workera."""
+    evicted = sweep_rate_limiters()
+    if evicted:
+        logger.info(f"Usunięto {evicted} bezczynnych kluczy limitów")
+
+async def rebuild_role_permission_closure() -> None:
+    """Odbudowuje tabelę domknięcia uprawnień ról - zabezpieczenie przed rozjazdem utrzymania przyrostowego."""
+    async with async_session() as db:
+        rows = await rebuild_role_closure(db)
+    logger.info(f"Odbudowano domknięcie uprawnień ról: {rows} wierszy")
+
+def register_jobs(job_scheduler: JobScheduler) -> None:
+    """Rejestruje zadania okresowe aplikacji."""
+    jitter = settings.SCHEDULER_JOB_JITTER
+    # Zadania na współdzielonej bazie - tylko lider
+    job_scheduler.add_job(
+        "token_cleanup",
+        cleanup_service.cleanup_expired_tokens,
+        interval=settings.TOKEN_CLEANUP_INTERVAL,
+        jitter=jitter
+    )
+    job_scheduler.add_job(
+        "revoked_token_partitions",
+        partition_manager.run_maintenance,
+        cron=settings.REVOKED_TOKENS_PARTITION_MAINTENANCE_CRON,
+        jitter=jitter
+    )
+    job_scheduler.add_job(
+        "role_permission_closure",
+        rebuild_role_permission_closure,
+        cron=settings.ROLE_PERMISSION_CLOSURE_REBUILD_CRON,
+        jitter=jitter
+    )
+    job_scheduler.add_job(
+        "token_metrics",
+        refresh_token_metrics,
+        interval=settings.TOKEN_METRICS_INTERVAL,
+        jitter=jitter
+    )
+    # Stan w pamięci procesu - każdy worker
+    job_scheduler.add_job(
+        "db_metrics",
+        refresh_db_metrics,
+        interval=settings.DB_METRICS_INTERVAL,
+        leader_only=False
+    )
+    job_scheduler.add_job(
+        "rate_limit_sweep",
+        sweep_idle_rate_limit_keys,
+        interval=settings.RATE_LIMIT_SWEEP_INTERVAL,
+        jitter=jitter,
+        leader_only=False
+    )
+    job_scheduler.add_job(
+        "token_cache_cleanup",
+        token_service.cleanup_expired_tokens,
+        interval=settings.TOKEN_CLEANUP_INTERVAL,
+        jitter=jitter,
+        leader_only=False
+    )
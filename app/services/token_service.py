@@ -1,24 +1,222 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from sqlalchemy import select, and_, func
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.user import User
 from app.models.token import RevokedToken, TokenData
-from app.core.cache import redis_cache
+from app.core.cache import redis_cache, LocalCache
+from app.core.bloom_filter import BloomFilter
+from app.core.config import settings
+from app.db.database import async_session
 from app.monitoring.db_metrics import monitor_db_operation
-from app.monitoring.token_metrics import TOKEN_OPERATIONS, TOKEN_VALIDATION_TIME
+from app.monitoring.token_metrics import (
+    TOKEN_OPERATIONS,
+    TOKEN_VALIDATION_TIME,
+    TOKEN_LOCAL_CACHE_ENTRIES,
+    TOKEN_REVOCATION_FILTER_ENTRIES,
+    TOKEN_REVOCATION_FILTER_SIZE,
+    TOKEN_REVOCATION_FILTER_FP_RATE,
+    TOKEN_REVOCATION_FILTER_REBUILD_TIME
+)
 import uuid
 import logging
 import asyncio
-from typing import Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
 logger = logging.getLogger(__name__)
 
 CACHE_TTL = 3600  # 1 godzina
 BATCH_SIZE = 1000  # Rozmiar partii dla operacji wsadowych
+REVOCATION_RETRY_DELAY = 1.0  # Opóźnienie ponownej subskrypcji (sekundy)
+EPOCH_MESSAGE_PREFIX = "epoch:"  # Prefiks wiadomości o zmianie epoki tokenów użytkownika
+CLAIMS_MESSAGE_PREFIX = "claims:"  # Prefiks wiadomości o zmianie wersji claimów użytkownika
+
+def _remaining_lifetime(token_data: TokenData) -> Optional[float]:
+    """Zwraca pozostały czas życia tokenu w sekundach."""
+    if token_data.exp is None:
+        return None
+    now = datetime.now(timezone.utc) if token_data.exp.tzinfo else datetime.utcnow()
+    return (token_data.exp - now).total_seconds()
 
 class TokenService:
     def __init__(self):
         self._cache = redis_cache
         self._cleanup_lock = asyncio.Lock()
+        # L1: jti -> ważność, przed Redis; unieważniany przez pub/sub
+        self._local = LocalCache(
+            maxsize=settings.TOKEN_LOCAL_CACHE_SIZE,
+            default_ttl=settings.TOKEN_LOCAL_CACHE_TTL
+        )
+        # Numer unieważnienia L1 - wynik odczytu rozpoczętego przed unieważnieniem nie trafia do L1
+        self._local_generation = 0
+        self._listener_task: Optional[asyncio.Task] = None
+        self._listener_active = False
+        # Filtr unieważnionych jti; ujemna odpowiedź oznacza ważny token bez I/O
+        self._revocation_filter: Optional[BloomFilter] = None
+        self._filter_pending: Optional[List[str]] = None
+        self._filter_rebuild = asyncio.Event()
+        self._filter_task: Optional[asyncio.Task] = None
+        TOKEN_LOCAL_CACHE_ENTRIES.set_function(lambda: len(self._local))
+        TOKEN_REVOCATION_FILTER_ENTRIES.set_function(
+            lambda: len(self._revocation_filter) if self._revocation_filter else 0
+        )
+        TOKEN_REVOCATION_FILTER_SIZE.set_function(
+            lambda: self._revocation_filter.size_bytes if self._revocation_filter else 0
+        )
+        TOKEN_REVOCATION_FILTER_FP_RATE.set_function(
+            lambda: self._revocation_filter.false_positive_rate if self._revocation_filter else 0
+        )
+    
+    @staticmethod
+    def _cache_key(jti: str) -> str:
+        """Zwraca klucz cache dla identyfikatora tokenu."""
+        return f"token_valid:{jti}"
+    
+    @staticmethod
+    def _epoch_key(user_id) -> str:
+        """Zwraca klucz cache epoki tokenów użytkownika."""
+        return f"token_epoch:{user_id}"
+    
+    @staticmethod
+    def _claims_version_key(user_id) -> str:
+        """Zwraca klucz cache wersji claimów (ról) użytkownika."""
+        return f"claims_version:{user_id}"
+    
+    def _evict_local(self, key: str) -> None:
+        """Usuwa wpis z L1 i unieważnia trwające odczyty, które mogłyby go przywrócić."""
+        self._local_generation += 1
+        self._local.delete(key)
+    
+    def _fill_local(self, generation: int, key: str, value, ttl: Optional[float] = None) -> None:
+        """Zapisuje wynik odczytu w L1, chyba że w trakcie odczytu przyszło unieważnienie."""
+        if generation == self._local_generation:
+            self._local.set(key, value, ttl=ttl)
+    
+    async def _get_user_counter(self, db: AsyncSession, user_id: int, key: str, column) -> int:
+        """Zwraca licznik użytkownika (epokę lub wersję claimów) z L1, Redis albo bazy."""
+        if self._listener_active:
+            local_value = self._local.get(key)
+            if local_value is not None:
+                return local_value
+        
+        generation = self._local_generation
+        cached_value = await self._cache.get(key)
+        if cached_value is not None:
+            value = int(cached_value)
+        else:
+            result = await db.execute(select(column).where(User.id == user_id))
+            value = result.scalar_one_or_none() or 0
+            # Tylko wzrost - odczyt sprzed inkrementacji nie nadpisze nowszej wartości
+            stored = await self._cache.set_max(key, value, expires_in=CACHE_TTL)
+            if stored is not None:
+                value = max(value, stored)
+        self._fill_local(generation, key, value)
+        return value
+    
+    async def get_token_epoch(self, db: AsyncSession, user_id: int) -> int:
+        """Zwraca aktualną epokę tokenów użytkownika (L1, Redis, baza)."""
+        return await self._get_user_counter(db, user_id, self._epoch_key(user_id), User.token_epoch)
+    
+    async def get_claims_version(self, db: AsyncSession, user_id: int) -> int:
+        """Zwraca aktualną wersję claimów (ról) użytkownika (L1, Redis, baza)."""
+        return await self._get_user_counter(db, user_id, self._claims_version_key(user_id), User.claims_version)
+    
+    async def get_token_epochs(self, db: AsyncSession, user_ids: Iterable[int]) -> Dict[int, int]:
+        """Zwraca epoki wielu użytkowników: L1, jeden MGET i jedno zapytanie IN dla chybień."""
+        epochs: Dict[int, int] = {}
+        pending = []
+        for user_id in set(user_ids):
+            local_epoch = self._local.get(self._epoch_key(user_id)) if self._listener_active else None
+            if local_epoch is not None:
+                epochs[user_id] = local_epoch
+            else:
+                pending.append(user_id)
+        if not pending:
+            return epochs
+        
+        generation = self._local_generation
+        cached = await self._cache.get_many([self._epoch_key(user_id) for user_id in pending])
+        misses = []
+        for user_id, cached_epoch in zip(pending, cached):
+            if cached_epoch is None:
+                misses.append(user_id)
+            else:
+                epochs[user_id] = int(cached_epoch)
+        
+        if misses:
+            result = await db.execute(
+                select(User.id, User.token_epoch).where(User.id.in_(misses))
+            )
+            loaded = {user_id: epoch or 0 for user_id, epoch in result.all()}
+            stored = await self._cache.set_max_many([
+                (self._epoch_key(user_id), loaded.get(user_id, 0), CACHE_TTL) for user_id in misses
+            ])
+            for user_id, stored_epoch in zip(misses, stored):
+                epochs[user_id] = max(loaded.get(user_id, 0), stored_epoch or 0)
+        
+        for user_id in pending:
+            self._fill_local(generation, self._epoch_key(user_id), epochs[user_id])
+        return epochs
+    
+    async def _bump_user_counter(self, db: AsyncSession, user: User, attribute: str, key: str, message: str) -> int:
+        """Inkrementuje licznik użytkownika w bazie, zatwierdza sesję i powiadamia pozostałe workery."""
+        # Inkrementacja po stronie bazy - odporna na równoległe zmiany
+        setattr(user, attribute, getattr(User, attribute) + 1)
+        await db.commit()
+        await db.refresh(user, attribute_names=[attribute])
+        value = getattr(user, attribute)
+        
+        self._evict_local(key)
+        await self._cache.set_max(key, value, expires_in=CACHE_TTL)
+        await self._cache.publish(settings.TOKEN_REVOCATION_CHANNEL, message)
+        return value
+    
+    async def bump_token_epoch(self, db: AsyncSession, user: User) -> int:
+        """Unieważnia wszystkie tokeny użytkownika jedną inkrementacją epoki i zatwierdza sesję."""
+        epoch = await self._bump_user_counter(
+            db, user, "token_epoch", self._epoch_key(user.id), f"{EPOCH_MESSAGE_PREFIX}{user.id}"
+        )
+        TOKEN_OPERATIONS.labels(operation="epoch_bump", status="success").inc()
+        return epoch
+    
+    async def bump_claims_version(self, db: AsyncSession, user: User) -> int:
+        """Oznacza claimy ról w wydanych tokenach jako nieaktualne (bez wylogowania) i zatwierdza sesję."""
+        version = await self._bump_user_counter(
+            db, user, "claims_version", self._claims_version_key(user.id), f"{CLAIMS_MESSAGE_PREFIX}{user.id}"
+        )
+        TOKEN_OPERATIONS.labels(operation="claims_version_bump", status="success").inc()
+        return version
+    
+    def _note_revoked(self, jti: str) -> None:
+        """Dodaje jti do filtra unieważnień (również do trwającej przebudowy)."""
+        if self._revocation_filter is not None:
+            self._revocation_filter.add(jti)
+        if self._filter_pending is not None:
+            self._filter_pending.append(jti)
+    
+    async def rebuild_revocation_filter(self, db: AsyncSession) -> None:
+        """Buduje filtr z nieprzeterminowanych wpisów revoked_tokens."""
+        with TOKEN_REVOCATION_FILTER_REBUILD_TIME.time():
+            # Unieważnienia otrzymane w trakcie zapytania trafią do nowego filtra
+            pending = self._filter_pending = []
+            try:
+                result = await db.execute(
+                    select(RevokedToken.jti).where(RevokedToken.expires_at > datetime.utcnow())
+                )
+                jtis = result.scalars().all()
+                revocation_filter = BloomFilter(
+                    capacity=max(settings.TOKEN_REVOCATION_FILTER_CAPACITY, 2 * len(jtis)),
+                    error_rate=settings.TOKEN_REVOCATION_FILTER_ERROR_RATE
+                )
+                for jti in jtis:
+                    revocation_filter.add(jti)
+                for jti in pending:
+                    revocation_filter.add(jti)
+                # Zerwana w międzyczasie subskrypcja unieważnia wynik przebudowy
+                if self._filter_pending is pending:
+                    self._revocation_filter = revocation_filter
+            finally:
+                self._filter_pending = None
+        logger.info(f"Przebudowano filtr unieważnionych tokenów: {len(jtis)} wpisów")
     
     @monitor_db_operation("revoke_token")
     async def revoke_token(self, db: AsyncSession, token_data: TokenData) -> Tuple[bool, Optional[str]]:
@@ -26,14 +224,22 @@ class TokenService:
         try:
             revoked_token = RevokedToken(
                 jti=token_data.jti,
-                expires_at=datetime.utcnow() + timedelta(seconds=token_data.exp)
+                expires_at=token_data.exp or (
+                    datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+                )
             )
             db.add(revoked_token)
             await db.commit()
+            self._note_revoked(token_data.jti)
             
             # Aktualizuj cache
-            cache_key = f"token_valid:{token_data.jti}"
+            cache_key = self._cache_key(token_data.jti)
+            # Trwające odczyty "ważny" w tym workerze nie nadpiszą unieważnienia
+            self._evict_local(cache_key)
+            self._local.set(cache_key, False, ttl=_remaining_lifetime(token_data))
             await self._cache.set(cache_key, 0, expires_in=CACHE_TTL)
+            # Pozostałe workery usuwają wpis z L1 natychmiast
+            await self._cache.publish(settings.TOKEN_REVOCATION_CHANNEL, token_data.jti)
             
             TOKEN_OPERATIONS.labels(operation="revocation", status="success").inc()
             return True, None
@@ -47,17 +253,48 @@ class TokenService:
         """Waliduje token z cache i bazą danych."""
         with TOKEN_VALIDATION_TIME.labels(token_type="access").time():
             try:
-                # Sprawdź cache
-                cache_key = f"token_valid:{token_data.jti}"
+                # Epoka - tokeny sprzed ostatniego "wyloguj wszędzie" są nieważne
+                if token_data.user_id is not None:
+                    current_epoch = await self.get_token_epoch(db, token_data.user_id)
+                    if (token_data.epoch or 0) < current_epoch:
+                        TOKEN_OPERATIONS.labels(operation="epoch_revoked", status="success").inc()
+                        return False, None
+                
+                if token_data.jti is None:
+                    # Bez jti tokenu nie da się unieważnić pojedynczo
+                    return True, None
+                
+                cache_key = self._cache_key(token_data.jti)
+                
+                # Filtr i L1 - tylko gdy subskrypcja unieważnień działa, inaczej mogłyby być nieaktualne
+                if self._listener_active:
+                    revocation_filter = self._revocation_filter
+                    if revocation_filter is not None and token_data.jti not in revocation_filter:
+                        TOKEN_OPERATIONS.labels(operation="filter_negative", status="success").inc()
+                        return True, None
+                    
+                    local_result = self._local.get(cache_key)
+                    if local_result is not None:
+                        TOKEN_OPERATIONS.labels(operation="local_cache_hit", status="success").inc()
+                        return local_result, None
+                
+                # L2 - Redis
+                ttl = _remaining_lifetime(token_data)
+                local_ttl = settings.TOKEN_LOCAL_CACHE_TTL if ttl is None else min(ttl, settings.TOKEN_LOCAL_CACHE_TTL)
+                generation = self._local_generation
                 cached_result = await self._cache.get(cache_key)
                 
                 if cached_result is not None:
                     TOKEN_OPERATIONS.labels(operation="cache_hit", status="success").inc()
-                    return bool(int(cached_result)), None
+                    is_valid = bool(int(cached_result))
+                    self._fill_local(generation, cache_key, is_valid, ttl=local_ttl)
+                    return is_valid, None
                 
                 # Sprawdź w bazie
                 is_valid = not await self._is_token_revoked(db, token_data)
-                await self._cache.set(cache_key, int(is_valid), expire=CACHE_TTL)
+                redis_ttl = CACHE_TTL if ttl is None else max(1, min(int(ttl), CACHE_TTL))
+                await self._cache.set(cache_key, int(is_valid), expires_in=redis_ttl)
+                self._fill_local(generation, cache_key, is_valid, ttl=local_ttl)
                 
                 TOKEN_OPERATIONS.labels(operation="validation", status="success").inc()
                 return is_valid, None
@@ -67,6 +304,73 @@ class TokenService:
                 logger.error(f"Błąd walidacji tokenu: {str(e)}")
                 return False, str(e)
 
+    async def validate_tokens(self, db: AsyncSession, tokens: List[TokenData]) -> List[bool]:
+        """Waliduje wiele tokenów naraz: jeden MGET i jedno zapytanie IN dla chybień cache."""
+        with TOKEN_VALIDATION_TIME.labels(token_type="batch").time():
+            results = [True] * len(tokens)
+            
+            epochs = await self.get_token_epochs(
+                db, [token.user_id for token in tokens if token.user_id is not None]
+            )
+            for index, token in enumerate(tokens):
+                if token.user_id is not None and (token.epoch or 0) < epochs[token.user_id]:
+                    results[index] = False
+            
+            # jti -> pozycje tokenów, których nie rozstrzygnął filtr ani L1
+            pending: Dict[str, List[int]] = {}
+            revocation_filter = self._revocation_filter if self._listener_active else None
+            for index, token in enumerate(tokens):
+                if not results[index] or token.jti is None:
+                    continue
+                if self._listener_active:
+                    if revocation_filter is not None and token.jti not in revocation_filter:
+                        continue
+                    local_result = self._local.get(self._cache_key(token.jti))
+                    if local_result is not None:
+                        results[index] = local_result
+                        continue
+                pending.setdefault(token.jti, []).append(index)
+            
+            if pending:
+                jtis = list(pending)
+                generation = self._local_generation
+                cached = await self._cache.get_many([self._cache_key(jti) for jti in jtis])
+                resolved: Dict[str, bool] = {}
+                misses = []
+                for jti, cached_result in zip(jtis, cached):
+                    if cached_result is None:
+                        misses.append(jti)
+                    else:
+                        resolved[jti] = bool(int(cached_result))
+                
+                if misses:
+                    revoked = await self._revoked_jtis(db, misses)
+                    for jti in misses:
+                        resolved[jti] = jti not in revoked
+                    await self._cache.set_many([
+                        (self._cache_key(jti), int(resolved[jti]), CACHE_TTL) for jti in misses
+                    ])
+                
+                for jti, is_valid in resolved.items():
+                    self._fill_local(generation, self._cache_key(jti), is_valid)
+                    for index in pending[jti]:
+                        results[index] = is_valid
+            
+            TOKEN_OPERATIONS.labels(operation="batch_validation", status="success").inc()
+            return results
+
+    async def _revoked_jtis(self, db: AsyncSession, jtis: List[str]) -> Set[str]:
+        """Zwraca podzbiór jti, które są unieważnione (jedno zapytanie IN)."""
+        result = await db.execute(
+            select(RevokedToken.jti).where(
+                and_(
+                    RevokedToken.jti.in_(jtis),
+                    RevokedToken.expires_at > datetime.utcnow()
+                )
+            )
+        )
+        return set(result.scalars().all())
+
     async def _is_token_revoked(self, db: AsyncSession, token_data: TokenData) -> bool:
         """Sprawdza czy token jest unieważniony."""
         result = await db.execute(
@@ -79,15 +383,94 @@ class TokenService:
         )
         return result.scalar_one_or_none() is not None
 
+    async def start_revocation_listener(self) -> None:
+        """Uruchamia subskrypcję unieważnień tokenów (wywoływane w lifespan)."""
+        if self._listener_task is None or self._listener_task.done():
+            self._listener_task = asyncio.create_task(self._listen_for_revocations())
+        if self._filter_task is None or self._filter_task.done():
+            self._filter_task = asyncio.create_task(self._maintain_revocation_filter())
+
+    async def stop_revocation_listener(self) -> None:
+        """Zatrzymuje subskrypcję unieważnień tokenów."""
+        for task in (self._listener_task, self._filter_task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._listener_task = None
+        self._filter_task = None
+
+    async def _listen_for_revocations(self) -> None:
+        """Usuwa z L1 tokeny unieważnione przez dowolny worker."""
+        while True:
+            pubsub = self._cache.client.pubsub()
+            try:
+                await pubsub.subscribe(settings.TOKEN_REVOCATION_CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] == "subscribe":
+                        self._listener_active = True
+                        # Subskrypcja działa przed zapytaniem - żadne unieważnienie nie umknie
+                        self._filter_rebuild.set()
+                    elif message["type"] == "message":
+                        data = message["data"]
+                        if data.startswith(EPOCH_MESSAGE_PREFIX):
+                            self._evict_local(self._epoch_key(data[len(EPOCH_MESSAGE_PREFIX):]))
+                        elif data.startswith(CLAIMS_MESSAGE_PREFIX):
+                            self._evict_local(self._claims_version_key(data[len(CLAIMS_MESSAGE_PREFIX):]))
+                        else:
+                            self._evict_local(self._cache_key(data))
+                            self._note_revoked(data)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Błąd subskrypcji unieważnień tokenów: {str(e)}")
+            finally:
+                # Bez subskrypcji mogliśmy przegapić unieważnienia - L1 jest niewiarygodny
+                self._listener_active = False
+                self._local_generation += 1
+                self._local.clear()
+                self._revocation_filter = None
+                self._filter_pending = None
+                await pubsub.aclose()
+            await asyncio.sleep(REVOCATION_RETRY_DELAY)
+
+    async def _maintain_revocation_filter(self) -> None:
+        """Przebudowuje filtr po (ponownej) subskrypcji i okresowo, usuwając wygasłe jti."""
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._filter_rebuild.wait(),
+                    timeout=settings.TOKEN_REVOCATION_FILTER_REBUILD_INTERVAL
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._filter_rebuild.clear()
+            if not self._listener_active:
+                continue
+            try:
+                async with async_session() as db:
+                    await self.rebuild_revocation_filter(db)
+            except Exception as e:
+                logger.error(f"Błąd przebudowy filtra unieważnionych tokenów: {str(e)}")
+                await asyncio.sleep(REVOCATION_RETRY_DELAY)
+                self._filter_rebuild.set()
+
     async def cleanup_expired_tokens(self):
         """Czyści wygasłe tokeny z wykorzystaniem blokady."""
-        if not await self._cleanup_lock.acquire(blocking=False):
+        if self._cleanup_lock.locked():
             logger.info("Czyszczenie tokenów już trwa")
             return
 
-        try:
+        async with self._cleanup_lock:
             await self._perform_cleanup()
-        finally:
-            self._cleanup_lock.release()
+
+    async def _perform_cleanup(self) -> None:
+        """Usuwa wygasłe wpisy z L1 i zleca przebudowę filtra bez wygasłych jti."""
+        purged = self._local.purge_expired()
+        if self._listener_active:
+            self._filter_rebuild.set()
+        logger.info(f"Usunięto {purged} wygasłych wpisów z lokalnego cache tokenów")
 
 token_service = TokenService() 
\ No newline at end of file
@@ -4,6 +4,7 @@ from app.models.user import User
 from fastapi import HTTPException, status
 import re
 from sqlalchemy.orm import selectinload
+from app.services.hashing_service import hashing_service
 
 async def get_user_by_email(db: AsyncSession, email: str):
     stmt = (
@@ -19,7 +20,11 @@ async def get_user_by_username(db: AsyncSession, username: str):
     return result.scalar_one_or_none()
 
 async def get_user_by_id(db: AsyncSession, user_id: int):
-    result = await db.execute(select(User).where(User.id == user_id))
+    result = await db.execute(
+        select(User)
+        .where(User.id == user_id)
+        .options(selectinload(User.roles))
+    )
     return result.scalar_one_or_none()
 
 def validate_email(email: str) -> bool:
@@ -49,13 +54,23 @@ async def create_user(db: AsyncSession, email: str, username: str, password: str
             detail="Nazwa użytkownika jest już zajęta"
         )
     
-    return await User.create(db, email, username, password, full_name)
+    # Hashowanie w puli procesów, aby bcrypt nie blokował pętli zdarzeń
+    user = User(
+        email=email,
+        username=username,
+        full_name=full_name,
+        hashed_password=await hashing_service.hash(password)
+    )
+    db.add(user)
+    await db.commit()
+    await db.refresh(user)
+    return user
 
 async def authenticate_user(db: AsyncSession, email: str, password: str):
     """Uwierzytelnia użytkownika."""
     user = await get_user_by_email(db, email)
     if not user:
         return None
-    if not user.verify_password(password):
+    if not await hashing_service.verify(password, user.hashed_password):
         return None
     return user 
\ No newline at end of file
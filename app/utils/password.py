@@ -1,4 +1,6 @@
 from passlib.context import CryptContext
+from typing import Any, Callable, Tuple
+import time
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -8,4 +10,11 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 def get_password_hash(password: str) -> str:
     """Generuje hash hasła."""
-    return pwd_context.hash(password) 
\ No newline at end of file
+    return pwd_context.hash(password)
+
+def timed_call(func: Callable[..., Any], *args) -> Tuple[Any, float, float]:
+    """Wykonuje funkcję w procesie roboczym i zwraca (wynik, czas startu, czas trwania)."""
+    started_at = time.time()
+    start = time.perf_counter()
+    result = func(*args)
+    return result, started_at, time.perf_counter() - start
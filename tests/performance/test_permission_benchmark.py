@@ -0,0 +1,84 @@
+import timeit
+from types import SimpleNamespace
+from typing import List
+from app.core.permissions import PermissionManager
+
+CALLS = 100000
+
+CASES = [
+    ("admin", "content:delete"),
+    ("moderator", "users:delete"),
+    ("user", "content:create"),
+    ("user", "roles:manage"),
+]
+
+class CountingDict(dict):
+    """Słownik zliczający odczyty - liczba operacji zamiast pomiaru czasu."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reads = 0
+
+    def __getitem__(self, key):
+        self.reads += 1
+        return super().__getitem__(key)
+
+    def __contains__(self, key):
+        self.reads += 1
+        return super().__contains__(key)
+
+    def get(self, key, default=None):
+        self.reads += 1
+        return super().get(key, default)
+
+class RecursivePermissionManager(PermissionManager):
+    """Poprzednia implementacja: rekurencyjne przejście hierarchii przy każdym sprawdzeniu."""
+
+    def _collect(self, role_name: str) -> List[str]:
+        if not self.role_exists(role_name):
+            return []
+        permissions = set(self._roles[role_name]["permissions"])
+        for inherited_role in self._role_hierarchy.get(role_name, []):
+            permissions.update(self._collect(inherited_role))
+        return list(permissions)
+
+    def has_permission(self, role_name: str, permission: str) -> bool:
+        return permission in self._collect(role_name)
+
+def hierarchy_reads(manager: PermissionManager) -> int:
+    """Zlicza odczyty definicji ról i hierarchii podczas sprawdzeń uprawnień."""
+    manager._roles = CountingDict(manager._roles)
+    manager._role_hierarchy = CountingDict(manager._role_hierarchy)
+    for role, permission in CASES:
+        manager.has_permission(role, permission)
+    return manager._roles.reads + manager._role_hierarchy.reads
+
+def test_bitset_closure_skips_hierarchy_walk():
+    """Test operacji: maska bitowa domknięcia nie przechodzi hierarchii przy sprawdzeniu."""
+    assert hierarchy_reads(RecursivePermissionManager()) > len(CASES)
+    assert hierarchy_reads(PermissionManager()) == 0
+
+def checks_per_second(manager: PermissionManager) -> float:
+    """Mierzy liczbę wywołań check_permission na sekundę (mieszanka trafień i odmów)."""
+    users = {
+        role: SimpleNamespace(role=role, is_active=True, is_superuser=False)
+        for role, _ in CASES
+    }
+    cases = [(users[role], *permission.split(":")[::-1]) for role, permission in CASES]
+    calls = iter(cases * (CALLS // len(cases) + 1))
+
+    def check():
+        user, action, resource = next(calls)
+        return manager.check_permission(user, action, resource)
+
+    return CALLS / timeit.timeit(check, number=CALLS)
+
+def test_bitset_closure_check_throughput(record_property):
+    """Benchmark: sprawdzenia/s check_permission - maska bitowa kontra rekurencyjne przejście hierarchii."""
+    recursive = checks_per_second(RecursivePermissionManager())
+    bitset = checks_per_second(PermissionManager())
+    record_property("recursive_checks_per_second", round(recursive))
+    record_property("bitset_checks_per_second", round(bitset))
+
+    # Luźny próg - pomiar czasu zależy od obciążenia maszyny
+    assert bitset > recursive * 1.5
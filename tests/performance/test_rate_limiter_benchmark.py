@@ -0,0 +1,50 @@
+import gc
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Dict, Tuple
+from app.core.rate_limiter import RateLimiter
+
+# Profil obciążenia: klucze (adresy IP) i limit na okno
+KEYS = 1000
+MAX_REQUESTS = 300
+
+class ListRateLimiter:
+    """Poprzednia implementacja: lista znaczników datetime na klucz."""
+
+    def __init__(self, max_requests: int = 10, window_seconds: int = 60):
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self._requests: Dict[str, list] = {}
+
+    def is_allowed(self, key: str) -> Tuple[bool, int]:
+        now = datetime.utcnow()
+        window_start = now - timedelta(seconds=self.window_seconds)
+        if key not in self._requests:
+            self._requests[key] = []
+        self._requests[key] = [ts for ts in self._requests[key] if ts > window_start]
+        if len(self._requests[key]) >= self.max_requests:
+            return False, self.window_seconds
+        self._requests[key].append(now)
+        return True, 0
+
+def bytes_per_key(limiter, requests_per_key: int) -> float:
+    """Mierzy pamięć stanu limitera na klucz po requests_per_key żądaniach z każdego klucza."""
+    keys = [f"10.0.{index // 256}.{index % 256}" for index in range(KEYS)]
+    gc.collect()
+    tracemalloc.start()
+    for key in keys:
+        for _ in range(requests_per_key):
+            limiter.is_allowed(key)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return memory / KEYS
+
+def test_sliding_window_counter_memory_is_constant_per_key():
+    """Test pamięci: licznik okna ma stały rekord na klucz, lista rośnie z liczbą żądań."""
+    legacy = bytes_per_key(ListRateLimiter(max_requests=MAX_REQUESTS, window_seconds=60), MAX_REQUESTS)
+    counter_single = bytes_per_key(RateLimiter(max_requests=MAX_REQUESTS, window_seconds=60), 1)
+    counter_full = bytes_per_key(RateLimiter(max_requests=MAX_REQUESTS, window_seconds=60), MAX_REQUESTS)
+
+    # Rekord stałego rozmiaru zamiast MAX_REQUESTS obiektów datetime (różnica to najwyżej obiekt int licznika)
+    assert counter_full - counter_single < 64
+    assert counter_full * 10 < legacy
@@ -0,0 +1,87 @@
+import pytest
+import random
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock
+from jose import jwt
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.config import settings
+from app.services.auth_service import AuthService
+from app.services.token_service import TokenService
+from app.models.token import RevokedToken
+
+# Profil ruchu: wylogowania na minutę i okres, z którego pochodzą unieważnienia
+LOGOUTS_PER_MINUTE = 20
+HISTORY_MINUTES = 45
+
+async def revocation_footprint(access_token_minutes: int, seed: int = 42) -> dict:
+    """Unieważnia tokeny ze stałym tempem wylogowań i mierzy zbiór roboczy po czyszczeniu i przebudowie filtra."""
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        # SQLite nie obsługuje autoinkrementacji w złożonym kluczu głównym partycji -
+        # tabela o tych samych kolumnach z kluczem rowid
+        await conn.execute(text(
+            "CREATE TABLE revoked_tokens ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "jti VARCHAR(36) NOT NULL, "
+            "revoked_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL, "
+            "expires_at DATETIME NOT NULL, "
+            "UNIQUE (jti, expires_at))"
+        ))
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    auth_service = AuthService()
+    service = TokenService()
+    service._cache = AsyncMock()
+    service._listener_active = True
+    rng = random.Random(seed)
+
+    async with session_factory() as db:
+        for minute in range(HISTORY_MINUTES):
+            for index in range(LOGOUTS_PER_MINUTE):
+                # Wylogowanie sprzed revoked_ago minut w losowym momencie życia tokenu
+                revoked_ago = minute + index / LOGOUTS_PER_MINUTE
+                remaining = rng.uniform(0, access_token_minutes)
+                token = auth_service.create_access_token(
+                    {"sub": "user@example.com", "user_id": 1},
+                    expires_delta=timedelta(minutes=remaining - revoked_ago)
+                )
+                token_data = auth_service.token_data_from_claims(jwt.get_unverified_claims(token))
+                revoked, error = await service.revoke_token(db, token_data)
+                assert revoked, error
+
+        await service.cleanup_expired_tokens()
+        await service.rebuild_revocation_filter(db)
+        rows = await db.execute(
+            select(func.count()).select_from(RevokedToken.__table__)
+            .where(RevokedToken.expires_at > datetime.now(timezone.utc).replace(tzinfo=None))
+        )
+        footprint = {
+            "rows": rows.scalar(),
+            "filter_bytes": service._revocation_filter.size_bytes,
+            "l1_entries": len(service._local)
+        }
+    await engine.dispose()
+    return footprint
+
+@pytest.mark.asyncio
+async def test_short_access_tokens_shrink_revocation_working_set(monkeypatch, record_property):
+    """Benchmark: 5-minutowe tokeny dostępu zmniejszają wiersze revoked_tokens, filtr i L1 proporcjonalnie do czasu życia."""
+    # Filtr wymiarowany zbiorem roboczym zamiast stałej minimalnej pojemności
+    monkeypatch.setattr(settings, "TOKEN_REVOCATION_FILTER_CAPACITY", 1)
+    long_lived = await revocation_footprint(access_token_minutes=30)
+    short_lived = await revocation_footprint(access_token_minutes=5)
+    for name, value in long_lived.items():
+        record_property(f"30m_{name}", value)
+    for name, value in short_lived.items():
+        record_property(f"5m_{name}", value)
+
+    # Zbiór roboczy ~ tempo wylogowań x średni pozostały czas życia (T/2)
+    assert long_lived["rows"] == pytest.approx(LOGOUTS_PER_MINUTE * 30 / 2, rel=0.2)
+    assert short_lived["rows"] == pytest.approx(LOGOUTS_PER_MINUTE * 5 / 2, rel=0.2)
+    # L1 zawiera tylko nieprzeterminowane unieważnienia - tyle samo co żywe wiersze
+    assert long_lived["l1_entries"] == long_lived["rows"]
+    assert short_lived["l1_entries"] == short_lived["rows"]
+    for metric in ("rows", "filter_bytes", "l1_entries"):
+        assert long_lived[metric] / short_lived[metric] == pytest.approx(6, rel=0.25)
@@ -0,0 +1,74 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.core.concurrency_limiter import AdaptiveConcurrencyLimiter
+from app.middleware.performance import AdaptiveConcurrencyMiddleware
+
+def fill_window(limiter: AdaptiveConcurrencyLimiter, rtt: float, concurrency: int):
+    """Symuluje jedno okno pomiarowe przy zadanej współbieżności."""
+    for _ in range(limiter.window_size // concurrency):
+        for _ in range(concurrency):
+            assert limiter.try_acquire()
+        for _ in range(concurrency):
+            limiter.release(rtt)
+
+def test_limit_grows_when_latency_is_stable():
+    """Test addytywnego wzrostu limitu przy stabilnym opóźnieniu."""
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=10, window_size=10)
+    for _ in range(5):
+        fill_window(limiter, rtt=0.01, concurrency=10)
+    assert limiter.limit > 10
+
+def test_limit_shrinks_when_latency_grows():
+    """Test multiplikatywnego spadku limitu przy rosnącym opóźnieniu."""
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=20, window_size=10)
+    fill_window(limiter, rtt=0.01, concurrency=10)
+    before = limiter.limit
+    fill_window(limiter, rtt=0.1, concurrency=10)
+    assert limiter.limit < before
+    assert limiter.limit >= limiter.min_limit
+
+def test_limit_shrinks_on_dropped_request():
+    """Test zmniejszenia limitu po błędzie żądania."""
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=20)
+    assert limiter.try_acquire()
+    limiter.release(0.0, dropped=True)
+    assert limiter.limit == 18
+    assert limiter.in_flight == 0
+
+def test_low_priority_is_shed_first():
+    """Test odrzucania klas o niższym udziale w limicie w pierwszej kolejności."""
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=10, min_limit=1)
+    for _ in range(5):
+        assert limiter.try_acquire(share=1.0)
+    assert not limiter.try_acquire(share=0.5)
+    assert limiter.try_acquire(share=1.0)
+
+def test_route_classification():
+    """Test przypisywania żądań do klas tras."""
+    middleware = AdaptiveConcurrencyMiddleware(app=None)
+    assert middleware.classify("POST", "/api/users/token") == "critical"
+    assert middleware.classify("POST", "/api/tokens/introspect") == "critical"
+    assert middleware.classify("GET", "/api/admin/users") == "low"
+    assert middleware.classify("GET", "/api/users/me") == "default"
+
+def test_rejected_request_gets_retry_after():
+    """Test szybkiej odpowiedzi 503 z nagłówkiem Retry-After."""
+    app = FastAPI()
+
+    @app.get("/test")
+    async def test_endpoint():
+        return {"message": "test"}
+
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=1, min_limit=1)
+    app.add_middleware(AdaptiveConcurrencyMiddleware, limiter=limiter, retry_after=2)
+    client = TestClient(app)
+
+    assert client.get("/test").status_code == 200
+
+    # Zajmij jedyny slot, aby kolejne żądanie zostało odrzucone
+    assert limiter.try_acquire()
+    response = client.get("/test")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "2"
+    assert response.json()["error"]["code"] == 503
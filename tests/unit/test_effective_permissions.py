@@ -0,0 +1,182 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from typing import Dict, FrozenSet, List
+from sqlalchemy import event, insert
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from app.models.user import (
+    Permission,
+    Role,
+    role_effective_permissions,
+    role_hierarchy,
+    role_permissions
+)
+from app.services.role_service import (
+    rebuild_role_closure,
+    refresh_role_closure,
+    resolve_user_permissions,
+    role_closure_query
+)
+from app.services import role_service
+from app.services.role_service import RolePermissionCache, check_permission
+from app.models.principal import Principal
+
+DEPTH = 6
+
+@pytest.fixture
+async def rbac():
+    """Tworzy w SQLite łańcuch ról głębokości DEPTH (rola i dziedziczy po i+1) z cyklem na końcu."""
+    engine = create_async_engine("sqlite+aiosqlite://")
+    tables = [
+        Role.__table__, Permission.__table__, role_permissions, role_hierarchy,
+        role_effective_permissions
+    ]
+    async with engine.begin() as conn:
+        await conn.run_sync(lambda sync_conn: Role.metadata.create_all(sync_conn, tables=tables))
+        await conn.execute(insert(Role.__table__), [
+            {"id": level, "name": f"role{level}"} for level in range(1, DEPTH + 1)
+        ])
+        await conn.execute(insert(Permission.__table__), [
+            {"id": level, "name": f"p{level}", "resource": f"resource{level}", "action": "read"}
+            for level in range(1, DEPTH + 1)
+        ] + [{"id": 100, "name": "shared", "resource": "users", "action": "read"}])
+        await conn.execute(insert(role_permissions), [
+            {"role_id": level, "permission_id": level} for level in range(1, DEPTH + 1)
+        ] + [{"role_id": level, "permission_id": 100} for level in (1, DEPTH)])
+        await conn.execute(insert(role_hierarchy), [
+            {"child_role_id": level, "parent_role_id": level + 1} for level in range(1, DEPTH)
+        ] + [{"child_role_id": DEPTH, "parent_role_id": DEPTH - 1}])
+
+    statements = []
+    event.listen(
+        engine.sync_engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement)
+    )
+    yield sessionmaker(engine, class_=AsyncSession, expire_on_commit=False), statements
+    await engine.dispose()
+
+async def closure(db: AsyncSession, role_ids: List[int]) -> Dict[int, FrozenSet[str]]:
+    """Wykonuje zapytanie domknięcia i grupuje uprawnienia po roli."""
+    grouped: Dict[int, set] = {}
+    for role_id, permission in (await db.execute(role_closure_query(role_ids))).all():
+        grouped.setdefault(role_id, set()).add(permission)
+    return {role_id: frozenset(permissions) for role_id, permissions in grouped.items()}
+
+@pytest.mark.asyncio
+async def test_role_closure_resolved_in_one_query(rbac):
+    """Test rozwiązania uprawnień przez całą hierarchię jednym zapytaniem."""
+    session_factory, statements = rbac
+    async with session_factory() as db:
+        permissions = await closure(db, [1])
+
+    assert permissions == {1: {f"resource{level}:read" for level in range(1, DEPTH + 1)} | {"users:read"}}
+    assert len(statements) == 1
+    assert "WITH RECURSIVE" in statements[0]
+
+@pytest.mark.asyncio
+async def test_role_permissions_follow_hierarchy_upwards_only(rbac):
+    """Test dziedziczenia tylko po rolach nadrzędnych, także przy cyklu w hierarchii."""
+    session_factory, statements = rbac
+    async with session_factory() as db:
+        # Rola DEPTH-1 i DEPTH tworzą cykl - obie mają wzajemnie swoje uprawnienia
+        permissions = await closure(db, [DEPTH - 1])
+        assert permissions == {
+            DEPTH - 1: {f"resource{DEPTH - 1}:read", f"resource{DEPTH}:read", "users:read"}
+        }
+        permissions = await closure(db, [2, 3])
+        assert permissions[2] == {f"resource{level}:read" for level in range(2, DEPTH + 1)} | {"users:read"}
+        assert permissions[3] == permissions[2] - {"resource2:read"}
+        assert await closure(db, [999]) == {}
+    assert len(statements) == 3
+
+@pytest.mark.asyncio
+async def test_closure_table_matches_resolver_and_reads_by_key(rbac):
+    """Test odbudowy tabeli domknięcia i odczytu uprawnień roli jednym zapytaniem po kluczu."""
+    session_factory, statements = rbac
+    async with session_factory() as db:
+        await rebuild_role_closure(db)
+        for role_id in range(1, DEPTH + 1):
+            statements.clear()
+            permissions = await resolve_user_permissions(db, [role_id])
+            assert len(statements) == 1
+            assert "RECURSIVE" not in statements[0]
+            assert permissions == (await closure(db, [role_id]))[role_id]
+
+@pytest.mark.asyncio
+async def test_closure_refreshed_for_affected_roles_only(rbac):
+    """Test przyrostowego przeliczenia domknięcia roli i ról po niej dziedziczących."""
+    session_factory, statements = rbac
+    async with session_factory() as db:
+        await rebuild_role_closure(db)
+
+        # Nowe uprawnienie roli 3 - dziedziczą je role 1 i 2, role 4+ nie
+        await db.execute(insert(Permission.__table__), [
+            {"id": 200, "name": "export", "resource": "reports", "action": "export"}
+        ])
+        await db.execute(insert(role_permissions), [{"role_id": 3, "permission_id": 200}])
+        affected = await refresh_role_closure(db, 3)
+        await db.commit()
+
+        assert sorted(affected) == [1, 2, 3]
+        for role_id in range(1, DEPTH + 1):
+            has_export = "reports:export" in await resolve_user_permissions(db, [role_id])
+            assert has_export == (role_id <= 3)
+
+        # Odcięcie roli 2 od roli 3 - rola 1 i 2 tracą uprawnienia ról 3+
+        await db.execute(
+            role_hierarchy.delete().where(
+                role_hierarchy.c.child_role_id == 2, role_hierarchy.c.parent_role_id == 3
+            )
+        )
+        await refresh_role_closure(db, 2)
+        await db.commit()
+        assert await resolve_user_permissions(db, [1]) == {"resource1:read", "resource2:read", "users:read"}
+        assert await resolve_user_permissions(db, [3]) == (await closure(db, [3]))[3]
+
+@pytest.mark.asyncio
+async def test_user_permissions_resolved_in_one_statement(rbac, monkeypatch):
+    """Test uprawnień użytkownika z kilkoma rolami (do głębokości DEPTH) jednym zapytaniem."""
+    session_factory, statements = rbac
+    monkeypatch.setattr(role_service, "role_permission_cache", RolePermissionCache(ttl=60))
+    async with session_factory() as db:
+        await rebuild_role_closure(db)
+        statements.clear()
+        permissions = await resolve_user_permissions(db, [1, 4, DEPTH])
+        assert len(statements) == 1
+        assert "RECURSIVE" not in statements[0]
+        assert permissions == {f"resource{level}:read" for level in range(1, DEPTH + 1)} | {"users:read"}
+
+        # Zimne sprawdzenie uprawnienia - jedno zapytanie dla wszystkich ról, kolejne z pamięci
+        statements.clear()
+        principal = Principal(id=1, email="deep@example.com", role_ids=[4, 2, DEPTH])
+        assert await check_permission(db, principal, f"resource{DEPTH}", "read")
+        assert await check_permission(db, principal, "resource2", "read")
+        assert not await check_permission(db, principal, "resource1", "read")
+        assert len(statements) == 1
+        assert await resolve_user_permissions(db, []) == frozenset()
+
+@pytest.mark.asyncio
+async def test_closure_writes_take_table_lock_on_postgresql():
+    """Test blokady tabeli domknięcia przed odczytem hierarchii - zapisy z wielu workerów są szeregowane."""
+    statements = []
+
+    async def execute(statement, params=None):
+        statements.append(str(statement))
+        result = MagicMock()
+        result.scalars.return_value.all.return_value = [3]
+        result.scalar.return_value = 0
+        return result
+
+    db = MagicMock()
+    db.get_bind.return_value.dialect.name = "postgresql"
+    db.execute = AsyncMock(side_effect=execute)
+    db.commit = AsyncMock()
+
+    await refresh_role_closure(db, 3)
+    assert statements[0] == "LOCK TABLE role_effective_permissions IN SHARE ROW EXCLUSIVE MODE"
+    assert len([s for s in statements if s.startswith("LOCK")]) == 1
+
+    statements.clear()
+    await rebuild_role_closure(db)
+    assert statements[0] == "LOCK TABLE role_effective_permissions IN SHARE ROW EXCLUSIVE MODE"
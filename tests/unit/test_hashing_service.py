@@ -0,0 +1,46 @@
+import pytest
+import asyncio
+from app.services.hashing_service import PasswordHashingService
+from app.core.exceptions import ServiceUnavailableException
+
+@pytest.fixture
+async def hashing_service():
+    """Fixture z osobną pulą hashowania dla każdego testu."""
+    service = PasswordHashingService(max_workers=1, max_queue=4, timeout=10.0)
+    service.start()
+    yield service
+    service.shutdown()
+
+@pytest.mark.asyncio
+async def test_hash_and_verify(hashing_service):
+    """Test hashowania i weryfikacji hasła w puli procesów."""
+    password = "TestPass123!@#"
+    hashed = await hashing_service.hash(password)
+    assert hashed != password
+    assert await hashing_service.verify(password, hashed)
+    assert not await hashing_service.verify("wrong_password", hashed)
+    assert hashing_service.in_flight == 0
+
+@pytest.mark.asyncio
+async def test_queue_limit_rejects_excess_jobs():
+    """Test odrzucania zadań po przekroczeniu limitu kolejki."""
+    service = PasswordHashingService(max_workers=1, max_queue=1, timeout=10.0)
+    try:
+        first = asyncio.ensure_future(service.hash("TestPass123!@#"))
+        await asyncio.sleep(0)
+        with pytest.raises(ServiceUnavailableException) as exc_info:
+            await service.hash("TestPass123!@#")
+        assert exc_info.value.status_code == 503
+        await first
+    finally:
+        service.shutdown()
+
+@pytest.mark.asyncio
+async def test_timeout_raises_service_unavailable():
+    """Test przekroczenia czasu oczekiwania na wynik."""
+    service = PasswordHashingService(max_workers=1, max_queue=4, timeout=0.001)
+    try:
+        with pytest.raises(ServiceUnavailableException):
+            await service.hash("TestPass123!@#")
+    finally:
+        service.shutdown()
@@ -128,4 +128,47 @@ def test_custom_permission_checks(permission_manager, test_user, admin_user):
             case["action"],
             case["resource"]
         )
-        assert result == case["should_allow"] 
\ No newline at end of file
+        assert result == case["should_allow"] 
+
+
+def test_closure_rebuilt_on_role_and_permission_changes(permission_manager):
+    """Test przeliczenia domknięcia ról po zmianie uprawnień i hierarchii."""
+    assert not permission_manager.has_permission("admin", "reports:export")
+    assert not permission_manager.permission_exists("reports:export")
+
+    # Uprawnienie nadane roli podrzędnej trafia do ról dziedziczących
+    assert permission_manager.grant_permission("user", "reports:export")
+    assert permission_manager.permission_exists("reports:export")
+    assert permission_manager.has_permission("admin", "reports:export")
+    assert permission_manager.has_permission("moderator", "reports:export")
+
+    assert permission_manager.revoke_permission("user", "reports:export")
+    assert not permission_manager.has_permission("admin", "reports:export")
+    assert not permission_manager.permission_exists("reports:export")
+
+    permission_manager.add_role("auditor", "Audytor", ["audit:read"], inherits=["user"])
+    assert set(permission_manager.get_role_permissions("auditor")) == {
+        "audit:read", "users:read", "content:create"
+    }
+    assert permission_manager.remove_role("auditor")
+    assert not permission_manager.has_permission("auditor", "audit:read")
+    assert permission_manager.get_role_permissions("auditor") == []
+
+def test_unknown_role_and_permission(permission_manager):
+    """Test nieznanej roli i nieznanego uprawnienia."""
+    assert not permission_manager.has_permission("guest", "users:read")
+    assert not permission_manager.has_permission("admin", "unknown:permission")
+    assert not permission_manager.grant_permission("guest", "users:read")
+
+def test_add_role_rejects_inheritance_cycle(permission_manager):
+    """Test odrzucenia roli, która zamknęłaby cykl w hierarchii."""
+    permission_manager.add_role("auditor", "Audytor", ["audit:read"], inherits=["user"])
+    with pytest.raises(ValueError):
+        permission_manager.add_role("user", "Standardowy użytkownik", ["users:read"], inherits=["auditor"])
+    with pytest.raises(ValueError):
+        permission_manager.add_role("auditor", "Audytor", ["audit:read"], inherits=["auditor"])
+
+    # Odrzucona zmiana nie narusza domknięcia
+    assert permission_manager.get_role_permissions("user") == ["users:read", "content:create"]
+    assert permission_manager.has_permission("admin", "content:create")
+    assert not permission_manager.has_permission("user", "audit:read")
@@ -0,0 +1,104 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.services.auth_service import AuthService, get_current_db_user
+from app.models.principal import Principal
+
+@pytest.fixture
+def auth_service():
+    return AuthService()
+
+@pytest.fixture
+def stateless_mode(monkeypatch):
+    monkeypatch.setattr(settings, "STATELESS_PRINCIPAL", True)
+
+def make_claims(**overrides) -> dict:
+    claims = {
+        "sub": "user@example.com",
+        "scopes": ["user"],
+        "user_id": 7,
+        "username": "user",
+        "role_ids": [2],
+        "is_active": True,
+        "is_admin": False,
+        "ver": 0
+    }
+    claims.update(overrides)
+    return claims
+
+def test_principal_from_claims():
+    """Test odtworzenia tożsamości z claimów tokenu."""
+    principal = Principal.from_claims(make_claims(is_admin=True, ver=3))
+    assert principal.id == 7
+    assert principal.roles == ["user"]
+    assert principal.role_ids == [2]
+    assert principal.is_admin is True
+    assert principal.version == 3
+    assert not hasattr(principal, "__dict__")
+
+@pytest.mark.asyncio
+async def test_stateless_mode_skips_user_query(auth_service, stateless_mode):
+    """Test autoryzacji z claimów bez zapytania o użytkownika."""
+    token = auth_service.create_access_token(make_claims())
+    db = AsyncMock(spec=AsyncSession)
+    with patch("app.services.auth_service.token_service.validate_token", AsyncMock(return_value=(True, None))), \
+         patch("app.services.auth_service.token_service.get_claims_version", AsyncMock(return_value=0)), \
+         patch("app.services.auth_service.get_user_by_email", AsyncMock()) as get_user:
+        principal = await auth_service.get_current_user(token, db)
+    assert isinstance(principal, Principal)
+    assert principal.email == "user@example.com"
+    get_user.assert_not_awaited()
+    db.execute.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_stale_role_claims_load_user(auth_service, stateless_mode):
+    """Test tokenu z claimami sprzed zmiany ról - tożsamość z bazy, bez odrzucenia tokenu."""
+    token = auth_service.create_access_token(make_claims(ver=1))
+    user = MagicMock()
+    with patch("app.services.auth_service.token_service.validate_token", AsyncMock(return_value=(True, None))), \
+         patch("app.services.auth_service.token_service.get_claims_version", AsyncMock(return_value=2)), \
+         patch("app.services.auth_service.get_user_by_email", AsyncMock(return_value=user)):
+        assert await auth_service.get_current_user(token, AsyncMock(spec=AsyncSession)) is user
+
+@pytest.mark.asyncio
+async def test_token_without_principal_claims_loads_user(auth_service, stateless_mode):
+    """Test ładowania użytkownika dla tokenów wydanych bez claimów tożsamości."""
+    token = auth_service.create_access_token({"sub": "user@example.com", "user_id": 7})
+    user = MagicMock()
+    with patch("app.services.auth_service.token_service.validate_token", AsyncMock(return_value=(True, None))), \
+         patch("app.services.auth_service.get_user_by_email", AsyncMock(return_value=user)):
+        assert await auth_service.get_current_user(token, AsyncMock(spec=AsyncSession)) is user
+
+@pytest.mark.asyncio
+async def test_db_user_loaded_lazily_once():
+    """Test leniwego, jednokrotnego ładowania wiersza User."""
+    principal = Principal.from_claims(make_claims())
+    user = MagicMock()
+    db = AsyncMock(spec=AsyncSession)
+    db.get.return_value = user
+    assert await get_current_db_user(principal, db) is user
+    assert await principal.load_user(db) is user
+    db.get.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_role_change_bumps_claims_version_not_epoch():
+    """Test zmiany ról - nowa wersja claimów bez inkrementacji epoki (sesje i tokeny odświeżania zostają)."""
+    from app.services import role_service
+
+    role = MagicMock(id=3)
+    user = MagicMock(id=7, roles=[])
+    db = AsyncMock(spec=AsyncSession)
+    with patch.object(role_service, "get_user_by_id", AsyncMock(return_value=user)) as get_user, \
+         patch.object(role_service, "get_role_by_name", AsyncMock(return_value=role)), \
+         patch.object(role_service.token_service, "bump_claims_version", AsyncMock(return_value=1)) as bump_claims, \
+         patch.object(role_service.token_service, "bump_token_epoch", AsyncMock()) as bump_epoch:
+        await role_service.assign_role_to_user(db, 7, "moderator")
+        assert user.roles == [role]
+        await role_service.remove_role_from_user(db, 7, "moderator")
+        assert user.roles == []
+
+    assert get_user.await_count == 2
+    db.get.assert_not_awaited()
+    assert bump_claims.await_count == 2
+    bump_epoch.assert_not_awaited()
@@ -0,0 +1,80 @@
+import pytest
+import redis
+from types import SimpleNamespace
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from app.core.rate_limiter import LimitDimension, RateLimitPolicy
+from app.middleware.security import RateLimitMiddleware, RouteTable
+
+class UnavailableRedis:
+    """Klient, którego każde wywołanie kończy się błędem połączenia (limity w pamięci procesu)."""
+
+    def register_script(self, script):
+        async def run(keys, args):
+            raise redis.ConnectionError("Connection refused")
+        return run
+
+def test_route_table_matches_static_paths_and_templates():
+    """Test dopasowania ścieżek stałych, szablonów i ukośnika końcowego."""
+    table = RouteTable([
+        ("POST", "/api/users", "register"),
+        ("POST", "/api/users/{user_id}/roles", "roles"),
+        ("POST", "/api/users/me/roles", "own-roles"),
+    ])
+    assert table.match("POST", "/api/users/") == "register"
+    assert table.match("POST", "/api/users") == "register"
+    assert table.match("POST", "/api/users/42/roles") == "roles"
+    assert table.match("POST", "/api/users/me/roles") == "own-roles"
+    assert table.match("GET", "/api/users") is None
+    assert table.match("POST", "/api/users/42") is None
+    assert table.match("POST", "/api/users//roles") is None
+
+@pytest.fixture
+def app_and_calls():
+    app = FastAPI()
+    calls = []
+
+    @app.post("/api/users/")
+    async def register(request: Request):
+        calls.append(await request.json())
+        return {"message": "ok"}
+
+    @app.get("/api/users/me")
+    async def me():
+        return {"message": "ok"}
+
+    policy = RateLimitPolicy(
+        "register-test",
+        [LimitDimension("ip", 2, 3600)],
+        cache=SimpleNamespace(client=UnavailableRedis())
+    )
+    app.add_middleware(RateLimitMiddleware, routes=[("POST", "/api/users", policy)])
+    return TestClient(app), calls
+
+def test_middleware_rejects_before_handler(app_and_calls):
+    """Test odrzucenia nadmiarowych żądań bez wywołania handlera i parsowania treści."""
+    client, calls = app_and_calls
+
+    first = client.post("/api/users/", json={"n": 1})
+    assert first.status_code == 200
+    assert first.headers["X-RateLimit-Limit"] == "2"
+    assert first.headers["X-RateLimit-Remaining"] == "1"
+    assert int(first.headers["X-RateLimit-Reset"]) > 0
+
+    assert client.post("/api/users/", json={"n": 2}).status_code == 200
+
+    rejected = client.post("/api/users/", json={"n": 3})
+    assert rejected.status_code == 429
+    assert rejected.json()["error"]["type"] == "rate_limit"
+    assert rejected.headers["X-RateLimit-Remaining"] == "0"
+    assert rejected.headers["X-RateLimit-Scope"] == "ip"
+    assert int(rejected.headers["Retry-After"]) > 0
+    assert calls == [{"n": 1}, {"n": 2}]
+
+def test_routes_without_policy_pass_through(app_and_calls):
+    """Test tras spoza tablicy polityk - bez limitu i bez nagłówków X-RateLimit-*."""
+    client, _ = app_and_calls
+    for _ in range(5):
+        response = client.get("/api/users/me")
+        assert response.status_code == 200
+        assert "X-RateLimit-Limit" not in response.headers
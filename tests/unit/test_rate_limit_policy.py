@@ -0,0 +1,99 @@
+import pytest
+import redis
+from types import SimpleNamespace
+from fakeredis import FakeServer
+from fakeredis.aioredis import FakeRedis
+from app.core.rate_limiter import LimitDimension, RateLimitPolicy
+
+class UnavailableRedis:
+    """Klient, którego każde wywołanie kończy się błędem połączenia."""
+
+    def register_script(self, script):
+        async def run(keys, args):
+            raise redis.ConnectionError("Connection refused")
+        return run
+
+    async def delete(self, key):
+        raise redis.ConnectionError("Connection refused")
+
+def make_policy(cache, name: str) -> RateLimitPolicy:
+    """Tworzy politykę logowania z trzema wymiarami (długie okna - bez granic okien w teście)."""
+    return RateLimitPolicy(name, [
+        LimitDimension("ip", 3, 3600),
+        LimitDimension("account", 2, 3600),
+        LimitDimension("global", 100, 3600, shared=True),
+    ], cache=cache)
+
+async def assert_policy_semantics(policy: RateLimitPolicy):
+    """Sprawdza wspólną semantykę polityki niezależnie od magazynu stanu."""
+    first = await policy.check(ip="10.0.0.1", account="alice")
+    assert first.allowed and first.tripped is None
+    assert first.limiting.remaining == 1
+    assert (await policy.check(ip="10.0.0.1", account="alice")).allowed
+
+    # Trzecia próba na to samo konto - blokuje wymiar konta
+    decision = await policy.check(ip="10.0.0.1", account="alice")
+    assert not decision.allowed
+    assert decision.tripped == "account"
+    assert decision.denied == ["account"]
+    assert decision.retry_after > 0
+
+    # Odrzucona próba nie zużyła limitu IP - zostało jedno żądanie
+    assert (await policy.check(ip="10.0.0.1", account="bob")).allowed
+    decision = await policy.check(ip="10.0.0.1", account="carol")
+    assert decision.tripped == "ip"
+    assert decision.results["account"].allowed
+
+    # Wyzerowanie licznika konta po udanym logowaniu
+    await policy.reset("account", "alice")
+    assert (await policy.check(ip="10.0.0.2", account="alice")).allowed
+
+    # Próba po weryfikacji CAPTCHA pomija wymiar konta, ale zalicza IP i limit globalny
+    assert (await policy.check(ip="10.0.0.3", account="alice")).allowed
+    assert (await policy.check(ip="10.0.0.3", account="alice")).tripped == "account"
+    for _ in range(2):
+        assert (await policy.check_without("account", ip="10.0.0.3", account="alice")).allowed
+    decision = await policy.check_without("account", ip="10.0.0.3", account="alice")
+    assert decision.tripped == "ip"
+    assert "account" not in decision.results
+
+@pytest.mark.asyncio
+async def test_policy_in_redis_uses_single_round_trip():
+    """Test łącznej oceny wymiarów jednym wywołaniem skryptu w Redis."""
+    pytest.importorskip("lupa")
+    client = FakeRedis(server=FakeServer(), decode_responses=True)
+    calls = []
+    evalsha = client.evalsha
+
+    def counting_evalsha(*args, **kwargs):
+        calls.append(args[0])
+        return evalsha(*args, **kwargs)
+
+    client.evalsha = counting_evalsha
+    policy = make_policy(SimpleNamespace(client=client), "test-login")
+
+    # Pierwsze wywołanie ładuje skrypt (NOSCRIPT, SCRIPT LOAD); kolejne to pojedynczy EVALSHA
+    await policy.check(ip="10.0.0.8", account="erin")
+    calls.clear()
+    await policy.check(ip="10.0.0.9", account="dave")
+    assert len(calls) == 1
+    assert await client.hget("ratelimit:test-login:global:*", "current") == "2"
+
+    await assert_policy_semantics(make_policy(SimpleNamespace(client=client), "test-login-semantics"))
+
+@pytest.mark.asyncio
+async def test_policy_falls_back_to_local_limits():
+    """Test tej samej semantyki polityki w pamięci procesu, gdy Redis jest niedostępny."""
+    policy = make_policy(SimpleNamespace(client=UnavailableRedis()), "test-login-local")
+    await assert_policy_semantics(policy)
+
+def test_token_refresh_limit_allows_clients_behind_nat():
+    """Test limitu odświeżania - co najmniej 100 sesji za jednym adresem IP mieści się w limicie."""
+    from app.core.config import settings
+    from app.core.rate_limit_policies import token_refresh_rate_limit
+
+    ip_limit = token_refresh_rate_limit.dimensions[0]
+    # Każda sesja odświeża token raz na ACCESS_TOKEN_EXPIRE_MINUTES minut
+    refreshes_per_lifetime = ip_limit.max_requests * settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60 / ip_limit.window_seconds
+    assert refreshes_per_lifetime >= 100
+    assert ip_limit.max_requests > settings.LOGIN_LIMIT_PER_IP * 10
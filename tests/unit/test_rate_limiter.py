@@ -0,0 +1,119 @@
+import pytest
+from app.core.rate_limiter import RateLimiter, sweep_rate_limiters
+
+class FakeClock:
+    """Sterowany zegar monotoniczny."""
+
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+def test_limit_within_window():
+    """Test odrzucenia żądania po wyczerpaniu limitu w oknie."""
+    clock = FakeClock(1000.0)
+    limiter = RateLimiter(max_requests=3, window_seconds=60, clock=clock)
+    remaining = [limiter.check("ip").remaining for _ in range(3)]
+    assert remaining == [2, 1, 0]
+
+    result = limiter.check("ip")
+    assert not result.allowed
+    assert result.remaining == 0
+    assert result.reset_after == pytest.approx(20.0)
+    # Inne klucze mają osobne limity
+    assert limiter.check("other").allowed
+
+def test_previous_window_is_weighted():
+    """Test ważenia licznika poprzedniego okna pozostałą częścią okna."""
+    clock = FakeClock(0.0)
+    limiter = RateLimiter(max_requests=4, window_seconds=60, clock=clock)
+    for _ in range(4):
+        assert limiter.check("ip").allowed
+
+    # 15 s nowego okna: szacunek 4 * 0.75 = 3, miejsce na jedno żądanie
+    clock.now = 75.0
+    assert limiter.check("ip").allowed
+    result = limiter.check("ip")
+    assert not result.allowed
+    # Szacunek 4 * (60 - e) / 60 + 1 <= 3 dla e >= 30
+    assert result.retry_after == pytest.approx(15.0)
+
+    clock.now = 90.0
+    assert limiter.check("ip").allowed
+
+def test_full_window_retry_after_spans_into_next_window():
+    """Test czasu ponownej próby, gdy bieżące okno jest pełne."""
+    clock = FakeClock(10.0)
+    limiter = RateLimiter(max_requests=2, window_seconds=60, clock=clock)
+    limiter.check("ip")
+    limiter.check("ip")
+    result = limiter.check("ip")
+    # 50 s do końca okna + 30 s, aż waga 2 żądań spadnie do 1
+    assert result.retry_after == pytest.approx(80.0)
+
+    clock.now = 10.0 + result.retry_after
+    assert limiter.check("ip").allowed
+
+def test_gap_longer_than_window_resets_counters():
+    """Test wyzerowania liczników po przerwie dłuższej niż okno."""
+    clock = FakeClock(0.0)
+    limiter = RateLimiter(max_requests=1, window_seconds=10, clock=clock)
+    assert limiter.check("ip").allowed
+    clock.now = 25.0
+    assert limiter.check("ip").allowed
+
+def test_is_allowed_keeps_tuple_interface():
+    """Test zgodności is_allowed z dotychczasowym interfejsem."""
+    limiter = RateLimiter(max_requests=1, window_seconds=60, clock=FakeClock(29.5))
+    assert limiter.is_allowed("ip") == (True, 0)
+    allowed, retry_after = limiter.is_allowed("ip")
+    assert not allowed
+    # 30.5 s do końca okna + pełne okno wygaszania wagi; zaokrąglone w górę
+    assert retry_after == 91
+
+def test_idle_keys_are_evicted_incrementally():
+    """Test przyrostowego usuwania kluczy, których oba okna minęły."""
+    clock = FakeClock(0.0)
+    limiter = RateLimiter(max_requests=5, window_seconds=10, clock=clock, sweep_batch=2, name="test-idle")
+    for index in range(5):
+        limiter.check(f"ip-{index}")
+    clock.now = 15.0
+    limiter.check("ip-0")
+    assert len(limiter) == 5
+
+    # Każde sprawdzenie usuwa co najwyżej sweep_batch bezczynnych kluczy
+    clock.now = 25.0
+    limiter.check("fresh")
+    assert len(limiter) == 4
+    assert limiter.sweep() == 2
+    assert len(limiter) == 2
+    # ip-0 był użyty w poprzednim oknie - nadal ma stan
+    assert limiter.check("ip-0").remaining == 3
+
+def test_key_count_is_capped():
+    """Test twardego limitu liczby kluczy z usuwaniem najdawniej używanych."""
+    limiter = RateLimiter(max_requests=1, window_seconds=60, clock=FakeClock(0.0), max_keys=3, name="test-cap")
+    for key in ("a", "b", "c"):
+        limiter.check(key)
+    limiter.check("a")
+    limiter.check("d")
+    assert len(limiter) == 3
+    # Usunięty został "b" - najdawniej używany
+    assert limiter.check("b").allowed
+    assert not limiter.check("a").allowed
+
+def test_periodic_sweep_covers_all_limiters():
+    """Test okresowego przeglądu - bezczynne klucze znikają ze wszystkich limiterów procesu."""
+    clock = FakeClock(0.0)
+    limiters = [
+        RateLimiter(max_requests=5, window_seconds=10, clock=clock, name=f"test-sweep-{index}")
+        for index in range(2)
+    ]
+    for limiter in limiters:
+        for index in range(3):
+            limiter.check(f"ip-{index}")
+
+    clock.now = 25.0
+    assert sweep_rate_limiters() >= 6
+    assert [len(limiter) for limiter in limiters] == [0, 0]
@@ -0,0 +1,43 @@
+import pytest
+from app.core.cache import RedisCache
+from app.core.config import settings
+
+@pytest.fixture
+def unreachable_redis(monkeypatch):
+    """Konfiguruje adres Redis, pod którym nikt nie nasłuchuje."""
+    monkeypatch.setattr(settings, "REDIS_URL", "redis://127.0.0.1:1/0")
+
+def test_pool_stats_before_connect():
+    """Test stanu puli przed pierwszym użyciem."""
+    cache = RedisCache(pool_size=5)
+    assert cache.pool_stats() == {"max": 5, "in_use": 0, "idle": 0}
+
+@pytest.mark.asyncio
+async def test_operations_degrade_gracefully(unreachable_redis):
+    """Test braku wyjątków przy niedostępnym Redis."""
+    cache = RedisCache(pool_size=2, pool_timeout=0.1, socket_timeout=0.1, connect_timeout=0.1)
+    assert await cache.ping() is False
+    assert await cache.get("key") is None
+    await cache.set("key", 1, expires_in=10)
+    await cache.delete("key")
+    # Połączenia, które się nie udały, muszą wrócić do puli
+    assert cache.pool_stats()["in_use"] == 0
+    await cache.close()
+    assert cache._pool is None
+
+@pytest.mark.asyncio
+async def test_set_max_never_lowers_stored_value():
+    """Test zapisu tylko większych wartości - spóźniony zapis nie cofa licznika."""
+    pytest.importorskip("lupa")
+    from fakeredis import FakeServer
+    from fakeredis.aioredis import FakeRedis
+
+    cache = RedisCache()
+    cache._redis = FakeRedis(server=FakeServer(), decode_responses=True)
+
+    assert await cache.set_max("epoch", 5, expires_in=60) == 5
+    assert await cache.set_max("epoch", 4, expires_in=60) == 5
+    assert await cache.get("epoch") == "5"
+    assert await cache.set_max_many([("epoch", 6, 60), ("other", 0, None)]) == [6, 0]
+    assert 0 < await cache.client.ttl("epoch") <= 60
+    assert await cache.client.ttl("other") == -1
@@ -0,0 +1,71 @@
+import pytest
+import redis
+from types import SimpleNamespace
+from fakeredis import FakeServer
+from fakeredis.aioredis import FakeRedis
+from app.core.rate_limiter import RateLimiter, RedisRateLimiter
+from app.monitoring.rate_limit_metrics import RATE_LIMITER_FALLBACKS
+
+def fake_cache(server: FakeServer) -> SimpleNamespace:
+    """Zwraca obiekt zgodny z RedisCache, oparty na lokalnym zastępniku Redis."""
+    return SimpleNamespace(client=FakeRedis(server=server, decode_responses=True))
+
+class UnavailableRedis:
+    """Klient, którego każde wywołanie skryptu kończy się błędem połączenia."""
+
+    def register_script(self, script):
+        async def run(keys, args):
+            raise redis.ConnectionError("Connection refused")
+        return run
+
+@pytest.mark.asyncio
+async def test_limit_is_shared_between_workers():
+    """Test wspólnego limitu dla wielu workerów korzystających z jednego Redis."""
+    pytest.importorskip("lupa")
+    server = FakeServer()
+    # Długie okno - test nie przekroczy granicy okien
+    workers = [
+        RedisRateLimiter(max_requests=5, window_seconds=3600, name="test-shared", cache=fake_cache(server))
+        for _ in range(2)
+    ]
+
+    results = [await workers[index % 2].check("10.0.0.1") for index in range(8)]
+
+    assert [result.allowed for result in results] == [True] * 5 + [False] * 3
+    assert [result.remaining for result in results[:5]] == [4, 3, 2, 1, 0]
+    assert 0 < results[-1].retry_after <= 7200
+    assert 0 < results[-1].reset_after <= 3600
+    # Inny klucz ma osobny limit
+    assert (await workers[0].check("10.0.0.2")).allowed
+
+@pytest.mark.asyncio
+async def test_state_expires_after_two_windows():
+    """Test wygasania stanu klucza w Redis po dwóch oknach."""
+    pytest.importorskip("lupa")
+    cache = fake_cache(FakeServer())
+    limiter = RedisRateLimiter(max_requests=5, window_seconds=30, name="test-ttl", cache=cache)
+
+    await limiter.check("user@example.com")
+
+    ttl = await cache.client.pttl("ratelimit:test-ttl:user@example.com")
+    assert 0 < ttl <= 60000
+    assert await cache.client.hget("ratelimit:test-ttl:user@example.com", "current") == "1"
+
+@pytest.mark.asyncio
+async def test_falls_back_to_local_limiter_without_redis():
+    """Test przejścia na limit lokalny, gdy Redis jest niedostępny."""
+    fallback = RateLimiter(max_requests=2, window_seconds=60, name="test-fallback-local")
+    limiter = RedisRateLimiter(
+        max_requests=2,
+        window_seconds=60,
+        name="test-fallback",
+        cache=SimpleNamespace(client=UnavailableRedis()),
+        fallback=fallback
+    )
+    before = RATE_LIMITER_FALLBACKS.labels(limiter="test-fallback")._value.get()
+
+    assert await limiter.is_allowed("10.0.0.1") == (True, 0)
+    assert (await limiter.check("10.0.0.1")).allowed
+    assert not (await limiter.check("10.0.0.1")).allowed
+    assert len(fallback) == 1
+    assert RATE_LIMITER_FALLBACKS.labels(limiter="test-fallback")._value.get() == before + 3
@@ -0,0 +1,106 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.services.refresh_token_service import RefreshTokenService, hash_refresh_token
+
+@pytest.fixture
+def service():
+    return RefreshTokenService(expire_days=14)
+
+@pytest.fixture
+def refresh_token_model():
+    """Zastępuje model wiersza prostym obiektem (bez konfiguracji mapperów)."""
+    with patch("app.services.refresh_token_service.RefreshToken", SimpleNamespace):
+        yield
+
+def db_returning(stored, user_epoch: int = 0):
+    """Zwraca sesję, której zapytanie o token zwraca podany wiersz i bieżącą epokę użytkownika."""
+    db = AsyncMock(spec=AsyncSession)
+    db.add = MagicMock()
+    result = MagicMock()
+    result.one_or_none.return_value = None if stored is None else (stored, user_epoch)
+    db.execute.return_value = result
+    return db
+
+def stored_token(token: str, **overrides) -> SimpleNamespace:
+    values = dict(
+        token_hash=hash_refresh_token(token),
+        family_id="family-1",
+        user_id=7,
+        expires_at=datetime.now(timezone.utc) + timedelta(days=1),
+        used_at=None,
+        revoked=False,
+        token_epoch=0
+    )
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+@pytest.mark.asyncio
+async def test_issue_stores_only_hash(service, refresh_token_model):
+    """Test przechowywania wyłącznie skrótu tokenu."""
+    db = db_returning(None)
+    token = await service.issue(db, user_id=7)
+    stored = db.add.call_args.args[0]
+    assert stored.token_hash == hash_refresh_token(token)
+    assert token not in stored.token_hash
+    assert stored.user_id == 7
+
+@pytest.mark.asyncio
+async def test_rotation_issues_token_in_same_family(service):
+    """Test rotacji: stary token oznaczony jako użyty, nowy w tej samej rodzinie."""
+    stored = stored_token("old")
+    db = db_returning(stored)
+    with patch.object(service, "issue", AsyncMock(return_value="new")) as issue:
+        assert await service.rotate(db, "old") == (7, "new")
+    assert stored.used_at is not None
+    issue.assert_awaited_once_with(db, 7, "family-1", 0)
+
+@pytest.mark.asyncio
+async def test_reuse_revokes_family(service):
+    """Test wykrycia ponownego użycia i unieważnienia całej rodziny."""
+    stored = stored_token("old", used_at=datetime.now(timezone.utc))
+    db = db_returning(stored)
+    with pytest.raises(HTTPException) as exc_info:
+        await service.rotate(db, "old")
+    assert exc_info.value.status_code == 401
+    assert "ponowne" in exc_info.value.detail
+    # Zapytanie o token i aktualizacja rodziny
+    assert db.execute.await_count == 2
+    db.commit.assert_awaited_once()
+    db.add.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_expired_or_unknown_token_rejected(service):
+    """Test odrzucenia wygasłego i nieznanego tokenu."""
+    expired = stored_token("old", expires_at=datetime.now(timezone.utc) - timedelta(seconds=1))
+    for stored in (expired, None):
+        with pytest.raises(HTTPException) as exc_info:
+            await service.rotate(db_returning(stored), "old")
+        assert exc_info.value.status_code == 401
+
+@pytest.mark.asyncio
+async def test_refresh_rejected_after_password_change(service):
+    """Test odrzucenia rotacji po zmianie hasła (inkrementacja epoki) i unieważnienia rodziny."""
+    stored = stored_token("old", token_epoch=2)
+    # Zmiana hasła podniosła epokę użytkownika z 2 do 3
+    db = db_returning(stored, user_epoch=3)
+    with patch.object(service, "issue", AsyncMock(return_value="new")) as issue:
+        with pytest.raises(HTTPException) as exc_info:
+            await service.rotate(db, "old")
+    assert exc_info.value.status_code == 401
+    issue.assert_not_awaited()
+    assert stored.used_at is None
+    # Zapytanie o token i unieważnienie rodziny
+    assert db.execute.await_count == 2
+    assert "UPDATE refresh_tokens" in str(db.execute.await_args_list[1].args[0])
+    db.commit.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_issue_records_user_epoch(service, refresh_token_model):
+    """Test zapisu epoki użytkownika w wydanym tokenie odświeżania."""
+    db = db_returning(None)
+    await service.issue(db, user_id=7, token_epoch=3)
+    assert db.add.call_args.args[0].token_epoch == 3
@@ -0,0 +1,83 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi import FastAPI, Depends, Security
+from fastapi.testclient import TestClient
+from app.middleware.security import AuthenticationMiddleware
+from app.services.auth_service import (
+    auth_service,
+    get_current_user,
+    get_current_active_user,
+    get_current_admin,
+    get_token_claims
+)
+from app.monitoring.auth_metrics import AUTH_TOKEN_DECODES, AUTH_PRINCIPAL_RESOLUTIONS
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+
+    @app.get("/chained")
+    async def chained(
+        admin = Security(get_current_admin),
+        active = Security(get_current_active_user, scopes=["users:read"]),
+        user = Security(get_current_user, scopes=["users:write"]),
+        claims: dict = Depends(get_token_claims)
+    ):
+        return {"same": admin is active is user, "sub": claims["sub"]}
+
+    @app.get("/public")
+    async def public():
+        return {"message": "ok"}
+
+    app.add_middleware(AuthenticationMiddleware, public_routes=[("GET", r"/public")])
+    return TestClient(app)
+
+def counter_value(counter) -> float:
+    return counter._value.get()
+
+def test_chained_dependencies_resolve_identity_once(client):
+    """Test jednokrotnego dekodowania tokenu i ładowania użytkownika na żądanie."""
+    token = auth_service.create_access_token({"sub": "admin@example.com", "user_id": 1})
+    user = MagicMock(is_active=True, is_admin=True)
+    decodes = counter_value(AUTH_TOKEN_DECODES)
+    loads = counter_value(AUTH_PRINCIPAL_RESOLUTIONS.labels(source="database"))
+
+    with patch("app.services.auth_service.token_service.validate_token", AsyncMock(return_value=(True, None))), \
+         patch("app.services.auth_service.get_user_by_email", AsyncMock(return_value=user)) as get_user:
+        response = client.get("/chained", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 200
+        assert response.json() == {"same": True, "sub": "admin@example.com"}
+        get_user.assert_awaited_once()
+
+        # Kolejne żądanie rozwiązuje tożsamość od nowa
+        client.get("/chained", headers={"Authorization": f"Bearer {token}"})
+
+    assert counter_value(AUTH_TOKEN_DECODES) - decodes == 2
+    assert counter_value(AUTH_PRINCIPAL_RESOLUTIONS.labels(source="database")) - loads == 2
+
+def test_invalid_or_missing_token_rejected(client):
+    """Test odrzucenia żądania bez poprawnego tokenu przez middleware."""
+    response = client.get("/chained", headers={"Authorization": "Bearer invalid"})
+    assert response.status_code == 401
+    assert response.headers["WWW-Authenticate"] == "Bearer"
+    assert client.get("/chained").status_code == 401
+
+def test_revoked_token_rejected(client):
+    """Test odrzucenia unieważnionego tokenu."""
+    token = auth_service.create_access_token({"sub": "admin@example.com", "user_id": 1})
+    with patch("app.services.auth_service.token_service.validate_token", AsyncMock(return_value=(False, None))):
+        response = client.get("/chained", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+
+def test_public_route_skips_authentication(client):
+    """Test pomijania uwierzytelniania dla tras publicznych."""
+    assert client.get("/public").status_code == 200
+
+def test_default_public_route_table():
+    """Test domyślnej tablicy tras publicznych."""
+    middleware = AuthenticationMiddleware()
+    assert middleware.is_public("POST", "/api/users/token")
+    assert middleware.is_public("POST", "/api/users/reset-password/confirm")
+    assert middleware.is_public("GET", "/docs")
+    assert not middleware.is_public("GET", "/api/users/me")
+    assert not middleware.is_public("GET", "/api/users/token")
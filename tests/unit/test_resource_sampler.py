@@ -0,0 +1,46 @@
+import pytest
+import asyncio
+from app.monitoring.resource_sampler import ResourceSampler, ResourceSnapshot
+from app.middleware.performance import PerformanceMiddleware
+
+def test_snapshot_without_running_sampler():
+    """Test jednorazowego odczytu, gdy sampler nie działa w tle."""
+    sampler = ResourceSampler()
+    snapshot = sampler.snapshot
+    assert 0.0 <= snapshot.memory_percent <= 100.0
+    assert snapshot.loop_lag == 0.0
+
+def test_publish_smooths_readings():
+    """Test wygładzania odczytów (EWMA)."""
+    sampler = ResourceSampler(smoothing=0.5)
+    sampler._publish(ResourceSnapshot(10.0, 50.0, 0.0), loop_lag=0.0)
+    snapshot = sampler._publish(ResourceSnapshot(30.0, 70.0, 0.0), loop_lag=0.2)
+    assert snapshot.cpu_percent == pytest.approx(20.0)
+    assert snapshot.memory_percent == pytest.approx(60.0)
+    assert snapshot.loop_lag == pytest.approx(0.1)
+    assert sampler._snapshot is snapshot
+
+@pytest.mark.asyncio
+async def test_background_sampling_start_stop():
+    """Test uruchamiania i zatrzymywania próbkowania w tle."""
+    sampler = ResourceSampler(interval=0.01)
+    await sampler.start()
+    await asyncio.sleep(0.05)
+    assert sampler._snapshot is not None
+    assert sampler.snapshot is sampler._snapshot
+    await sampler.stop()
+    assert sampler._task is None
+
+def test_middleware_rejects_on_event_loop_lag():
+    """Test odrzucania żądań przy dużym opóźnieniu pętli zdarzeń."""
+    class LaggingSampler:
+        snapshot = ResourceSnapshot(1.0, 1.0, 2.0)
+
+    middleware = PerformanceMiddleware(
+        app=None,
+        max_memory_percent=100.0,
+        max_cpu_percent=100.0,
+        max_event_loop_lag=0.5,
+        sampler=LaggingSampler()
+    )
+    assert middleware.resources_available() is False
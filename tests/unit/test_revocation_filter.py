@@ -0,0 +1,100 @@
+import pytest
+import uuid
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.bloom_filter import BloomFilter
+from app.services.token_service import TokenService
+from app.models.token import TokenData
+
+@pytest.fixture
+def token_service():
+    service = TokenService()
+    service._cache = AsyncMock()
+    service._cache.get = AsyncMock(return_value=None)
+    service._listener_active = True
+    return service
+
+def db_with_revoked(jtis):
+    """Zwraca sesję, której zapytanie o unieważnione tokeny zwraca podane jti."""
+    db = AsyncMock(spec=AsyncSession)
+    result = MagicMock()
+    result.scalars.return_value.all.return_value = jtis
+    db.execute.return_value = result
+    return db
+
+def make_token(jti: str) -> TokenData:
+    return TokenData(
+        email="user@example.com",
+        jti=jti,
+        exp=datetime.utcnow() + timedelta(minutes=30)
+    )
+
+def test_bloom_filter_has_no_false_negatives():
+    """Test braku fałszywie ujemnych odpowiedzi filtra."""
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    keys = [str(uuid.uuid4()) for _ in range(1000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    # Klucz, którego wszystkie bity były już ustawione, nie zwiększa licznika
+    assert 990 <= len(bloom) <= 1000
+
+def test_bloom_filter_false_positive_rate():
+    """Test odsetka fałszywych trafień zbliżonego do zadanego."""
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    for _ in range(1000):
+        bloom.add(str(uuid.uuid4()))
+    false_positives = sum(str(uuid.uuid4()) in bloom for _ in range(10000))
+    assert false_positives / 10000 < 0.03
+    assert bloom.false_positive_rate == pytest.approx(0.01, rel=0.5)
+
+def test_bloom_filter_rejects_invalid_parameters():
+    """Test walidacji parametrów filtra."""
+    with pytest.raises(ValueError):
+        BloomFilter(capacity=0)
+    with pytest.raises(ValueError):
+        BloomFilter(capacity=10, error_rate=1.0)
+
+@pytest.mark.asyncio
+async def test_negative_filter_answer_skips_cache_and_db(token_service):
+    """Test walidacji bez I/O dla tokenu spoza filtra."""
+    await token_service.rebuild_revocation_filter(db_with_revoked(["revoked-jti"]))
+    db = AsyncMock(spec=AsyncSession)
+    assert await token_service.validate_token(db, make_token("valid-jti")) == (True, None)
+    token_service._cache.get.assert_not_awaited()
+    db.execute.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_positive_filter_answer_falls_through(token_service):
+    """Test sprawdzenia w źródle prawdy dla tokenu obecnego w filtrze."""
+    await token_service.rebuild_revocation_filter(db_with_revoked(["revoked-jti"]))
+    token_service._cache.get = AsyncMock(return_value="0")
+    db = AsyncMock(spec=AsyncSession)
+    assert await token_service.validate_token(db, make_token("revoked-jti")) == (False, None)
+    token_service._cache.get.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_filter_ignored_without_listener(token_service):
+    """Test pomijania filtra, gdy subskrypcja unieważnień nie działa."""
+    await token_service.rebuild_revocation_filter(db_with_revoked([]))
+    token_service._listener_active = False
+    token_service._cache.get = AsyncMock(return_value="1")
+    await token_service.validate_token(AsyncMock(spec=AsyncSession), make_token("valid-jti"))
+    token_service._cache.get.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_revocation_during_rebuild_is_kept(token_service):
+    """Test uwzględnienia unieważnień otrzymanych w trakcie przebudowy."""
+    db = db_with_revoked([])
+
+    async def execute(*args, **kwargs):
+        token_service._note_revoked("revoked-meanwhile")
+        result = MagicMock()
+        result.scalars.return_value.all.return_value = []
+        return result
+
+    db.execute.side_effect = execute
+    await token_service.rebuild_revocation_filter(db)
+    assert "revoked-meanwhile" in token_service._revocation_filter
+    assert token_service._filter_pending is None
@@ -0,0 +1,116 @@
+import pytest
+from datetime import date
+from unittest.mock import AsyncMock, MagicMock
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateTable
+from app.services import partition_service
+from app.services.partition_service import (
+    RevokedTokenPartitionManager,
+    expired_partitions,
+    partition_bounds,
+    partition_day,
+    partition_name
+)
+from app.models.token import RevokedToken
+
+def fake_db(partitions):
+    """Tworzy sesję zwracającą podaną listę partycji i zapisującą wykonane polecenia."""
+    db = MagicMock()
+    statements = []
+
+    async def execute(statement, params=None):
+        statements.append(str(statement))
+        result = MagicMock()
+        result.scalars.return_value.all.return_value = list(partitions)
+        return result
+
+    db.execute = AsyncMock(side_effect=execute)
+    return db, statements
+
+def test_partition_naming_and_bounds():
+    """Test nazw partycji i granic zakresu w UTC."""
+    day = date(2024, 2, 29)
+    assert partition_name(day) == "revoked_tokens_p20240229"
+    assert partition_day("revoked_tokens_p20240229") == day
+    assert partition_day("revoked_tokens_legacy") is None
+    assert partition_bounds(day) == ("2024-02-29 00:00:00+00", "2024-03-01 00:00:00+00")
+
+def test_only_fully_expired_partitions_are_selected():
+    """Test wyboru partycji, których zakres w całości minął."""
+    names = [
+        "revoked_tokens_p20240209",
+        "revoked_tokens_p20240208",
+        "revoked_tokens_p20240210",
+        "revoked_tokens_default"
+    ]
+    assert expired_partitions(names, date(2024, 2, 10)) == [
+        "revoked_tokens_p20240208",
+        "revoked_tokens_p20240209"
+    ]
+
+@pytest.mark.asyncio
+async def test_ensure_partitions_creates_missing_days():
+    """Test tworzenia brakujących partycji z wyprzedzeniem."""
+    manager = RevokedTokenPartitionManager(premake_days=2)
+    db, statements = fake_db(["revoked_tokens_p20240210"])
+
+    created = await manager.ensure_partitions(db, today=date(2024, 2, 10))
+
+    assert created == ["revoked_tokens_p20240211", "revoked_tokens_p20240212"]
+    ddl = [s for s in statements if s.startswith("CREATE TABLE")]
+    assert len(ddl) == 2
+    assert "PARTITION OF revoked_tokens" in ddl[0]
+    assert "FROM ('2024-02-11 00:00:00+00') TO ('2024-02-12 00:00:00+00')" in ddl[0]
+
+@pytest.mark.asyncio
+async def test_drop_expired_partitions_detaches_and_drops():
+    """Test usuwania wygasłych partycji bez DELETE wierszy."""
+    manager = RevokedTokenPartitionManager()
+    db, statements = fake_db(["revoked_tokens_p20240209", "revoked_tokens_p20240210"])
+
+    dropped = await manager.drop_expired_partitions(db, today=date(2024, 2, 10))
+
+    assert dropped == ["revoked_tokens_p20240209"]
+    assert "ALTER TABLE revoked_tokens DETACH PARTITION revoked_tokens_p20240209" in statements
+    assert "DROP TABLE revoked_tokens_p20240209" in statements
+    assert not any(s.startswith("DELETE") for s in statements)
+
+@pytest.mark.asyncio
+async def test_startup_ensures_today_and_tomorrow_under_lock(monkeypatch):
+    """Test startu workera: blokada doradcza, partycje na dziś i jutro, bez usuwania."""
+    manager = RevokedTokenPartitionManager(premake_days=7)
+    db, statements = fake_db([])
+    db.commit = AsyncMock()
+    session = MagicMock()
+    session.__aenter__ = AsyncMock(return_value=db)
+    session.__aexit__ = AsyncMock(return_value=False)
+    monkeypatch.setattr(partition_service, "async_session", lambda: session)
+
+    await manager.ensure_startup_partitions()
+
+    assert "pg_advisory_xact_lock" in statements[0]
+    assert len([s for s in statements if s.startswith("CREATE TABLE")]) == 2
+    assert not any("DETACH" in s or s.startswith("DROP") for s in statements)
+    db.commit.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_startup_partition_error_does_not_abort(monkeypatch):
+    """Test startu workera przy błędzie DDL - błąd jest logowany, a start trwa dalej."""
+    manager = RevokedTokenPartitionManager()
+    db = MagicMock()
+    db.execute = AsyncMock(side_effect=Exception('relation "revoked_tokens_p20240210" already exists'))
+    session = MagicMock()
+    session.__aenter__ = AsyncMock(return_value=db)
+    session.__aexit__ = AsyncMock(return_value=False)
+    monkeypatch.setattr(partition_service, "async_session", lambda: session)
+
+    await manager.ensure_startup_partitions()
+
+def test_model_is_range_partitioned_by_expiry():
+    """Test definicji tabeli partycjonowanej z kluczem zawierającym expires_at."""
+    ddl = str(CreateTable(RevokedToken.__table__).compile(dialect=postgresql.dialect()))
+    assert "PARTITION BY RANGE (expires_at)" in ddl
+    assert "PRIMARY KEY (id, expires_at)" in ddl
+    index = next(i for i in RevokedToken.__table__.indexes if i.name == "idx_revoked_tokens_jti_expires")
+    assert index.unique
+    assert [c.name for c in index.columns] == ["jti", "expires_at"]
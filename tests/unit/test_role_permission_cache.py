@@ -0,0 +1,151 @@
+import asyncio
+import pytest
+from app.core.config import settings
+from app.services.role_service import RolePermissionCache
+from app.monitoring.auth_metrics import (
+    ROLE_PERMISSION_CACHE_HITS,
+    ROLE_PERMISSION_CACHE_MISSES,
+    ROLE_PERMISSION_CACHE_LOADS
+)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def counter_value(counter) -> float:
+    return counter._value.get()
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_load():
+    """Test ładowania single-flight - równoległe chybienia wykonują jedno zapytanie."""
+    cache = RolePermissionCache(ttl=60)
+    release = asyncio.Event()
+    loads = []
+
+    async def loader():
+        loads.append(1)
+        await release.wait()
+        return frozenset({"users:read"})
+
+    misses = counter_value(ROLE_PERMISSION_CACHE_MISSES)
+    tasks = [asyncio.create_task(cache.get(1, loader)) for _ in range(10)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*tasks)
+
+    assert loads == [1]
+    assert all(result == {"users:read"} for result in results)
+    assert counter_value(ROLE_PERMISSION_CACHE_MISSES) - misses == 10
+
+    hits = counter_value(ROLE_PERMISSION_CACHE_HITS)
+    assert await cache.get(1, loader) == {"users:read"}
+    assert counter_value(ROLE_PERMISSION_CACHE_HITS) - hits == 1
+    assert loads == [1]
+
+@pytest.mark.asyncio
+async def test_entries_expire_after_ttl():
+    """Test ponownego ładowania po wygaśnięciu wpisu."""
+    clock = FakeClock()
+    cache = RolePermissionCache(ttl=60, clock=clock)
+    versions = iter([frozenset({"users:read"}), frozenset({"users:write"})])
+
+    async def loader():
+        return next(versions)
+
+    assert await cache.get(1, loader) == {"users:read"}
+    clock.now = 59
+    assert await cache.get(1, loader) == {"users:read"}
+    clock.now = 61
+    assert await cache.get(1, loader) == {"users:write"}
+
+@pytest.mark.asyncio
+async def test_invalidation_discards_entries_and_in_flight_loads():
+    """Test unieważnienia - wynik ładowania sprzed zmiany nie trafia do pamięci."""
+    cache = RolePermissionCache(ttl=60)
+    release = asyncio.Event()
+    permissions = {"value": frozenset({"users:read"})}
+
+    async def slow_loader():
+        result = permissions["value"]
+        await release.wait()
+        return result
+
+    async def loader():
+        return permissions["value"]
+
+    stale = asyncio.create_task(cache.get(1, slow_loader))
+    await asyncio.sleep(0)
+
+    # Zmiana uprawnień w trakcie ładowania
+    permissions["value"] = frozenset({"users:read", "users:write"})
+    cache.invalidate()
+    release.set()
+    assert await stale == {"users:read"}
+
+    loads = counter_value(ROLE_PERMISSION_CACHE_LOADS)
+    assert await cache.get(1, loader) == {"users:read", "users:write"}
+    assert counter_value(ROLE_PERMISSION_CACHE_LOADS) - loads == 1
+
+@pytest.mark.asyncio
+async def test_load_error_reaches_waiters_and_is_not_cached():
+    """Test propagacji błędu ładowania do oczekujących bez zapisu w pamięci."""
+    cache = RolePermissionCache(ttl=60)
+    release = asyncio.Event()
+
+    async def failing_loader():
+        await release.wait()
+        raise RuntimeError("database unavailable")
+
+    tasks = [asyncio.create_task(cache.get(1, failing_loader)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+    async def loader():
+        return frozenset({"users:read"})
+
+    assert await cache.get(1, loader) == {"users:read"}
+
+@pytest.mark.asyncio
+async def test_invalidation_reaches_other_workers():
+    """Test unieważnienia przez pub/sub - zmiana ról w jednym workerze czyści pamięć pozostałych."""
+    pytest.importorskip("lupa")
+    from fakeredis import FakeServer
+    from fakeredis.aioredis import FakeRedis
+    from app.core.cache import RedisCache
+
+    server = FakeServer()
+    workers = []
+    for _ in range(2):
+        redis = RedisCache()
+        redis._redis = FakeRedis(server=server, decode_responses=True)
+        workers.append(RolePermissionCache(ttl=60, cache=redis))
+    changing, listening = workers
+    permissions = {"value": frozenset({"users:read"})}
+
+    async def loader():
+        return permissions["value"]
+
+    await listening.start_listener()
+    try:
+        channel = settings.ROLE_PERMISSION_INVALIDATION_CHANNEL
+        for _ in range(100):
+            if await listening._cache.client.pubsub_numsub(channel) == [(channel, 1)]:
+                break
+            await asyncio.sleep(0.01)
+        assert await listening.get(1, loader) == {"users:read"}
+
+        permissions["value"] = frozenset({"users:read", "users:write"})
+        await changing.broadcast_invalidation()
+        for _ in range(100):
+            if not listening._entries:
+                break
+            await asyncio.sleep(0.01)
+
+        assert await listening.get(1, loader) == {"users:read", "users:write"}
+    finally:
+        await listening.stop_listener()
@@ -0,0 +1,103 @@
+import pytest
+import asyncio
+from datetime import datetime, timezone
+from app.core.scheduler import CronSchedule, JobScheduler, LocalLease
+from app.monitoring.scheduler_metrics import SCHEDULER_JOB_MISSED, SCHEDULER_JOB_OVERLAPS, SCHEDULER_JOB_RUNS
+
+def metric_value(metric, **labels) -> float:
+    """Odczytuje bieżącą wartość licznika dla etykiet."""
+    return metric.labels(**labels)._value.get()
+
+def utc(*args) -> datetime:
+    return datetime(*args, tzinfo=timezone.utc)
+
+def test_cron_next_run():
+    """Test wyznaczania kolejnego terminu wyrażenia cron."""
+    assert CronSchedule("*/15 * * * *").next_after(utc(2024, 2, 10, 12, 7)) == utc(2024, 2, 10, 12, 15)
+    assert CronSchedule("5 * * * *").next_after(utc(2024, 2, 10, 12, 5)) == utc(2024, 2, 10, 13, 5)
+    # Poniedziałek 03:00 - 10.02.2024 to sobota
+    assert CronSchedule("0 3 * * 1").next_after(utc(2024, 2, 10, 12, 0)) == utc(2024, 2, 12, 3, 0)
+    assert CronSchedule("0 0 29 2 *").next_after(utc(2023, 3, 1)) == utc(2024, 2, 29)
+
+def test_cron_day_fields_are_alternatives():
+    """Test łączenia dnia miesiąca i tygodnia przez OR, gdy oba są zawężone."""
+    # 1. dzień miesiąca albo niedziela; 11.02.2024 to niedziela
+    assert CronSchedule("0 0 1 * 0").next_after(utc(2024, 2, 10, 12, 0)) == utc(2024, 2, 11)
+
+@pytest.mark.parametrize("expression", ["* * *", "60 * * * *", "*/0 * * * *", "0 0 31 2 *"])
+def test_invalid_cron_is_rejected(expression):
+    """Test odrzucania nieprawidłowych wyrażeń cron."""
+    with pytest.raises(ValueError):
+        CronSchedule(expression).next_after(utc(2024, 1, 1))
+
+@pytest.mark.asyncio
+async def test_only_leader_runs_shared_jobs():
+    """Test wykonywania zadań współdzielonych tylko przez lidera."""
+    runs = []
+
+    async def job(name):
+        runs.append(name)
+
+    first = JobScheduler(lease=LocalLease(key="test-leader"), tick=0.01)
+    second = JobScheduler(lease=LocalLease(key="test-leader"), tick=0.01)
+    for name, instance in (("first", first), ("second", second)):
+        instance.add_job("shared", lambda name=name: job(name), interval=10)
+        instance.add_job("local", lambda name=name: job(f"{name}-local"), interval=10, leader_only=False)
+
+    now = first.jobs[0].next_run + 1
+    await first.run_pending(now)
+    await second.run_pending(now)
+    await asyncio.sleep(0)
+    assert first.is_leader and not second.is_leader
+    assert sorted(runs) == ["first", "first-local", "second-local"]
+
+    # Po zwolnieniu dzierżawy rolę lidera przejmuje drugi scheduler
+    await first.stop()
+    runs.clear()
+    await second.run_pending(now + 100)
+    await asyncio.sleep(0)
+    assert second.is_leader
+    assert sorted(runs) == ["second", "second-local"]
+    await second.stop()
+
+@pytest.mark.asyncio
+async def test_overlapping_run_is_skipped():
+    """Test pomijania uruchomienia, gdy poprzednie nadal trwa."""
+    release = asyncio.Event()
+
+    async def slow_job():
+        await release.wait()
+
+    scheduler = JobScheduler(lease=LocalLease(key="test-overlap"))
+    job = scheduler.add_job("slow", slow_job, interval=10)
+    overlaps = metric_value(SCHEDULER_JOB_OVERLAPS, job="slow")
+
+    assert await scheduler.run_pending(job.next_run) == ["slow"]
+    assert await scheduler.run_pending(job.next_run) == []
+    assert metric_value(SCHEDULER_JOB_OVERLAPS, job="slow") == overlaps + 1
+
+    release.set()
+    await job.task
+    assert metric_value(SCHEDULER_JOB_RUNS, job="slow", status="success") >= 1
+    await scheduler.stop()
+
+@pytest.mark.asyncio
+async def test_missed_runs_are_coalesced():
+    """Test łączenia zaległych terminów w jedno uruchomienie."""
+    runs = []
+
+    async def job():
+        runs.append(1)
+
+    scheduler = JobScheduler(lease=LocalLease(key="test-missed"))
+    job_entry = scheduler.add_job("catch_up", job, interval=10)
+    missed = metric_value(SCHEDULER_JOB_MISSED, job="catch_up")
+
+    due = job_entry.next_run
+    await scheduler.run_pending(due + 35)
+    await asyncio.sleep(0)
+
+    assert runs == [1]
+    assert metric_value(SCHEDULER_JOB_MISSED, job="catch_up") == missed + 3
+    assert job_entry.next_run == pytest.approx(due + 45)
+    await scheduler.stop()
@@ -0,0 +1,82 @@
+import pytest
+import json
+import os
+import time
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import JWTError, jwt
+from app.core.signing_keys import KeyRing
+
+def write_key(directory, kid: str, age: float) -> None:
+    """Zapisuje klucz RSA i ustawia jego wiek (czas modyfikacji)."""
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    path = directory / f"{kid}.pem"
+    path.write_bytes(private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption()
+    ))
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+
+def make_ring(directory) -> KeyRing:
+    return KeyRing(keys_dir=str(directory), activation_delay=60, reload_interval=0)
+
+def test_symmetric_fallback():
+    """Test trybu zgodności HS256 bez katalogu kluczy."""
+    ring = KeyRing(keys_dir=None, secret_key="secret", secret_algorithm="HS256")
+    token = ring.encode({"sub": "user@example.com"})
+    assert jwt.decode(token, "secret", algorithms=["HS256"])["sub"] == "user@example.com"
+    assert ring.decode(token)["sub"] == "user@example.com"
+    assert json.loads(ring.jwks_body()) == {"keys": []}
+
+def test_sign_and_verify_with_kid(tmp_path):
+    """Test podpisu RS256 z identyfikatorem klucza w nagłówku."""
+    write_key(tmp_path, "k1", age=3600)
+    ring = make_ring(tmp_path)
+    token = ring.encode({"sub": "user@example.com"})
+    header = jwt.get_unverified_header(token)
+    assert header == {"alg": "RS256", "typ": "JWT", "kid": "k1"}
+    assert ring.decode(token)["sub"] == "user@example.com"
+
+def test_jwks_verifies_tokens_without_private_material(tmp_path):
+    """Test weryfikacji tokenu wyłącznie kluczem publicznym z JWKS."""
+    write_key(tmp_path, "k1", age=3600)
+    ring = make_ring(tmp_path)
+    token = ring.encode({"sub": "user@example.com"})
+    jwks = json.loads(ring.jwks_body())
+    assert [key["kid"] for key in jwks["keys"]] == ["k1"]
+    assert "d" not in jwks["keys"][0]
+    assert jwt.decode(token, jwks, algorithms=["RS256"])["sub"] == "user@example.com"
+
+def test_rotation_overlap(tmp_path):
+    """Test rotacji: nowy klucz publikowany przed użyciem, stary weryfikuje do usunięcia."""
+    write_key(tmp_path, "old", age=3600)
+    ring = make_ring(tmp_path)
+    old_token = ring.encode({"sub": "user@example.com"})
+
+    # Świeży klucz jest już w JWKS, ale jeszcze nie podpisuje
+    write_key(tmp_path, "new", age=0)
+    assert {key["kid"] for key in json.loads(ring.jwks_body())["keys"]} == {"old", "new"}
+    assert ring.signing_key().kid == "old"
+
+    # Po upływie okna aktywacji podpisuje nowy, stary nadal weryfikuje
+    mtime = time.time() - 120
+    os.utime(tmp_path / "new.pem", (mtime, mtime))
+    assert ring.signing_key().kid == "new"
+    assert ring.decode(old_token)["sub"] == "user@example.com"
+
+    # Usunięcie starego klucza kończy okno nakładania
+    os.remove(tmp_path / "old.pem")
+    with pytest.raises(JWTError):
+        ring.decode(old_token)
+
+def test_unknown_kid_rejected(tmp_path):
+    """Test odrzucenia tokenu podpisanego nieznanym kluczem."""
+    write_key(tmp_path, "k1", age=3600)
+    other_dir = tmp_path / "other"
+    other_dir.mkdir()
+    write_key(other_dir, "k2", age=3600)
+    token = make_ring(other_dir).encode({"sub": "user@example.com"})
+    with pytest.raises(JWTError):
+        make_ring(tmp_path).decode(token)
@@ -0,0 +1,98 @@
+import pytest
+import time
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, patch
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import LocalCache
+from app.core.config import settings
+from app.services.token_service import TokenService
+from app.models.token import TokenData
+
+@pytest.fixture
+def token_data():
+    return TokenData(
+        email="user@example.com",
+        jti="valid-token-id-1",
+        exp=datetime.utcnow() + timedelta(minutes=30)
+    )
+
+@pytest.fixture
+def token_service():
+    service = TokenService()
+    service._cache = AsyncMock()
+    service._cache.get = AsyncMock(return_value=None)
+    return service
+
+@pytest.fixture
+def mock_db():
+    return AsyncMock(spec=AsyncSession)
+
+def test_local_cache_evicts_least_recently_used():
+    """Test usuwania najdawniej używanych wpisów po przekroczeniu rozmiaru."""
+    cache = LocalCache(maxsize=2)
+    cache.set("a", True)
+    cache.set("b", True)
+    assert cache.get("a") is True
+    cache.set("c", False)
+    assert cache.get("b") is None
+    assert cache.get("a") is True
+    assert cache.get("c") is False
+    assert len(cache) == 2
+
+def test_local_cache_ttl():
+    """Test wygasania wpisów oraz pomijania wpisów z nieujemnym TTL."""
+    cache = LocalCache()
+    cache.set("a", True, ttl=0.01)
+    cache.set("b", True, ttl=-1)
+    assert cache.get("b") is None
+    time.sleep(0.02)
+    assert cache.get("a") is None
+
+@pytest.mark.asyncio
+async def test_validation_served_from_local_cache(token_service, token_data, mock_db):
+    """Test walidacji bez I/O sieciowego po rozgrzaniu L1."""
+    token_service._listener_active = True
+    with patch.object(token_service, "_is_token_revoked", AsyncMock(return_value=False)) as revoked:
+        assert await token_service.validate_token(mock_db, token_data) == (True, None)
+        assert await token_service.validate_token(mock_db, token_data) == (True, None)
+    revoked.assert_awaited_once()
+    token_service._cache.get.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_local_cache_skipped_without_listener(token_service, token_data, mock_db):
+    """Test pomijania L1, gdy subskrypcja unieważnień nie działa."""
+    with patch.object(token_service, "_is_token_revoked", AsyncMock(return_value=False)):
+        await token_service.validate_token(mock_db, token_data)
+        await token_service.validate_token(mock_db, token_data)
+    assert token_service._cache.get.await_count == 2
+
+@pytest.mark.asyncio
+async def test_revocation_publishes_jti(token_service, token_data, mock_db):
+    """Test publikowania unieważnionego jti do pozostałych workerów."""
+    token_service._listener_active = True
+    with patch("app.services.token_service.RevokedToken"):
+        success, error = await token_service.revoke_token(mock_db, token_data)
+    assert success, error
+    token_service._cache.publish.assert_awaited_once_with(
+        settings.TOKEN_REVOCATION_CHANNEL, token_data.jti
+    )
+    assert await token_service.validate_token(mock_db, token_data) == (False, None)
+
+@pytest.mark.asyncio
+async def test_fill_started_before_eviction_is_not_stored(token_service, token_data, mock_db):
+    """Test pominięcia zapisu w L1 wyniku odczytanego przed unieważnieniem z pub/sub."""
+    token_service._listener_active = True
+    cache_key = token_service._cache_key(token_data.jti)
+
+    async def get_then_revoked(key):
+        # Wiadomość o unieważnieniu dociera, gdy odczyt z Redis jest w toku
+        token_service._evict_local(cache_key)
+        return "1"
+
+    token_service._cache.get = AsyncMock(side_effect=get_then_revoked)
+    assert await token_service.validate_token(mock_db, token_data) == (True, None)
+    assert token_service._local.get(cache_key) is None
+
+    token_service._cache.get = AsyncMock(return_value="0")
+    assert await token_service.validate_token(mock_db, token_data) == (False, None)
+    assert token_service._local.get(cache_key) is False
@@ -0,0 +1,118 @@
+import pytest
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import Column, DateTime, Integer, MetaData, Table, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.cache import LocalCache
+from app.services.cleanup_service import CleanupTarget, TokenCleanupService, default_targets
+
+@pytest.fixture
+async def attempts():
+    """Tworzy tabelę prób resetu w SQLite z 20 starymi i 5 nowymi wierszami."""
+    metadata = MetaData()
+    table = Table(
+        "cleanup_attempts",
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("attempt_time", DateTime, nullable=False)
+    )
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(metadata.create_all)
+        now = datetime.utcnow()
+        await conn.execute(insert(table), [
+            {"attempt_time": now - timedelta(hours=2 if i < 20 else 0)} for i in range(25)
+        ])
+    yield table, sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    await engine.dispose()
+
+def make_service(table, session_factory, **kwargs) -> TokenCleanupService:
+    """Tworzy serwis czyszczący pojedynczą tabelę testową."""
+    return TokenCleanupService(
+        targets=[CleanupTarget(table, "attempt_time", timedelta(hours=1))],
+        session_factory=session_factory,
+        **kwargs
+    )
+
+async def count_rows(table, session_factory) -> int:
+    """Zwraca liczbę wierszy w tabeli."""
+    async with session_factory() as session:
+        return (await session.execute(select(func.count()).select_from(table))).scalar()
+
+@pytest.mark.asyncio
+async def test_cleanup_deletes_expired_rows_in_batches(attempts):
+    """Test usuwania wyłącznie wygasłych wierszy partiami po kluczu."""
+    table, session_factory = attempts
+    service = make_service(table, session_factory, batch_size=7, batch_delay=0)
+
+    async with session_factory() as session:
+        deleted = await service._cleanup_tokens(session)
+
+    assert deleted == 20
+    assert await count_rows(table, session_factory) == 5
+
+@pytest.mark.asyncio
+async def test_cleanup_stops_when_runtime_budget_is_exhausted(attempts):
+    """Test przerwania czyszczenia po przekroczeniu budżetu czasu."""
+    table, session_factory = attempts
+    service = make_service(table, session_factory, batch_size=7, batch_delay=0, max_runtime=0)
+    service._completed_at[table.name] = time.time() - 60
+
+    await service.cleanup_expired_tokens()
+
+    assert await count_rows(table, session_factory) == 25
+    # Niezakończony przebieg nie resetuje opóźnienia czyszczenia
+    assert time.time() - service._completed_at[table.name] >= 60
+
+@pytest.mark.asyncio
+async def test_refresh_tokens_kept_only_for_reuse_detection():
+    """Test czyszczenia tokenów odświeżania: wygasłe oraz użyte dawniej niż okno wykrywania."""
+    metadata = MetaData()
+    table = Table(
+        "refresh_tokens",
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("expires_at", DateTime, nullable=False),
+        Column("used_at", DateTime, nullable=True)
+    )
+    engine = create_async_engine("sqlite+aiosqlite://")
+    now = datetime.utcnow()
+    async with engine.begin() as conn:
+        await conn.run_sync(metadata.create_all)
+        await conn.execute(insert(table), [
+            {"id": 1, "expires_at": now - timedelta(minutes=1), "used_at": None},
+            {"id": 2, "expires_at": now + timedelta(days=10), "used_at": now - timedelta(hours=100)},
+            {"id": 3, "expires_at": now + timedelta(days=10), "used_at": now - timedelta(hours=1)},
+            {"id": 4, "expires_at": now + timedelta(days=14), "used_at": None},
+        ])
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    service = TokenCleanupService(
+        targets=[
+            CleanupTarget(table, "expires_at"),
+            CleanupTarget(table, "used_at", timedelta(hours=72), name="refresh_tokens_used"),
+        ],
+        session_factory=session_factory,
+        batch_delay=0
+    )
+
+    async with session_factory() as session:
+        assert await service._cleanup_tokens(session) == 2
+        remaining = (await session.execute(select(table.c.id).order_by(table.c.id))).scalars().all()
+    assert remaining == [3, 4]
+    await engine.dispose()
+
+    names = [target.name for target in default_targets()]
+    assert "refresh_tokens" in names and "refresh_tokens_used" in names
+    assert "revoked_tokens" not in names
+    assert len(names) == len(set(names))
+
+def test_local_cache_purges_expired_entries():
+    """Test usuwania wygasłych wpisów z lokalnego cache."""
+    local = LocalCache(maxsize=10)
+    local.set("expired", True, ttl=0.001)
+    local.set("alive", True, ttl=60)
+    time.sleep(0.01)
+    assert local.purge_expired() == 1
+    assert len(local) == 1
+    assert local.get("alive") is True
@@ -0,0 +1,105 @@
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock
+from sqlalchemy.ext.asyncio import AsyncSession
+from jose import jwt
+from app.core.config import settings
+from app.services.auth_service import AuthService
+from app.services.token_service import TokenService, CLAIMS_MESSAGE_PREFIX, EPOCH_MESSAGE_PREFIX
+from app.models.token import TokenData
+
+@pytest.fixture
+def token_service():
+    service = TokenService()
+    service._cache = AsyncMock()
+    service._cache.set_max = AsyncMock(side_effect=lambda key, value, expires_in=None: value)
+    service._cache.set_max_many = AsyncMock(side_effect=lambda entries: [value for _, value, _ in entries])
+    service._cache.get = AsyncMock(return_value=None)
+    return service
+
+def make_token(epoch=None) -> TokenData:
+    return TokenData(
+        email="user@example.com",
+        jti="valid-token-id-1",
+        exp=datetime.utcnow() + timedelta(minutes=30),
+        user_id=1,
+        epoch=epoch
+    )
+
+def test_access_token_carries_epoch():
+    """Test osadzania epoki tokenów w tokenie dostępu."""
+    token = AuthService().create_access_token({"sub": "user@example.com"}, token_epoch=3)
+    payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    assert payload["epoch"] == 3
+
+@pytest.mark.asyncio
+async def test_token_from_older_epoch_is_rejected(token_service):
+    """Test odrzucenia tokenu wydanego przed inkrementacją epoki."""
+    token_service._cache.get = AsyncMock(side_effect=lambda key: "2" if key == "token_epoch:1" else "1")
+    db = AsyncMock(spec=AsyncSession)
+    assert await token_service.validate_token(db, make_token(epoch=1)) == (False, None)
+    assert await token_service.validate_token(db, make_token(epoch=2)) == (True, None)
+    db.execute.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_epoch_loaded_from_db_on_cache_miss(token_service):
+    """Test odczytu epoki z bazy i zapisania jej w cache."""
+    db = AsyncMock(spec=AsyncSession)
+    result = MagicMock()
+    result.scalar_one_or_none.return_value = 4
+    db.execute.return_value = result
+    assert await token_service.get_token_epoch(db, 1) == 4
+    token_service._cache.set_max.assert_awaited_once_with("token_epoch:1", 4, expires_in=3600)
+
+@pytest.mark.asyncio
+async def test_bump_publishes_new_epoch(token_service):
+    """Test publikowania nowej epoki po unieważnieniu wszystkich sesji."""
+    db = AsyncMock(spec=AsyncSession)
+    user = MagicMock(id=1)
+
+    async def refresh(obj, attribute_names=None):
+        obj.token_epoch = 5
+
+    db.refresh.side_effect = refresh
+    token_service._local.set("token_epoch:1", 4)
+
+    assert await token_service.bump_token_epoch(db, user) == 5
+    db.commit.assert_awaited_once()
+    assert token_service._local.get("token_epoch:1") is None
+    token_service._cache.set_max.assert_awaited_once_with("token_epoch:1", 5, expires_in=3600)
+    token_service._cache.publish.assert_awaited_once_with(
+        settings.TOKEN_REVOCATION_CHANNEL, f"{EPOCH_MESSAGE_PREFIX}1"
+    )
+
+@pytest.mark.asyncio
+async def test_claims_version_bump_keeps_epoch(token_service):
+    """Test wersji claimów - inkrementacja nie zmienia epoki, więc tokeny pozostają ważne."""
+    db = AsyncMock(spec=AsyncSession)
+    user = MagicMock(id=1, token_epoch=4)
+
+    async def refresh(obj, attribute_names=None):
+        obj.claims_version = 2
+
+    db.refresh.side_effect = refresh
+    token_service._local.set("claims_version:1", 1)
+
+    assert await token_service.bump_claims_version(db, user) == 2
+    assert user.token_epoch == 4
+    assert token_service._local.get("claims_version:1") is None
+    token_service._cache.set_max.assert_awaited_once_with("claims_version:1", 2, expires_in=3600)
+    token_service._cache.publish.assert_awaited_once_with(
+        settings.TOKEN_REVOCATION_CHANNEL, f"{CLAIMS_MESSAGE_PREFIX}1"
+    )
+
+@pytest.mark.asyncio
+async def test_stale_db_read_does_not_lower_cached_epoch(token_service):
+    """Test odczytu epoki sprzed inkrementacji - Redis zachowuje nowszą epokę i ona obowiązuje."""
+    db = AsyncMock(spec=AsyncSession)
+    result = MagicMock()
+    result.scalar_one_or_none.return_value = 4
+    db.execute.return_value = result
+    # bump_token_epoch zapisał epokę 5 między odczytem z bazy a zapisem do cache
+    token_service._cache.set_max = AsyncMock(return_value=5)
+
+    assert await token_service.get_token_epoch(db, 1) == 5
+    assert await token_service.validate_token(db, make_token(epoch=4)) == (False, None)
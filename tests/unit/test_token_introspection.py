@@ -0,0 +1,119 @@
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.database import get_db
+from app.routes import token_routes
+from app.services.auth_service import auth_service, get_current_active_user
+from app.services.token_service import TokenService
+from app.models.principal import Principal
+from app.models.token import TokenData
+
+@pytest.fixture
+def token_service():
+    service = TokenService()
+    service._cache = AsyncMock()
+    service._cache.set_max = AsyncMock(side_effect=lambda key, value, expires_in=None: value)
+    service._cache.set_max_many = AsyncMock(side_effect=lambda entries: [value for _, value, _ in entries])
+    return service
+
+def make_client(is_admin: bool = True) -> TestClient:
+    """Tworzy klienta API introspekcji z podaną tożsamością wywołującego."""
+    app = FastAPI()
+    app.include_router(token_routes.router, prefix="/api/tokens")
+
+    async def override_db():
+        yield AsyncMock()
+
+    app.dependency_overrides[get_db] = override_db
+    app.dependency_overrides[get_current_active_user] = lambda: Principal(
+        id=2, email="caller@example.com", role_ids=[3], is_admin=is_admin
+    )
+    return TestClient(app)
+
+@pytest.fixture
+def client():
+    return make_client()
+
+def make_token(jti: str, user_id: int = 1, epoch: int = 0) -> TokenData:
+    return TokenData(
+        email="user@example.com",
+        jti=jti,
+        exp=datetime.utcnow() + timedelta(minutes=30),
+        user_id=user_id,
+        epoch=epoch
+    )
+
+def rows(result_rows=None, scalars=None):
+    result = MagicMock()
+    result.all.return_value = result_rows or []
+    result.scalars.return_value.all.return_value = scalars or []
+    return result
+
+@pytest.mark.asyncio
+async def test_batch_validation_uses_single_mget_and_query(token_service):
+    """Test walidacji wsadowej: jeden MGET na epoki, jeden na jti i jedno zapytanie IN."""
+    token_service._cache.get_many = AsyncMock(side_effect=[
+        ["1"],                 # epoka użytkownika 1
+        ["1", None, None]      # jti: a - ważny w cache, b i c - chybienia
+    ])
+    db = AsyncMock(spec=AsyncSession)
+    db.execute.return_value = rows(scalars=["c"])
+
+    tokens = [make_token("a", epoch=1), make_token("b", epoch=1), make_token("c", epoch=1), make_token("d", epoch=0)]
+    assert await token_service.validate_tokens(db, tokens) == [True, True, False, False]
+
+    assert token_service._cache.get_many.await_count == 2
+    db.execute.assert_awaited_once()
+    token_service._cache.set_many.assert_awaited_once_with([
+        ("token_valid:b", 1, 3600),
+        ("token_valid:c", 0, 3600)
+    ])
+
+@pytest.mark.asyncio
+async def test_batch_validation_loads_missing_epochs_from_db(token_service):
+    """Test odczytu epok nieobecnych w cache jednym zapytaniem."""
+    token_service._cache.get_many = AsyncMock(side_effect=[[None, None], ["1", "1"]])
+    db = AsyncMock(spec=AsyncSession)
+    db.execute.return_value = rows(result_rows=[(1, 2), (2, 0)])
+
+    tokens = [make_token("a", user_id=1, epoch=1), make_token("b", user_id=2, epoch=0)]
+    assert await token_service.validate_tokens(db, tokens) == [False, True]
+    db.execute.assert_awaited_once()
+
+def test_introspection_endpoint(client):
+    """Test introspekcji: aktywny token z claimami, nieprawidłowy jako nieaktywny."""
+    token = auth_service.create_access_token({"sub": "user@example.com", "scopes": ["user"], "user_id": 1})
+    with patch("app.routes.token_routes.token_service.validate_tokens", AsyncMock(return_value=[True])) as validate:
+        response = client.post("/api/tokens/introspect", json={"tokens": [token, "invalid"]})
+
+    assert response.status_code == 200
+    active, inactive = response.json()["results"]
+    assert active["active"] is True
+    assert active["sub"] == "user@example.com"
+    assert active["scope"] == "user"
+    assert inactive == {"active": False}
+    assert len(validate.await_args.args[1]) == 1
+
+def test_introspection_batch_size_limited(client):
+    """Test limitu liczby tokenów w jednym żądaniu."""
+    response = client.post("/api/tokens/introspect", json={"tokens": ["t"] * 101})
+    assert response.status_code == 422
+
+def test_introspection_requires_admin_or_introspect_permission():
+    """Test odmowy introspekcji bez uprawnienia tokens:introspect i dostępu roli, która je ma."""
+    token = auth_service.create_access_token({"sub": "other@example.com", "scopes": ["user"], "user_id": 2})
+    validate_tokens = AsyncMock(return_value=[True])
+    with patch("app.routes.token_routes.token_service.validate_tokens", validate_tokens), \
+            patch("app.services.role_service.get_user_permissions", AsyncMock(return_value=frozenset({"users:read"}))):
+        response = make_client(is_admin=False).post("/api/tokens/introspect", json={"tokens": [token]})
+        assert response.status_code == 403
+        validate_tokens.assert_not_awaited()
+
+    with patch("app.routes.token_routes.token_service.validate_tokens", validate_tokens), \
+            patch("app.services.role_service.get_user_permissions", AsyncMock(return_value=frozenset({"tokens:introspect"}))):
+        response = make_client(is_admin=False).post("/api/tokens/introspect", json={"tokens": [token]})
+        assert response.status_code == 200
+        assert response.json()["results"][0]["sub"] == "other@example.com"